@@ -0,0 +1,122 @@
+"""Сколько запросов выдерживает приложение, пока база отвечает медленно.
+
+``core.testing.SlowQueries`` добавляет задержку перед каждым
+SQL-запросом во всех потоках — так выглядит сетевая база под нагрузкой.
+Запросы идут прямо в ASGI-приложение ``core.asgi.AsgiHandler`` из
+``concurrency`` корутин-клиентов, без сети. Режимы:
+
+* ``sync`` — один поток и запросы к базе по очереди: синхронный
+  WSGI-воркер, к которому клиенты стоят в очереди;
+* ``threads`` — ``threads`` потоков ASGI-пула, запросы к базе внутри
+  страницы по-прежнему по очереди (``ASYNC_DB_INLINE``);
+* ``async`` — то же, но независимые части страницы асинхронные view
+  запрашивают одновременно (``core.aio``).
+"""
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import Client
+from django.test.utils import override_settings
+
+from core.asgi import AsgiHandler
+
+from .harness import USER, percentile
+
+# Режим: (потоков ASGI-пула или None — из --threads, запросы по очереди).
+MODES = {
+    'sync': (1, True),
+    'threads': (None, True),
+    'async': (None, False),
+}
+
+
+def session_cookie(user):
+    client = Client()
+    client.force_login(user)
+    cookie = client.cookies[settings.SESSION_COOKIE_NAME]
+    return f'{settings.SESSION_COOKIE_NAME}={cookie.value}'.encode()
+
+
+async def request(handler, path, cookie):
+    """GET ``path`` через ASGI; вернуть код ответа."""
+    scope = {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'host', b'localhost'), (b'cookie', cookie)],
+        'client': ('127.0.0.1', 0),
+        'server': ('localhost', 80),
+    }
+    started = {}
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            started['status'] = message['status']
+
+    await handler(scope, receive, send)
+    return started['status']
+
+
+async def client(handler, path, cookie, count, latencies, errors):
+    for _ in range(count):
+        started = time.perf_counter()
+        status = await request(handler, path, cookie)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if status >= 400:
+            errors.append(status)
+
+
+async def load(handler, path, cookie, requests_count, concurrency):
+    latencies, errors = [], []
+    share = [requests_count // concurrency] * concurrency
+    for number in range(requests_count % concurrency):
+        share[number] += 1
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        client(handler, path, cookie, count, latencies, errors)
+        for count in share if count
+    ))
+    return latencies, errors, time.perf_counter() - started
+
+
+def run_mode(mode, path, user, requests_count=100, concurrency=16,
+             threads=8):
+    """Прогнать страницу ``path`` от лица ``user`` в режиме ``mode``."""
+    pool_size, inline = MODES[mode]
+    handler = AsgiHandler(WSGIHandler(), threads=pool_size or threads)
+    cookie = session_cookie(user)
+    try:
+        with override_settings(ASYNC_DB_INLINE=inline):
+            latencies, errors, elapsed = asyncio.run(load(
+                handler, path, cookie, requests_count, concurrency
+            ))
+    finally:
+        handler.close()
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'p50': round(percentile(latencies, 0.50), 2),
+        'p99': round(percentile(latencies, 0.99), 2),
+    }
+
+
+def read_scenarios(scenarios):
+    """Читающие сценарии вошедшего пользователя: ``[(имя, адрес)]``.
+
+    Гостям страницы отдаёт кэш, и медленная база их не касается.
+    """
+    return [
+        (scenario.name, scenario.paths[0]) for scenario in scenarios
+        if scenario.client == USER and not scenario.write
+    ]
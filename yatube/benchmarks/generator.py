@@ -0,0 +1,242 @@
+"""Синтетические данные для бенчмарков.
+
+Пользователи, группы, подписки, посты и комментарии вставляются
+``bulk_create`` пачками по ``batch_size`` с заранее назначенными id:
+комментариям и подпискам не нужно перечитывать вставленное. Сигналы при
+этом не срабатывают, поэтому в конце счётчики, ленты подписок, индекс
+поиска и версии кэша перестраиваются ``posts.transfer.finalize``.
+
+Популярность распределена по степенному закону, как в живой сети:
+автор ранга ``r`` получает подписчиков и пишет посты с весом
+``1 / r ** alpha``, число подписок пользователя берётся из распределения
+Парето. Несколько авторов собирают большую часть подписчиков, и при
+достаточном числе пользователей они становятся «популярными»
+(``TIMELINE_FANOUT_LIMIT``), а их посты подмешиваются в ленту при чтении.
+Новые посты комментируют чаще старых.
+
+Все пользователи получают пароль ``PASSWORD`` и имена с префиксом
+``PREFIX``. Генерация детерминирована при одинаковом ``seed``.
+"""
+import random
+import time
+from bisect import bisect
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from posts.models import Comment, Follow, Group, Post
+from posts.transfer import finalize, keep_dates
+
+User = get_user_model()
+
+PREFIX = 'bench_'
+PASSWORD = 'bench-password'
+SENTENCES = 1000
+
+# Готовые наборы объёмов: small — для тестов и быстрой проверки,
+# large — миллионы постов и комментариев.
+SCALES = {
+    'small': {'users': 200, 'groups': 10, 'posts': 5000,
+              'follows': 20, 'comments': 10000},
+    'medium': {'users': 5000, 'groups': 50, 'posts': 200000,
+               'follows': 30, 'comments': 400000},
+    'large': {'users': 50000, 'groups': 200, 'posts': 2000000,
+              'follows': 50, 'comments': 4000000},
+}
+
+
+class Weighted:
+    """Случайный выбор из ``items`` с весом ``1 / rank ** alpha``."""
+
+    def __init__(self, items, alpha, rng):
+        self.items = items
+        self.rng = rng
+        self.cumulative = list(accumulate(
+            1 / rank ** alpha for rank in range(1, len(items) + 1)
+        ))
+
+    def __call__(self):
+        point = self.rng.random() * self.cumulative[-1]
+        return self.items[bisect(self.cumulative, point)]
+
+
+class Generator:
+    def __init__(self, users, groups, posts, follows, comments, days=365,
+                 alpha=1.2, seed=0, batch_size=5000, search_index=True,
+                 progress=None):
+        self.users = users
+        self.groups = groups
+        self.posts = posts
+        self.follows = follows
+        self.comments = comments
+        self.days = days
+        self.alpha = alpha
+        self.batch_size = batch_size
+        self.search_index = search_index
+        self.progress = progress
+        self.rng = random.Random(seed)
+        fake = Faker('ru_RU')
+        fake.seed_instance(seed)
+        self.sentences = [fake.sentence(nb_words=12)
+                          for _ in range(SENTENCES)]
+        self.created = {}
+
+    def run(self):
+        """Создать данные и вернуть ``{модель: число объектов}``."""
+        started = time.perf_counter()
+        with keep_dates():
+            self.create_users()
+            self.create_groups()
+            self.create_follows()
+            self.create_posts()
+            self.create_comments()
+        self.report('finalize', 0, 1)
+        finalize(search_index=self.search_index)
+        self.report('finalize', 1, 1)
+        self.created['seconds'] = round(time.perf_counter() - started, 1)
+        return self.created
+
+    def report(self, stage, done, total):
+        if self.progress:
+            self.progress(stage, done, total)
+
+    def insert(self, stage, model, objects, total):
+        """Вставить объекты пачками, каждую в своей транзакции."""
+        done = 0
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) == self.batch_size:
+                done += self.flush(model, batch)
+                self.report(stage, done, total)
+                batch = []
+        done += self.flush(model, batch)
+        self.report(stage, done, total)
+        self.created[stage] = done
+
+    @staticmethod
+    def flush(model, batch):
+        with transaction.atomic():
+            model.objects.bulk_create(batch)
+        return len(batch)
+
+    @staticmethod
+    def next_id(model):
+        return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+    def text(self, sentences):
+        return ' '.join(
+            self.rng.choice(self.sentences) for _ in range(sentences)
+        )
+
+    def create_users(self):
+        first = self.next_id(User)
+        self.user_ids = list(range(first, first + self.users))
+        # Хеш пароля считается медленно намеренно: один на всех.
+        password = make_password(PASSWORD)
+        self.insert('users', User, (
+            User(pk=pk, username=f'{PREFIX}{pk}', password=password,
+                 email=f'{PREFIX}{pk}@example.com')
+            for pk in self.user_ids
+        ), self.users)
+        ranked = list(self.user_ids)
+        self.rng.shuffle(ranked)
+        self.pick_author = Weighted(ranked, self.alpha, self.rng)
+
+    def create_groups(self):
+        first = self.next_id(Group)
+        group_ids = list(range(first, first + self.groups))
+        self.insert('groups', Group, (
+            Group(pk=pk, title=f'Группа {pk}', slug=f'{PREFIX}group-{pk}',
+                  description=self.text(2))
+            for pk in group_ids
+        ), self.groups)
+        self.pick_group = Weighted(group_ids, self.alpha, self.rng) if (
+            group_ids) else None
+
+    def follows_of(self, user_id):
+        """Авторы одного пользователя: их число — по Парето."""
+        # Среднее paretovariate(2) — 2, поэтому в среднем self.follows.
+        wanted = min(
+            len(self.user_ids) - 1,
+            int(self.follows * self.rng.paretovariate(2) / 2)
+        )
+        authors = set()
+        for _ in range(wanted * 3):
+            if len(authors) == wanted:
+                break
+            author_id = self.pick_author()
+            if author_id != user_id:
+                authors.add(author_id)
+        return authors
+
+    def create_follows(self):
+        self.insert('follows', Follow, (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id in self.user_ids
+            for author_id in self.follows_of(user_id)
+        ), self.users * self.follows)
+
+    def pub_date(self, number):
+        """Дата ``number``-го поста: посты идут равномерно за ``days``."""
+        return self.start + self.step * number
+
+    def create_posts(self):
+        now = timezone.now()
+        self.start = now - timedelta(days=self.days)
+        self.step = (now - self.start) / max(self.posts, 1)
+        self.first_post = self.next_id(Post)
+
+        def posts():
+            for number in range(self.posts):
+                pub_date = self.pub_date(number)
+                group_id = None
+                if self.pick_group and self.rng.random() < 0.7:
+                    group_id = self.pick_group()
+                yield Post(
+                    pk=self.first_post + number,
+                    author_id=self.pick_author(),
+                    group_id=group_id,
+                    text=self.text(self.rng.randint(1, 5)),
+                    pub_date=pub_date,
+                    updated=pub_date,
+                )
+
+        self.insert('posts', Post, posts(), self.posts)
+
+    def create_comments(self):
+        if not self.posts:
+            return
+        now = timezone.now()
+
+        def comments():
+            for _ in range(self.comments):
+                # Корень из равномерного сдвигает выбор к новым постам.
+                number = min(int(self.posts * self.rng.random() ** 0.5),
+                             self.posts - 1)
+                created = self.pub_date(number) + timedelta(
+                    seconds=self.rng.randint(1, 2 * 24 * 60 * 60)
+                )
+                yield Comment(
+                    post_id=self.first_post + number,
+                    author_id=self.rng.choice(self.user_ids),
+                    text=self.text(1),
+                    created=min(created, now),
+                )
+
+        self.insert('comments', Comment, comments(), self.comments)
+
+
+def clear():
+    """Удалить всех пользователей бенчмарка вместе с их данными."""
+    users = User.objects.filter(username__startswith=PREFIX)
+    Group.objects.filter(slug__startswith=PREFIX).delete()
+    deleted = users.delete()[0]
+    finalize(search_index=True)
+    return deleted
@@ -0,0 +1,328 @@
+"""Нагрузочный прогон страниц и сравнение с сохранённым базовым замером.
+
+Сценарий — одна страница от лица гостя или вошедшего пользователя:
+ленты (``index``, ``group_list``, ``profile``, ``follow_index``), пост
+и пишущие view (новый пост, комментарий, подписка и отписка). Данные для
+сценариев берутся из базы: самый популярный автор, самая большая
+группа, самый обсуждаемый пост и читатель с наибольшим числом подписок.
+
+Запросы отправляет драйвер: ``ClientDriver`` — тестовый клиент Django
+в том же процессе (без сети, только приложение), ``ServerDriver`` —
+HTTP к настоящему WSGI-серверу: поднятому в этом процессе или
+внешнему, например gunicorn, по ``base_url``. Запросы идут из
+``concurrency`` потоков. Задержка меряется на стороне клиента
+(p50/p95/p99), число SQL-запросов на ответ — по ``core.metrics``,
+если сервер работает в этом процессе.
+
+Базовый замер хранится в JSON по драйверам; ``compare`` находит
+сценарии, где p95 вырос больше чем на ``tolerance`` или запросов стало
+больше.
+"""
+import json
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urljoin
+
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.servers.basehttp import (ThreadedWSGIServer,
+                                          WSGIRequestHandler,
+                                          get_internal_wsgi_application)
+from django.db import connections
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from core.metrics import view_metrics
+from posts.models import Group, Post, Profile
+
+User = get_user_model()
+
+GUEST = 'guest'
+USER = 'user'
+
+Scenario = namedtuple(
+    'Scenario', 'name views method paths data client write'
+)
+
+
+def percentile(values, fraction):
+    """Значение ранга ``fraction`` в отсортированном ``values``."""
+    if not values:
+        return 0
+    index = min(len(values) - 1, int(len(values) * fraction))
+    return values[index]
+
+
+def build_scenarios(reader, author, group, post):
+    profile = reverse('posts:profile', args=[author.username])
+    detail = reverse('posts:post_detail', args=[post.pk])
+    reads = [
+        ('index', 'posts:index', reverse('posts:index')),
+        ('group_list', 'posts:group_list',
+         reverse('posts:group_list', args=[group.slug])),
+        ('profile', 'posts:profile', profile),
+        ('post_detail', 'posts:post_detail', detail),
+    ]
+    scenarios = [
+        Scenario(f'{name}:{client}', (view,), 'get', [path], None, client,
+                 False)
+        for name, view, path in reads
+        for client in (GUEST, USER)
+    ]
+    scenarios += [
+        Scenario('follow_index:user', ('posts:follow_index',), 'get',
+                 [reverse('posts:follow_index')], None, USER, False),
+        Scenario('post_create:user', ('posts:post_create',), 'post',
+                 [reverse('posts:post_create')],
+                 {'text': 'Пост из бенчмарка', 'group': group.pk}, USER,
+                 True),
+        Scenario('add_comment:user', ('posts:add_comment',), 'post',
+                 [reverse('posts:add_comment', args=[post.pk])],
+                 {'text': 'Комментарий из бенчмарка'}, USER, True),
+        # Подписка и отписка чередуются, чтобы каждый раз менять данные.
+        Scenario('follow_toggle:user',
+                 ('posts:profile_follow', 'posts:profile_unfollow'), 'get',
+                 [reverse('posts:profile_follow', args=[author.username]),
+                  reverse('posts:profile_unfollow', args=[author.username])],
+                 None, USER, True),
+    ]
+    return scenarios
+
+
+def default_scenarios():
+    """Сценарии на данных из базы; ``(reader, scenarios)``."""
+    author = Profile.objects.select_related('user').order_by(
+        '-followers_count', 'pk'
+    ).first()
+    reader = User.objects.annotate(
+        follows=Count('follower')
+    ).order_by('-follows', 'pk').first()
+    group = Group.objects.annotate(
+        total=Count('posts')
+    ).order_by('-total', 'pk').first()
+    post = Post.objects.order_by('-comments_count', '-pk').first()
+    if None in (author, reader, group, post):
+        raise ValueError('В базе нет данных для бенчмарка: bench_seed')
+    if author.user == reader:
+        # Подписаться на самого себя нельзя: берём следующего автора.
+        author = Profile.objects.select_related('user').exclude(
+            user=reader
+        ).order_by('-followers_count', 'pk').first()
+    return reader, build_scenarios(reader, author.user, group, post)
+
+
+class ClientDriver:
+    """Тестовый клиент Django: приложение без сети и сервера."""
+
+    name = 'client'
+    measures_queries = True
+
+    def __init__(self, user):
+        self.user = user
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def session(self, kind):
+        client = Client()
+        if kind == USER:
+            client.force_login(self.user)
+        return client
+
+    def request(self, session, scenario, path):
+        response = getattr(session, scenario.method)(path, scenario.data)
+        return response.status_code
+
+
+class QuietHandler(WSGIRequestHandler):
+    # Без TCP_NODELAY ответ ждёт подтверждения от клиента (~40 мс).
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+
+class ServerDriver:
+    """HTTP к WSGI-серверу: своему в потоке или внешнему по ``base_url``."""
+
+    name = 'wsgi'
+
+    def __init__(self, user, base_url=None):
+        self.user = user
+        self.base_url = base_url
+        self.server = None
+        self.measures_queries = base_url is None
+
+    def __enter__(self):
+        if self.base_url is None:
+            self.server = ThreadedWSGIServer(
+                ('127.0.0.1', 0), QuietHandler, allow_reuse_address=False
+            )
+            self.server.set_app(get_internal_wsgi_application())
+            self.server.daemon_threads = True
+            threading.Thread(
+                target=self.server.serve_forever, daemon=True
+            ).start()
+            host, port = self.server.server_address
+            self.base_url = f'http://{host}:{port}'
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def session(self, kind):
+        session = requests.Session()
+        if kind == USER:
+            # Сессию создаёт тестовый клиент, серверу нужен только cookie.
+            client = Client()
+            client.force_login(self.user)
+            cookie = client.cookies[settings.SESSION_COOKIE_NAME]
+            session.cookies.set(settings.SESSION_COOKIE_NAME, cookie.value)
+            session.get(urljoin(self.base_url, reverse('posts:post_create')))
+        return session
+
+    def request(self, session, scenario, path):
+        headers = {}
+        token = session.cookies.get(settings.CSRF_COOKIE_NAME)
+        if scenario.method == 'post' and token:
+            headers['X-CSRFToken'] = token
+        response = session.request(
+            scenario.method, urljoin(self.base_url, path),
+            data=scenario.data, headers=headers, allow_redirects=False
+        )
+        return response.status_code
+
+
+def drive(driver, scenario, count, warmup, latencies, errors):
+    """Один поток нагрузки: ``warmup`` запросов без замера и ``count``."""
+    session = driver.session(scenario.client)
+    done, failed = [], 0
+    for number in range(-warmup, count):
+        path = scenario.paths[number % len(scenario.paths)]
+        started = time.perf_counter()
+        status = driver.request(session, scenario, path)
+        elapsed = (time.perf_counter() - started) * 1000
+        if number < 0:
+            continue
+        if status >= 400:
+            failed += 1
+        done.append(elapsed)
+    latencies.extend(done)
+    errors.append(failed)
+
+
+def drive_in_thread(*args):
+    try:
+        drive(*args)
+    finally:
+        # У каждого потока своё соединение с базой.
+        connections.close_all()
+
+
+def queries_per_response(views):
+    """Среднее число SQL-запросов на ответ view по ``core.metrics``."""
+    snapshot = view_metrics.snapshot()
+    stats = [snapshot[name]['queries'] for name in views if name in snapshot]
+    count = sum(stat['count'] for stat in stats)
+    if not count:
+        return None
+    return round(sum(stat['sum'] for stat in stats) / count, 1)
+
+
+def run_scenario(driver, scenario, requests_count, concurrency, warmup):
+    """Прогнать сценарий; вернуть задержки и число запросов к базе."""
+    latencies, errors = [], []
+    view_metrics.reset()
+    started = time.perf_counter()
+    if concurrency == 1:
+        # В своём потоке: тестам нужна транзакция и соединение TestCase.
+        drive(driver, scenario, requests_count, warmup, latencies, errors)
+    else:
+        share = [requests_count // concurrency] * concurrency
+        for number in range(requests_count % concurrency):
+            share[number] += 1
+        threads = [
+            threading.Thread(
+                target=drive_in_thread,
+                args=(driver, scenario, count, warmup, latencies, errors)
+            )
+            for count in share if count
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': sum(errors),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'p50': round(percentile(latencies, 0.50), 2),
+        'p95': round(percentile(latencies, 0.95), 2),
+        'p99': round(percentile(latencies, 0.99), 2),
+        'queries': (queries_per_response(scenario.views)
+                    if driver.measures_queries else None),
+    }
+
+
+def run(driver, scenarios, requests_count=100, concurrency=1, warmup=5,
+        include_writes=True, progress=None):
+    """Прогнать сценарии драйвером; вернуть ``{сценарий: результат}``."""
+    results = {}
+    with driver:
+        for scenario in scenarios:
+            if scenario.write and not include_writes:
+                continue
+            results[scenario.name] = run_scenario(
+                driver, scenario, requests_count, concurrency, warmup
+            )
+            if progress:
+                progress(scenario.name, results[scenario.name])
+    return results
+
+
+def load_baseline(path):
+    try:
+        with open(path, encoding='utf-8') as stream:
+            return json.load(stream)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, driver_name, results):
+    """Записать результаты драйвера в файл, сохранив остальные драйверы."""
+    baseline = load_baseline(path)
+    baseline[driver_name] = results
+    with open(path, 'w', encoding='utf-8') as stream:
+        json.dump(baseline, stream, ensure_ascii=False, indent=2,
+                  sort_keys=True)
+        stream.write('\n')
+
+
+def compare(results, baseline, tolerance=0.2):
+    """Регрессии относительно базового замера одного драйвера."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result['p95'] > base['p95'] * (1 + tolerance):
+            regressions.append(
+                f'{name}: p95 {result["p95"]} мс, было {base["p95"]} мс'
+            )
+        if None not in (result['queries'], base.get('queries')) and (
+                result['queries'] > base['queries']):
+            regressions.append(
+                f'{name}: {result["queries"]} SQL-запросов на ответ, '
+                f'было {base["queries"]}'
+            )
+    return regressions
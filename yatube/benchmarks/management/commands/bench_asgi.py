@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks import concurrency, harness
+from core.testing import SlowQueries
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность и задержку лент и поста '
+            'при медленной базе (--delay мс на каждый SQL-запрос): '
+            'синхронный воркер (sync), ASGI с пулом потоков (threads) и '
+            'ASGI с асинхронными view, которые запрашивают независимые '
+            'части страницы одновременно (async). Данные для замера '
+            'создаёт bench_seed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modes', nargs='+', default=list(concurrency.MODES),
+            choices=list(concurrency.MODES)
+        )
+        parser.add_argument('--delay', type=float, default=10,
+                            help='Задержка каждого SQL-запроса, мс.')
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Потоков ASGI-пула в режимах threads '
+                                 'и async.')
+        parser.add_argument(
+            '--only', nargs='+', metavar='SCENARIO',
+            help='Только эти сценарии, например profile:user.'
+        )
+
+    def handle(self, *args, **options):
+        if min(options['requests'], options['concurrency'],
+               options['threads']) < 1:
+            raise CommandError(
+                '--requests, --concurrency и --threads должны быть > 0'
+            )
+        try:
+            reader, scenarios = harness.default_scenarios()
+        except ValueError as error:
+            raise CommandError(error)
+        pages = concurrency.read_scenarios(scenarios)
+        if options['only']:
+            pages = [(name, path) for name, path in pages
+                     if name in options['only']]
+            if not pages:
+                raise CommandError('Нет таких читающих сценариев')
+        self.stdout.write(
+            f'{"сценарий":<22} {"режим":<8} {"запросов/с":>10} '
+            f'{"p50, мс":>9} {"p99, мс":>9} {"ошибок":>7}'
+        )
+        with SlowQueries(options['delay'] / 1000):
+            for name, path in pages:
+                for mode in options['modes']:
+                    result = concurrency.run_mode(
+                        mode, path, reader,
+                        requests_count=options['requests'],
+                        concurrency=options['concurrency'],
+                        threads=options['threads'],
+                    )
+                    self.stdout.write(
+                        f'{name:<22} {mode:<8} {result["rps"]:>10} '
+                        f'{result["p50"]:>9} {result["p99"]:>9} '
+                        f'{result["errors"]:>7}'
+                    )
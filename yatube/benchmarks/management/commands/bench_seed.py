@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+
+from benchmarks.generator import SCALES, Generator, clear
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, группами, '
+            'подписками, постами и комментариями для бенчмарков. '
+            'Явные --users, --posts и т. д. заменяют значения --scale.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=SCALES, default='small')
+        for field in ('users', 'groups', 'posts', 'follows', 'comments'):
+            parser.add_argument(f'--{field}', type=int)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument(
+            '--alpha', type=float, default=1.2,
+            help='Показатель степенного закона популярности авторов.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--no-search-index', action='store_true',
+            help='Не перестраивать индекс поиска после загрузки.'
+        )
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Удалить данные прошлых запусков и выйти.'
+        )
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            deleted = clear()
+            self.stdout.write(
+                self.style.SUCCESS(f'Удалено объектов: {deleted}')
+            )
+            return
+        volumes = {
+            field: value if options[field] is None else options[field]
+            for field, value in SCALES[options['scale']].items()
+        }
+        created = Generator(
+            **volumes,
+            days=options['days'],
+            alpha=options['alpha'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            search_index=not options['no_search_index'],
+            progress=self.progress,
+        ).run()
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f'{name}: {value}' for name, value in created.items())
+        ))
+
+    def progress(self, stage, done, total):
+        self.stderr.write(f'\r{stage}: {done}/{total}', ending='')
+        if done >= total:
+            self.stderr.write('')
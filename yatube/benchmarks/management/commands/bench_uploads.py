@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks import uploads
+
+
+class Command(BaseCommand):
+    help = ('Загружает большую JPEG-фотографию через разбор multipart-формы '
+            'и сравнивает время, пик памяти Python (tracemalloc), прирост '
+            'пикового RSS и размер сохранённого файла: загрузка Django по '
+            'умолчанию (django), полное декодирование с уменьшением '
+            '(decode) и потоковый конвейер posts.images (pipeline).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modes', nargs='+', default=list(uploads.MODES),
+            choices=list(uploads.MODES)
+        )
+        parser.add_argument('--width', type=int, default=6000)
+        parser.add_argument('--height', type=int, default=4000)
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Прогонов каждого режима; печатается '
+                                 'лучший по времени.')
+
+    def handle(self, *args, **options):
+        if min(options['width'], options['height'],
+               options['repeat']) < 1:
+            raise CommandError(
+                '--width, --height и --repeat должны быть > 0'
+            )
+        content = uploads.sample(options['width'], options['height'])
+        self.stdout.write(
+            f'картинка {options["width"]}×{options["height"]}, '
+            f'{len(content) / 2 ** 20:.1f} МБ'
+        )
+        self.stdout.write(
+            f'{"режим":<10} {"мс":>8} {"heap, МБ":>9} {"RSS, МБ":>9} '
+            f'{"файл, МБ":>9}'
+        )
+        for mode in options['modes']:
+            result = min(
+                (uploads.measure(mode, content)
+                 for _ in range(options['repeat'])),
+                key=lambda result: result['ms']
+            )
+            self.stdout.write(
+                f'{mode:<10} {result["ms"]:>8} {result["heap_mb"]:>9} '
+                f'{result["rss_mb"]:>9} {result["stored_mb"]:>9}'
+            )
@@ -0,0 +1,106 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks import harness
+
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks',
+                                'baseline.json')
+
+
+class Command(BaseCommand):
+    help = ('Нагружает ленты, пост и пишущие view через тестовый клиент '
+            'или WSGI-сервер и печатает p50/p95/p99, запросы к базе на '
+            'ответ и регрессии относительно базового замера. Данные для '
+            'замера создаёт bench_seed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--driver', choices=('client', 'wsgi'), default='client'
+        )
+        parser.add_argument(
+            '--url',
+            help='Адрес внешнего сервера для --driver wsgi; без него '
+                 'сервер поднимается в этом процессе.'
+        )
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--only', nargs='+', metavar='SCENARIO',
+            help='Только эти сценарии, например index:guest.'
+        )
+        parser.add_argument(
+            '--no-writes', action='store_true',
+            help='Не запускать пишущие сценарии.'
+        )
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help='Записать результаты как новый базовый замер.'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Допустимый рост p95 относительно базового замера.'
+        )
+        parser.add_argument(
+            '--fail-on-regression', action='store_true',
+            help='Завершиться с ошибкой, если есть регрессии.'
+        )
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('--requests и --concurrency должны быть > 0')
+        try:
+            reader, scenarios = harness.default_scenarios()
+        except ValueError as error:
+            raise CommandError(error)
+        if options['only']:
+            unknown = set(options['only']) - {
+                scenario.name for scenario in scenarios
+            }
+            if unknown:
+                raise CommandError(
+                    f'Неизвестные сценарии: {", ".join(sorted(unknown))}'
+                )
+            scenarios = [scenario for scenario in scenarios
+                         if scenario.name in options['only']]
+        if options['driver'] == 'client':
+            driver = harness.ClientDriver(reader)
+        else:
+            driver = harness.ServerDriver(reader, options['url'])
+        self.stdout.write(
+            f'{"сценарий":<22} {"запросов/с":>10} {"p50, мс":>9} '
+            f'{"p95, мс":>9} {"p99, мс":>9} {"SQL":>6} {"ошибок":>7}'
+        )
+        results = harness.run(
+            driver, scenarios,
+            requests_count=options['requests'],
+            concurrency=options['concurrency'],
+            warmup=options['warmup'],
+            include_writes=not options['no_writes'],
+            progress=self.report,
+        )
+        if options['save_baseline']:
+            harness.save_baseline(options['baseline'], driver.name, results)
+            self.stdout.write(self.style.SUCCESS(
+                f'Базовый замер записан в {options["baseline"]}'
+            ))
+            return
+        baseline = harness.load_baseline(options['baseline'])
+        regressions = harness.compare(
+            results, baseline.get(driver.name, {}), options['tolerance']
+        )
+        for line in regressions:
+            self.stdout.write(self.style.ERROR(f'Регрессия: {line}'))
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'Регрессий: {len(regressions)}')
+
+    def report(self, name, result):
+        queries = '-' if result['queries'] is None else result['queries']
+        self.stdout.write(
+            f'{name:<22} {result["rps"]:>10} {result["p50"]:>9} '
+            f'{result["p95"]:>9} {result["p99"]:>9} {queries:>6} '
+            f'{result["errors"]:>7}'
+        )
@@ -0,0 +1,27 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TransactionTestCase
+
+from benchmarks import concurrency
+from benchmarks.tests.test_harness import seed
+
+
+class BenchAsgiTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        seed()
+
+    def test_all_modes_run(self):
+        """Каждый режим отвечает на запросы без ошибок."""
+        out = StringIO()
+        call_command('bench_asgi', requests=4, concurrency=2, threads=2,
+                     delay=1, only=['profile:user'], stdout=out)
+        lines = out.getvalue().splitlines()[1:]
+        self.assertEqual(
+            [line.split()[:2] for line in lines],
+            [['profile:user', mode] for mode in concurrency.MODES]
+        )
+        for line in lines:
+            self.assertEqual(line.split()[-1], '0')
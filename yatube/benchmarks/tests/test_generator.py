@@ -0,0 +1,65 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F, Sum
+from django.test import TestCase
+
+from benchmarks.generator import PREFIX, Generator, clear
+from posts.models import Comment, Follow, Group, Post, Profile, TimelineEntry
+
+User = get_user_model()
+
+
+class GeneratorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.created = Generator(
+            users=40, groups=3, posts=300, follows=6, comments=400, seed=1,
+            batch_size=100
+        ).run()
+
+    def test_volumes(self):
+        """Создаётся заказанное число объектов."""
+        self.assertEqual(
+            User.objects.filter(username__startswith=PREFIX).count(), 40
+        )
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 400)
+        self.assertEqual(Follow.objects.count(), self.created['follows'])
+
+    def test_denormalized_data_is_rebuilt(self):
+        """Счётчики и ленты подписок перестроены после bulk_create."""
+        totals = Profile.objects.aggregate(
+            posts=Sum('posts_count'), followers=Sum('followers_count')
+        )
+        self.assertEqual(totals['posts'], 300)
+        self.assertEqual(totals['followers'], Follow.objects.count())
+        self.assertEqual(
+            Post.objects.aggregate(total=Sum('comments_count'))['total'], 400
+        )
+        self.assertTrue(TimelineEntry.objects.exists())
+
+    def test_popularity_is_skewed(self):
+        """Самый популярный автор собирает намного больше медианы."""
+        followers = sorted(
+            Profile.objects.values_list('followers_count', flat=True)
+        )
+        self.assertGreater(followers[-1], 3 * followers[len(followers) // 2])
+
+    def test_comments_follow_posts(self):
+        """Комментарий не старше своего поста."""
+        self.assertFalse(
+            Comment.objects.filter(created__lt=F('post__pub_date')).exists()
+        )
+
+
+class ClearTests(TestCase):
+    def test_clear(self):
+        """clear удаляет пользователей бенчмарка и их данные."""
+        Generator(users=5, groups=1, posts=10, follows=2, comments=5).run()
+        clear()
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Group.objects.exists())
+        self.assertFalse(
+            User.objects.filter(username__startswith=PREFIX).exists()
+        )
@@ -0,0 +1,107 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import LiveServerTestCase, SimpleTestCase, TestCase
+
+from benchmarks import harness
+from benchmarks.generator import Generator
+
+
+def seed():
+    Generator(users=10, groups=2, posts=30, follows=3, comments=20,
+              seed=1).run()
+
+
+class CompareTests(SimpleTestCase):
+    def result(self, p95, queries):
+        return {'p95': p95, 'queries': queries}
+
+    def test_percentile(self):
+        """Перцентиль — значение нужного ранга в отсортированном списке."""
+        values = list(range(1, 101))
+        self.assertEqual(harness.percentile(values, 0.5), 51)
+        self.assertEqual(harness.percentile(values, 0.99), 100)
+        self.assertEqual(harness.percentile([], 0.5), 0)
+
+    def test_regressions(self):
+        """Регрессия — рост p95 сверх допуска или рост числа запросов."""
+        baseline = {
+            'index:guest': self.result(10, 1),
+            'profile:user': self.result(10, 5),
+            'post_detail:user': self.result(10, 4),
+        }
+        results = {
+            'index:guest': self.result(11.5, 1),
+            'profile:user': self.result(13, 5),
+            'post_detail:user': self.result(5, 6),
+            'follow_index:user': self.result(50, 9),
+        }
+        regressions = harness.compare(results, baseline, tolerance=0.2)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('profile:user: p95'))
+        self.assertTrue(regressions[1].startswith('post_detail:user: 6'))
+
+
+class ClientHarnessTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        seed()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_all_scenarios_run(self):
+        """Все сценарии отвечают без ошибок и считают запросы к базе."""
+        reader, scenarios = harness.default_scenarios()
+        results = harness.run(
+            harness.ClientDriver(reader), scenarios, requests_count=3,
+            warmup=1
+        )
+        self.assertEqual(set(results),
+                         {scenario.name for scenario in scenarios})
+        for name, result in results.items():
+            with self.subTest(scenario=name):
+                self.assertEqual(result['requests'], 3)
+                self.assertEqual(result['errors'], 0)
+                self.assertIsNotNone(result['queries'])
+                self.assertLessEqual(result['p50'], result['p99'])
+
+    def test_command_saves_baseline(self):
+        """bench_views записывает базовый замер и печатает сценарии."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'baseline.json')
+        out = StringIO()
+        call_command('bench_views', '--requests', '2', '--warmup', '0',
+                     '--only', 'index:guest', 'profile:user',
+                     '--baseline', path, '--save-baseline', stdout=out)
+        with open(path, encoding='utf-8') as stream:
+            baseline = json.load(stream)
+        self.assertEqual(set(baseline['client']),
+                         {'index:guest', 'profile:user'})
+        self.assertIn('index:guest', out.getvalue())
+
+
+class ServerHarnessTests(LiveServerTestCase):
+    def setUp(self):
+        cache.clear()
+        seed()
+
+    def test_reads_through_http(self):
+        """Через HTTP-сервер ленты отдаются и гостю, и пользователю."""
+        reader, scenarios = harness.default_scenarios()
+        reads = [scenario for scenario in scenarios if not scenario.write]
+        results = harness.run(
+            harness.ServerDriver(reader, self.live_server_url), reads,
+            requests_count=2, warmup=0
+        )
+        for name, result in results.items():
+            with self.subTest(scenario=name):
+                self.assertEqual(result['errors'], 0)
+                # Сервер внешний: запросы к базе не видны.
+                self.assertIsNone(result['queries'])
@@ -0,0 +1,20 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from benchmarks import uploads
+
+
+@override_settings(POST_IMAGE_MAX_DIMENSION=100)
+class BenchUploadsTests(SimpleTestCase):
+    def test_all_modes_run(self):
+        """Каждый режим сохраняет картинку; конвейер — уменьшенную."""
+        out = StringIO()
+        call_command('bench_uploads', width=400, height=300, repeat=1,
+                     stdout=out)
+        rows = {line.split()[0]: line.split()[1:]
+                for line in out.getvalue().splitlines()[2:]}
+        self.assertEqual(list(rows), list(uploads.MODES))
+        stored = {mode: float(row[-1]) for mode, row in rows.items()}
+        self.assertLess(stored['pipeline'], stored['django'])
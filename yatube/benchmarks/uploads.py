@@ -0,0 +1,154 @@
+"""Память и время загрузки большой фотографии в пост.
+
+Запрос с картинкой собирается как настоящая multipart-форма и
+разбирается ``MultiPartParser`` — так же, как в view. Режимы:
+
+* ``django`` — обработчики загрузок Django по умолчанию, проверка
+  ``forms.ImageField`` и сохранение оригинала как есть (так посты
+  сохраняли картинки раньше);
+* ``decode`` — то же, но картинка декодируется целиком, уменьшается
+  и сохраняется: наивная обработка;
+* ``pipeline`` — ``core.uploads`` и ``posts.images``: загрузка сразу
+  на диск с хешем, JPEG декодируется уже уменьшенным.
+
+Каждый прогон пишет в свою временную папку, поэтому ``pipeline`` не
+находит готовый файл и обрабатывает картинку заново.
+
+Пиксели Pillow хранит вне кучи Python, и ``tracemalloc`` их не видит:
+его пик — это копии тела запроса и файла в памяти. Поэтому печатается
+и прирост пикового RSS процесса (``VmHWM``, который на Linux
+сбрасывается записью в ``/proc/self/clear_refs``); где это недоступно,
+вместо него ``-``.
+"""
+import os
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+
+from django import forms
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import load_handler
+from django.http.multipartparser import MultiPartParser
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from PIL import Image
+
+from core.uploads import StreamingUploadHandler
+from posts import images
+
+DEFAULT_HANDLERS = (
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+)
+
+
+def sample(width, height, quality=90):
+    """JPEG-«фотография» из шума: весит как снимок камеры того же
+    разрешения (24 Мпикс — около 10 МБ)."""
+    channels = [Image.effect_noise((width, height), 16) for _ in 'RGB']
+    content = BytesIO()
+    Image.merge('RGB', channels).save(content, 'JPEG', quality=quality)
+    return content.getvalue()
+
+
+def parse(body, handlers):
+    meta = {'CONTENT_TYPE': MULTIPART_CONTENT,
+            'CONTENT_LENGTH': str(len(body))}
+    return MultiPartParser(meta, BytesIO(body), handlers).parse()[1]['image']
+
+
+def default_handlers():
+    return [load_handler(path) for path in DEFAULT_HANDLERS]
+
+
+def save_original(upload, storage):
+    storage.save(f'posts/{upload.name}', upload)
+
+
+def save_decoded(upload, storage):
+    upload.seek(0)
+    limit = settings.POST_IMAGE_MAX_DIMENSION
+    with Image.open(upload) as image:
+        image.load()
+        image.thumbnail((limit, limit), Image.LANCZOS)
+        content = BytesIO()
+        image.save(content, image.format,
+                   quality=settings.POST_IMAGE_QUALITY)
+    storage.save(f'posts/{upload.name}', content)
+
+
+def save_prepared(upload, storage):
+    prepared = images.prepare(upload, storage)
+    storage.save(images.UPLOAD_TO + prepared.name, prepared)
+
+
+# Режим: (обработчики загрузок, сохранение картинки).
+MODES = {
+    'django': (default_handlers, save_original),
+    'decode': (default_handlers, save_decoded),
+    'pipeline': (lambda: [StreamingUploadHandler()], save_prepared),
+}
+
+
+def run(mode, body, storage):
+    """Разобрать форму, проверить картинку и сохранить её, как view."""
+    handlers, save = MODES[mode]
+    upload = forms.ImageField().clean(parse(body, handlers()))
+    try:
+        save(upload, storage)
+    finally:
+        # Запрос закрывает загрузки сам, здесь это нужно сделать явно.
+        upload.close()
+
+
+def rss_kb(field):
+    """Поле ``/proc/self/status`` в КБ или ``None``."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss():
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        return False
+    return True
+
+
+def measure(mode, content):
+    """Время, пик tracemalloc и прирост пикового RSS (МБ) одного прогона."""
+    upload = BytesIO(content)
+    upload.name = 'photo.jpg'
+    body = encode_multipart(BOUNDARY, {'text': 'Пост', 'image': upload})
+    with tempfile.TemporaryDirectory() as media_root:
+        storage = FileSystemStorage(location=media_root)
+        rss_start = rss_kb('VmRSS') if reset_peak_rss() else None
+        tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            run(mode, body, storage)
+            elapsed = time.perf_counter() - started
+            _, heap_peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        rss_peak = rss_kb('VmHWM') if rss_start is not None else None
+        stored = sum(
+            os.path.getsize(os.path.join(path, name))
+            for path, _, names in os.walk(media_root) for name in names
+        )
+    return {
+        'ms': round(elapsed * 1000, 1),
+        'heap_mb': round(heap_peak / 2 ** 20, 1),
+        'rss_mb': '-' if rss_peak is None else round(
+            max(rss_peak - rss_start, 0) / 1024, 1
+        ),
+        'stored_mb': round(stored / 2 ** 20, 2),
+    }
@@ -0,0 +1,100 @@
+"""Асинхронные view поверх синхронного Django 2.2.
+
+Django 2.2 вызывает view синхронно, а ORM блокирует поток. ``async_view``
+делает из ``async def`` обычную view: корутина выполняется в цикле
+событий потока запроса, а работу с базой отдаёт ``await db(func, ...)``
+ограниченному пулу из ``ASYNC_DB_THREADS`` потоков. Независимые части
+страницы (страница ленты, подписка, сам объект) запрашиваются
+одновременно через ``gather``, и ответ ждёт самый медленный запрос,
+а не их сумму. View с одним запросом асинхронной делать незачем: она
+получит только лишний переход в поток пула.
+
+У каждого потока пула своё соединение с базой, поэтому вместе с функцией
+туда переносится контекст запроса: реплика ``read_from_replica`` и
+метрики ``core.metrics`` (запросы пула входят в бюджет страницы).
+Соединения пула закрываются по тем же правилам, что и соединения
+запросов: после ошибок и по ``CONN_MAX_AGE``.
+
+При ``ASYNC_DB_INLINE`` и внутри транзакции функции выполняются сразу
+в потоке запроса: незафиксированные данные транзакции (и ``TestCase``)
+видны только её соединению.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from . import metrics, replicas
+
+_executor = None
+_executor_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_DB_THREADS,
+                thread_name_prefix='async-db'
+            )
+        return _executor
+
+
+def call_in_context(context, func):
+    """Выполнить ``func`` в потоке пула с репликой и метриками запроса."""
+    alias, request_metrics = context
+    close_old_connections()
+    try:
+        with replicas.using(alias), metrics.attached(request_metrics):
+            return func()
+    finally:
+        close_old_connections()
+
+
+async def db(func, *args, **kwargs):
+    """Выполнить синхронную ``func`` (ORM) в пуле потоков базы."""
+    if settings.ASYNC_DB_INLINE or connection.in_atomic_block:
+        return func(*args, **kwargs)
+    context = (replicas.current(), metrics.current())
+    return await asyncio.get_running_loop().run_in_executor(
+        get_executor(),
+        partial(call_in_context, context, partial(func, *args, **kwargs))
+    )
+
+
+async def gather(*calls):
+    """``asyncio.gather``, который при ошибке дожидается всех вызовов.
+
+    Иначе исключение одного вызова (Http404) вышло бы из view, пока
+    потоки пула ещё выполняют запросы остальных, и их результат или
+    ошибку никто бы не забрал.
+    """
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+
+def run(coroutine):
+    """Выполнить корутину в цикле событий этого потока и вернуть итог."""
+    loop = getattr(_local, 'loop', None)
+    if loop is None or loop.is_closed():
+        # Цикл создаётся один раз на поток: новый на каждый запрос дороже.
+        loop = _local.loop = asyncio.new_event_loop()
+    return loop.run_until_complete(coroutine)
+
+
+def async_view(view):
+    """Сделать из ``async def`` view синхронную, понятную Django 2.2."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        return run(view(request, *args, **kwargs))
+
+    return wrapper
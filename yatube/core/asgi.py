@@ -0,0 +1,220 @@
+"""ASGI-приложение поверх WSGI-обработчика Django.
+
+Django 2.2 не умеет ASGI, а его обработчик запросов синхронный.
+``AsgiHandler`` принимает запросы ASGI-сервера (uvicorn, daphne,
+hypercorn) в цикле событий, собирает WSGI-окружение и выполняет
+``WSGIHandler`` в ограниченном пуле из ``ASGI_THREADS`` потоков. Медленная
+база занимает поток пула, но не цикл событий: соединения принимаются
+и ждут свободного потока в очереди, а не в очереди сокета.
+
+Тело запроса копится в ``SpooledTemporaryFile`` — большое тело уходит на
+диск, а не в память. Обычный ответ отдаётся одним сообщением, потоковый
+(``StreamingHttpResponse``) — по частям, и каждая часть читается
+в пуле. Поддерживается протокол ``lifespan``; WebSocket — нет.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import SEEK_END
+from tempfile import SpooledTemporaryFile
+
+import django
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+
+
+def get_asgi_application():
+    """Публичная точка входа ASGI, как ``get_wsgi_application``."""
+    django.setup(set_prefix=False)
+    return AsgiHandler(WSGIHandler())
+
+
+def build_environ(scope, body):
+    """WSGI-окружение по ``scope`` HTTP-запроса ASGI и файлу тела."""
+    # WSGI хранит байты пути строкой latin-1 (PEP 3333).
+    path = scope['path']
+    root_path = scope.get('root_path', '')
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode().decode('latin-1'),
+        'PATH_INFO': path.encode().decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'REMOTE_ADDR': client[0],
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': _Errors(),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        if name in environ:
+            # Повторённый заголовок склеивается, cookie — через «; ».
+            separator = '; ' if name == 'HTTP_COOKIE' else ','
+            value = f'{environ[name]}{separator}{value}'
+        environ[name] = value
+    # Тело уже прочитано целиком, поэтому длина известна, даже если
+    # клиент прислал его частями (chunked) без Content-Length.
+    length = body.seek(0, SEEK_END)
+    body.seek(0)
+    if length and 'CONTENT_LENGTH' not in environ:
+        environ['CONTENT_LENGTH'] = str(length)
+    return environ
+
+
+class _Errors:
+    """``wsgi.errors``: Django пишет ошибки в логи, а не сюда."""
+
+    def write(self, data):
+        pass
+
+    def writelines(self, lines):
+        pass
+
+    def flush(self):
+        pass
+
+
+class AsgiHandler:
+    """ASGI-приложение: WSGI-приложение ``application`` в пуле потоков."""
+
+    def __init__(self, application, threads=None):
+        self.application = application
+        self.threads = threads
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.threads or settings.ASGI_THREADS,
+                    thread_name_prefix='asgi'
+                )
+            return self._executor
+
+    def close(self):
+        """Дождаться запросов в пуле и остановить его."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            await self.handle_http(scope, receive, send)
+        elif scope['type'] == 'lifespan':
+            await self.handle_lifespan(receive, send)
+        else:
+            raise ValueError(f'Протокол {scope["type"]} не поддерживается')
+
+    async def handle_lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                # Не в своём пуле: close ждёт его потоки.
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self.close
+                )
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def in_pool(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, func, *args
+        )
+
+    async def read_body(self, receive):
+        """Тело запроса в файле или ``None``, если клиент ушёл."""
+        body = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                return body
+
+    async def handle_http(self, scope, receive, send):
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        try:
+            status, headers, content, response = await self.in_pool(
+                self.respond, build_environ(scope, body)
+            )
+            await send({
+                'type': 'http.response.start',
+                'status': status,
+                'headers': headers,
+            })
+            if response is None:
+                await send({'type': 'http.response.body', 'body': content})
+            else:
+                await self.stream(content, response, send)
+        finally:
+            body.close()
+
+    def respond(self, environ):
+        """Выполнить WSGI-приложение в потоке пула.
+
+        Возвращает ``(статус, заголовки, тело, ответ)``. У потокового
+        ответа тело — первая часть (до неё приложение может не вызвать
+        ``start_response``), а остальные части читает ``stream``.
+        """
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            # Set-Cookie от Django начинается с пробела.
+            started['headers'] = [
+                (name.lower().encode('latin-1'),
+                 value.strip().encode('latin-1'))
+                for name, value in headers
+            ]
+
+        response = self.application(environ, start_response)
+        if getattr(response, 'streaming', True):
+            chunks = iter(response)
+            first = next(chunks, b'')
+            return (started['status'], started['headers'], first,
+                    (response, chunks))
+        try:
+            content = b''.join(response)
+        finally:
+            # Здесь Django шлёт request_finished и закрывает соединения
+            # с базой этого потока.
+            response.close()
+        return started['status'], started['headers'], content, None
+
+    async def stream(self, first, response, send):
+        response, chunks = response
+        try:
+            chunk = first
+            while chunk is not None:
+                await send({'type': 'http.response.body', 'body': chunk,
+                            'more_body': True})
+                chunk = await self.in_pool(next, chunks, None)
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            close = getattr(response, 'close', None)
+            if close is not None:
+                await self.in_pool(close)
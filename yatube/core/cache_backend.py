@@ -0,0 +1,296 @@
+"""Двухуровневый кэш: LRU в памяти процесса перед общим бэкендом.
+
+L1 — ограниченный по размеру словарь в памяти процесса (общий для всех
+потоков, как у ``LocMemCache``). L2 — любой настроенный алиас
+``CACHES`` (файловый кэш, Redis и т.п.), общий для всех воркеров.
+
+Каждая запись или удаление публикует в L2 одно сообщение об инвалидации:
+номер из общего счётчика и имена всех ключей операции (``set_many`` —
+одно сообщение на все ключи). Публикация — два обращения к L2: ``incr``
+счётчика и запись сообщения. Воркеры не чаще раза в ``SYNC_INTERVAL``
+секунд читают счётчик и выбрасывают из своего L1 изменённые другими
+ключи; если сообщений слишком много или часть уже вытеснена, L1
+очищается целиком. L2 читается без блокировки L1: другие потоки в это
+время отвечают из памяти.
+
+Номер сообщения должен быть уникальным, иначе два воркера запишут
+сообщения под одним номером и одна инвалидация потеряется. ``incr``
+Redis и memcached атомарен, а у файлового кэша Django — нет (прочитать,
+прибавить, записать), поэтому для него публикация и ``incr`` идут под
+``flock`` на файле в папке кэша. Файловый кэш и так общий только
+в пределах хоста, как и блокировка.
+
+Пример настройки::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backend.TieredCache',
+            'LOCATION': 'shared',
+            'OPTIONS': {'L1_MAX_ENTRIES': 1000, 'L1_TIMEOUT': 5},
+        },
+        'shared': {...},
+    }
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировки файлов нет.
+    fcntl = None
+
+SEQUENCE_KEY = 'tiered:sequence'
+MESSAGE_KEY = 'tiered:message:{}'
+LOCK_FILE = 'tiered.lock'
+
+_stores = {}
+_stores_lock = threading.Lock()
+_missing = object()
+
+
+@contextmanager
+def _file_lock(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class LocalStore:
+    """Содержимое L1 и состояние синхронизации одного процесса."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.entries = OrderedDict()
+        self.seen_sequence = None
+        self.synced_at = 0.0
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = location
+        self._max_entries = int(options.get('L1_MAX_ENTRIES', 1000))
+        self._l1_timeout = float(options.get('L1_TIMEOUT', 5))
+        self._sync_interval = float(options.get('SYNC_INTERVAL', 1))
+        self._max_messages = int(options.get('MAX_MESSAGES', 500))
+        self._message_timeout = int(options.get('MESSAGE_TIMEOUT', 300))
+        with _stores_lock:
+            self._store = _stores.setdefault(location, LocalStore())
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    # Локальный уровень.
+
+    def _local_get(self, key):
+        entry = self._store.entries.get(key, _missing)
+        if entry is _missing:
+            return _missing
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._store.entries[key]
+            return _missing
+        self._store.entries.move_to_end(key)
+        return value
+
+    def _local_set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        ttl = self._l1_timeout
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is not None:
+            ttl = min(ttl, timeout - time.time())
+        if ttl <= 0:
+            self._store.entries.pop(key, None)
+            return
+        self._store.entries[key] = (time.monotonic() + ttl, value)
+        self._store.entries.move_to_end(key)
+        while len(self._store.entries) > self._max_entries:
+            self._store.entries.popitem(last=False)
+
+    # Сообщения об инвалидации.
+
+    def _publish(self, *keys):
+        if not keys:
+            return
+        shared = self.shared
+        with self._incr_lock(shared):
+            try:
+                sequence = shared.incr(SEQUENCE_KEY)
+            except ValueError:
+                # Счётчика ещё нет или его вытеснили.
+                shared.add(SEQUENCE_KEY, 0, None)
+                try:
+                    sequence = shared.incr(SEQUENCE_KEY)
+                except ValueError:
+                    return
+            shared.set(MESSAGE_KEY.format(sequence), keys,
+                       self._message_timeout)
+
+    @staticmethod
+    def _incr_lock(shared):
+        """Блокировка для ``incr`` общего кэша, если тот не атомарен."""
+        if not isinstance(shared, FileBasedCache) or fcntl is None:
+            return nullcontext()
+        return _file_lock(os.path.join(shared._dir, LOCK_FILE))
+
+    def _sync(self):
+        store = self._store
+        with store.lock:
+            now = time.monotonic()
+            if now - store.synced_at < self._sync_interval:
+                return
+            store.synced_at = now
+            seen = store.seen_sequence
+        sequence, messages = self._read_messages(seen)
+        with store.lock:
+            if store.seen_sequence != seen:
+                # Пока читался L2, clear() сбросил состояние.
+                return
+            self._apply_messages(seen, sequence, messages)
+
+    def _read_messages(self, seen):
+        """Счётчик L2 и сообщения после ``seen``, если их стоит читать."""
+        sequence = self.shared.get(SEQUENCE_KEY)
+        if (seen is None or sequence is None
+                or not seen < sequence <= seen + self._max_messages):
+            return sequence, None
+        wanted = [MESSAGE_KEY.format(number)
+                  for number in range(seen + 1, sequence + 1)]
+        messages = self.shared.get_many(wanted)
+        if len(messages) < len(wanted):
+            return sequence, None
+        return sequence, messages
+
+    def _apply_messages(self, seen, sequence, messages):
+        store = self._store
+        if sequence is None:
+            # Общий кэш очищен: доверять локальным копиям нельзя.
+            if seen:
+                store.entries.clear()
+            store.seen_sequence = 0
+            return
+        if seen is not None and sequence != seen:
+            if messages is None:
+                # Сообщений слишком много, часть вытеснена или счётчик
+                # начат заново.
+                store.entries.clear()
+            else:
+                for keys in messages.values():
+                    for key in keys:
+                        store.entries.pop(key, None)
+        store.seen_sequence = sequence
+
+    # API кэша Django.
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            cache_key = self.make_key(key, version)
+            with self._store.lock:
+                self._local_set(cache_key, value, timeout)
+            self._publish(cache_key)
+        return added
+
+    def get(self, key, default=None, version=None):
+        cache_key = self.make_key(key, version)
+        self._sync()
+        with self._store.lock:
+            value = self._local_get(cache_key)
+        if value is not _missing:
+            return value
+        value = self.shared.get(key, _missing, version)
+        if value is _missing:
+            return default
+        with self._store.lock:
+            self._local_set(cache_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        self._sync()
+        with self._store.lock:
+            for key in keys:
+                value = self._local_get(self.make_key(key, version))
+                if value is _missing:
+                    missing.append(key)
+                else:
+                    found[key] = value
+        if missing:
+            fetched = self.shared.get_many(missing, version)
+            with self._store.lock:
+                for key, value in fetched.items():
+                    self._local_set(self.make_key(key, version), value)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        cache_key = self.make_key(key, version)
+        with self._store.lock:
+            self._local_set(cache_key, value, timeout)
+        self._publish(cache_key)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version)
+        cache_keys = []
+        with self._store.lock:
+            for key, value in data.items():
+                cache_key = self.make_key(key, version)
+                cache_keys.append(cache_key)
+                if key in failed:
+                    self._store.entries.pop(cache_key, None)
+                else:
+                    self._local_set(cache_key, value, timeout)
+        self._publish(*cache_keys)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        # Версии областей (core.caching) растут через incr: два воркера
+        # не должны получить одну версию.
+        with self._incr_lock(self.shared):
+            value = self.shared.incr(key, delta, version)
+        cache_key = self.make_key(key, version)
+        with self._store.lock:
+            self._local_set(cache_key, value)
+        self._publish(cache_key)
+        return value
+
+    def has_key(self, key, version=None):
+        return self.get(key, _missing, version) is not _missing
+
+    def delete(self, key, version=None):
+        self.shared.delete(key, version)
+        cache_key = self.make_key(key, version)
+        with self._store.lock:
+            self._store.entries.pop(cache_key, None)
+        self._publish(cache_key)
+
+    def delete_many(self, keys, version=None):
+        self.shared.delete_many(keys, version)
+        cache_keys = [self.make_key(key, version) for key in keys]
+        with self._store.lock:
+            for cache_key in cache_keys:
+                self._store.entries.pop(cache_key, None)
+        self._publish(*cache_keys)
+
+    def clear(self):
+        self.shared.clear()
+        with self._store.lock:
+            self._store.entries.clear()
+            self._store.seen_sequence = 0
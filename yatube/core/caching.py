@@ -0,0 +1,169 @@
+"""Версии кэша по областям и счётчики попаданий во фрагменты.
+
+Вместо поиска и удаления ключей при изменении данных увеличивается
+версия области (``feed``, ``groups`` ...), а версия входит в ключ
+фрагмента: старые записи просто перестают читаться и вытесняются по TTL.
+
+Для валидаторов HTTP (ETag, Last-Modified) у областей есть ещё время
+последнего изменения: ``mark_modified`` и ``get_modified``.
+
+Имя области входит в ключ хэшем: слаги и имена пользователей бывают
+с пробелами и длинными, а memcached таких ключей не принимает.
+``mark_modified`` заодно увеличивает версии областей — на них построены
+ключи кэша целых страниц (``core.page_cache``).
+
+Разметка, которая показывает временное состояние (например, заглушку
+миниатюры, которая вот-вот появится), отмечается ``mark_temporary``:
+кэш фрагментов и страниц её не сохраняет, а ответ не получает
+валидаторов. Тогда готовность не требует увеличивать версии областей.
+"""
+import hashlib
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.core.cache import cache
+
+VERSION_KEY = 'cache_version:{}'
+MODIFIED_KEY = 'cache_modified:{}'
+
+
+def scope_key(template, scope):
+    """Ключ области ``scope`` по шаблону ``VERSION_KEY``/``MODIFIED_KEY``."""
+    return template.format(hashlib.md5(str(scope).encode()).hexdigest())
+
+
+def get_versions(*scopes):
+    """Вернуть текущие версии областей одной выборкой из кэша."""
+    keys = [scope_key(VERSION_KEY, scope) for scope in scopes]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        if key not in found:
+            seed = new_version()
+            cache.add(key, seed, None)
+            found[key] = cache.get(key, seed)
+        versions.append(found[key])
+    return versions
+
+
+def get_version(scope):
+    return get_versions(scope)[0]
+
+
+def new_version():
+    """Начальная версия области — время в миллисекундах.
+
+    Версию могут вытеснить из кэша, а ключи со старой версией остаются
+    до своего TTL. Если бы версия снова начиналась с единицы, счётчик
+    со временем вернулся бы к старому значению и ожили бы устаревшие
+    страницы; время же больше прежних значений счётчика.
+    """
+    return int(time.time() * 1000)
+
+
+def bump_version(scope):
+    key = scope_key(VERSION_KEY, scope)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Версии ещё нет (или её вытеснили). Между add и incr ключ тоже
+        # может пропасть, поэтому новое значение просто записывается.
+        version = new_version()
+        cache.set(key, version, None)
+        return version
+
+
+def mark_modified(*scopes):
+    """Запомнить, что данные областей изменились сейчас."""
+    now = time.time()
+    cache.set_many(
+        {scope_key(MODIFIED_KEY, scope): now for scope in scopes}, None
+    )
+    for scope in scopes:
+        bump_version(scope)
+
+
+def get_modified(*scopes):
+    """Время (Unix) последнего изменения любой из областей.
+
+    Область, о которой кэш ничего не знает (ещё не менялась или
+    вытеснена), считается изменённой сейчас: лишний полный ответ лучше
+    устаревшего 304.
+    """
+    keys = [scope_key(MODIFIED_KEY, scope) for scope in scopes]
+    found = cache.get_many(keys)
+    now = time.time()
+    for key in keys:
+        if key not in found:
+            cache.add(key, now, None)
+            found[key] = cache.get(key, now)
+    return max(found.values())
+
+
+class RenderTracker:
+    """Итог рендера внутри ``track_temporary``."""
+
+    temporary = False
+
+
+_render = threading.local()
+
+
+@contextmanager
+def track_temporary():
+    """Узнать, отметил ли рендер внутри блока свой вывод временным.
+
+    Блоки вкладываются (фрагмент внутри страницы): отметка внутреннего
+    блока переходит и во внешний.
+    """
+    outer = getattr(_render, 'tracker', None)
+    tracker = _render.tracker = RenderTracker()
+    try:
+        yield tracker
+    finally:
+        _render.tracker = outer
+        if outer is not None and tracker.temporary:
+            outer.temporary = True
+
+
+def mark_temporary():
+    """Текущий вывод скоро устареет сам по себе: не кэшировать его."""
+    tracker = getattr(_render, 'tracker', None)
+    if tracker is not None:
+        tracker.temporary = True
+
+
+class FragmentStats:
+    """Попадания и промахи фрагментного кэша в рамках процесса.
+
+    У каждого воркера свои счётчики: общий кэш добавил бы запись на
+    каждый фрагмент. ``/cache-stats/`` отдаёт счётчики ответившего
+    воркера вместе с его pid.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hits = Counter()
+        self._misses = Counter()
+
+    def record(self, name, hit):
+        with self._lock:
+            (self._hits if hit else self._misses)[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            names = set(self._hits) | set(self._misses)
+            return {
+                name: {'hits': self._hits[name], 'misses': self._misses[name]}
+                for name in sorted(names)
+            }
+
+    def reset(self):
+        with self._lock:
+            self._hits.clear()
+            self._misses.clear()
+
+
+fragment_stats = FragmentStats()
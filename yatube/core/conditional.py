@@ -0,0 +1,82 @@
+"""Условные ответы и заголовки кэширования для страниц анонимов.
+
+``anonymous_conditional(get_scopes)`` оборачивает view: для анонимного
+GET/HEAD ETag и Last-Modified строятся по времени изменения областей
+из ``core.caching.get_modified``, без запросов к базе. Если у клиента
+(или у обратного прокси) та же версия, view не вызывается и ответ —
+304. Полный ответ анониму помечается ``Cache-Control: public``,
+авторизованному — ``private``; ``Vary: Cookie`` не даёт прокси
+перепутать одних с другими.
+
+Ответ, который нельзя считать версией ``modified`` (реплика могла не
+увидеть изменение, в странице временная разметка), уходит без
+валидаторов и с ``Cache-Control: no-cache``.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+
+from .caching import get_modified, track_temporary
+from .replicas import may_be_stale
+
+
+def resolve_scopes(request, get_scopes, args, kwargs):
+    """Области view, вычисленные один раз на запрос.
+
+    ``get_scopes`` может обращаться к базе, а нужен он и условному
+    ответу, и кэшу страниц.
+    """
+    if not hasattr(request, '_cache_scopes'):
+        request._cache_scopes = list(get_scopes(*args, **kwargs))
+    return request._cache_scopes
+
+
+def anonymous_conditional(get_scopes):
+    """``get_scopes(*args, **kwargs)`` — области, которые показывает view."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated):
+                response = view(request, *args, **kwargs)
+                patch_cache_control(response, private=True)
+                patch_vary_headers(response, ('Cookie',))
+                return response
+            scopes = resolve_scopes(request, get_scopes, args, kwargs)
+            modified = get_modified(*scopes)
+            etag = quote_etag(hashlib.md5(
+                f'{modified!r}:{request.get_full_path()}'.encode()
+            ).hexdigest())
+            last_modified = int(modified)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                with track_temporary() as rendered:
+                    response = view(request, *args, **kwargs)
+                if response.status_code == 200 and (
+                        rendered.temporary or may_be_stale(scopes)):
+                    # Реплика могла ещё не увидеть изменение, а временная
+                    # разметка сменится без него: такую страницу нельзя
+                    # выдавать за версию ``modified``.
+                    patch_cache_control(response, no_cache=True)
+                    patch_vary_headers(response, ('Cookie',))
+                    return response
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                response['Last-Modified'] = http_date(last_modified)
+                patch_cache_control(
+                    response, public=True,
+                    max_age=settings.ANONYMOUS_CACHE_MAX_AGE
+                )
+            patch_vary_headers(response, ('Cookie',))
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,75 @@
+"""Пул соединений с базой, общий для потоков одного процесса.
+
+Django держит соединение за потоком: при ``CONN_MAX_AGE`` каждый поток
+сервера открывает своё и не отдаёт его другим, а при нуле соединение
+открывается на каждый запрос. Пул ограничивает число соединений
+процесса ``max_size`` и переиспользует их между потоками: закрытие
+соединения Django возвращает его в пул. Если свободных соединений нет,
+поток ждёт до ``timeout`` секунд.
+"""
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, connect, max_size, timeout=30, max_idle=300):
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.idle = deque()
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_size)
+
+    def acquire(self):
+        """Свободное соединение из пула или новое."""
+        if not self.slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(
+                f'Все {self.max_size} соединений пула заняты '
+                f'дольше {self.timeout} с'
+            )
+        try:
+            while True:
+                with self.lock:
+                    if not self.idle:
+                        break
+                    # Последнее возвращённое соединение — самое «тёплое».
+                    connection, released_at = self.idle.pop()
+                if time.monotonic() - released_at < self.max_idle:
+                    return connection
+                # Долго простоявшее соединение сервер мог уже закрыть.
+                self._close(connection)
+            return self.connect()
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def release(self, connection, discard=False):
+        """Вернуть соединение; ``discard`` — закрыть, а не переиспользовать."""
+        try:
+            if discard:
+                self._close(connection)
+            else:
+                with self.lock:
+                    self.idle.append((connection, time.monotonic()))
+        finally:
+            self.slots.release()
+
+    def close(self):
+        """Закрыть все свободные соединения."""
+        with self.lock:
+            idle, self.idle = self.idle, deque()
+        for connection, _ in idle:
+            self._close(connection)
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
@@ -0,0 +1,73 @@
+"""PostgreSQL с соединениями из пула ``core.db.pool``.
+
+``OPTIONS``: ``pool_size`` — сколько соединений процесс держит
+открытыми, ``pool_timeout`` — сколько секунд ждать свободного. Пул свой
+у каждого процесса (после fork сокеты родителя не используются) и у
+каждого набора параметров соединения.
+"""
+import os
+import threading
+
+from django.db.backends.postgresql import base
+from psycopg2.extensions import (TRANSACTION_STATUS_IDLE,
+                                 TRANSACTION_STATUS_UNKNOWN)
+
+from ..pool import ConnectionPool
+
+Database = base.Database
+OWN_OPTIONS = ('pool_size', 'pool_timeout')
+
+_pools = {}
+_lock = threading.Lock()
+
+
+def get_pool(key, connect, size, timeout):
+    with _lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(connect, size, timeout)
+        return pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        for option in OWN_OPTIONS:
+            params.pop(option, None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        options = self.settings_dict['OPTIONS']
+        key = (os.getpid(), self.alias, repr(sorted(conn_params.items())))
+        self.pool = get_pool(
+            key, lambda: Database.connect(**conn_params),
+            options.get('pool_size', 10), options.get('pool_timeout', 30)
+        )
+        connection = self.pool.acquire()
+        # Как в бэкенде Django: уровень изоляции из OPTIONS или тот,
+        # что у соединения по умолчанию.
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        connection = self.connection
+        try:
+            status = connection.get_transaction_status()
+            # Незавершённую транзакцию следующий владелец пула не должен
+            # унаследовать.
+            if status not in (TRANSACTION_STATUS_IDLE,
+                              TRANSACTION_STATUS_UNKNOWN):
+                connection.rollback()
+            usable = (not connection.closed
+                      and status != TRANSACTION_STATUS_UNKNOWN)
+        except Database.Error:
+            usable = False
+        self.pool.release(connection, discard=not usable)
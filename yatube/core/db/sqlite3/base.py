@@ -0,0 +1,59 @@
+"""SQLite с настройкой соединения: PRAGMA и режим начала транзакций.
+
+В ``OPTIONS`` понимает, кроме параметров ``sqlite3.connect``:
+
+* ``pragmas`` — словарь PRAGMA, которые выполняются на каждом новом
+  соединении (``busy_timeout``, ``synchronous`` и ``mmap_size`` действуют
+  только на соединение, поэтому ставить их один раз нельзя);
+* ``transaction_mode`` — ``DEFERRED``, ``IMMEDIATE`` или ``EXCLUSIVE``
+  для ``BEGIN`` в каждом ``transaction.atomic``.
+
+Без ``transaction_mode`` транзакция начинается с ``BEGIN IMMEDIATE``
+только в ``core.db.transactions.atomic_write``, остальные — как
+у Django.
+"""
+from django.db.backends.sqlite3 import base
+
+OWN_OPTIONS = ('pragmas', 'transaction_mode')
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+def apply_pragmas(connection, pragmas):
+    """Выполнить PRAGMA на соединении DB-API."""
+    cursor = connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            # Имена и значения PRAGMA нельзя передать параметрами запроса;
+            # они берутся из настроек, а не от пользователя.
+            cursor.execute(f'PRAGMA {name} = {value}')
+    finally:
+        cursor.close()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # Следующий BEGIN открывает транзакцию записи (atomic_write).
+    begin_write = False
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        for option in OWN_OPTIONS:
+            params.pop(option, None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        apply_pragmas(
+            connection, self.settings_dict['OPTIONS'].get('pragmas', {})
+        )
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        if mode is None and self.begin_write:
+            mode = 'IMMEDIATE'
+        if mode is None:
+            super()._start_transaction_under_autocommit()
+            return
+        if mode.upper() not in TRANSACTION_MODES:
+            raise ValueError(f'Неизвестный transaction_mode {mode!r}')
+        self.cursor().execute(f'BEGIN {mode.upper()}')
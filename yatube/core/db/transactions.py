@@ -0,0 +1,27 @@
+"""Транзакции записи.
+
+``atomic_write`` — ``transaction.atomic`` для блока, который будет
+писать. Бэкенд ``core.db.sqlite3`` начинает такую транзакцию с ``BEGIN
+IMMEDIATE``: писатель сразу берёт блокировку записи и ждёт её
+``busy_timeout``. Обычная (DEFERRED) транзакция, начавшая с чтения, не
+может перейти к записи, пока пишет другой, и падает без ожидания.
+Транзакции только для чтения так блокировку не занимают. Остальные
+бэкенды выполняют ``atomic_write`` как обычный ``atomic``.
+"""
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+@contextmanager
+def atomic_write(using=None):
+    connection = transaction.get_connection(using)
+    # BEGIN выполняет только внешний atomic: во вложенном блоке
+    # отметка ничего не меняет.
+    connection.begin_write = True
+    try:
+        with transaction.atomic(using=using):
+            connection.begin_write = False
+            yield
+    finally:
+        connection.begin_write = False
@@ -0,0 +1,183 @@
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connections
+
+from core.db import SQLITE_MODES, sqlite_config
+from core.db.transactions import atomic_write
+
+CURRENT = 'current'
+TABLES = ('bench_db_writes_posts', 'bench_db_writes_counters')
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность записи в базу под '
+            'конкурентной нагрузкой: потоки-писатели, как post_create, '
+            'читают счётчик, добавляют пост и обновляют счётчик, потоки-'
+            'читатели читают ленту. Режимы: SQLite по умолчанию '
+            '(sqlite-default), SQLite с WAL и PRAGMA (sqlite-tuned) и '
+            f'настроенная база проекта ({CURRENT}; временные таблицы '
+            'удаляются после замера).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modes', nargs='+',
+            default=[f'sqlite-{mode}' for mode in SQLITE_MODES],
+            choices=[f'sqlite-{mode}' for mode in SQLITE_MODES] + [CURRENT],
+        )
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"режим":<16} {"записей/с":>10} {"ошибок":>8} '
+            f'{"p50, мс":>9} {"p99, мс":>9} {"чтений/с":>10}'
+        )
+        for mode in options['modes']:
+            directory = None
+            if mode == CURRENT:
+                alias = 'default'
+            else:
+                directory = tempfile.mkdtemp(prefix='bench_db_writes_')
+                alias = f'bench_{mode}'
+                connections.databases[alias] = sqlite_config(
+                    f'{directory}/bench.sqlite3',
+                    mode.split('-', 1)[1]
+                )
+                connections.ensure_defaults(alias)
+                connections.prepare_test_settings(alias)
+            try:
+                self.create_tables(alias)
+                result = self.measure(alias, options)
+                self.drop_tables(alias)
+            finally:
+                if directory is not None:
+                    connections[alias].close()
+                    del connections[alias]
+                    del connections.databases[alias]
+                    shutil.rmtree(directory, ignore_errors=True)
+            self.stdout.write(
+                f'{mode:<16} {result["writes"]:>10.0f} '
+                f'{result["errors"]:>8} {result["p50"]:>9.2f} '
+                f'{result["p99"]:>9.2f} {result["reads"]:>10.0f}'
+            )
+
+    @staticmethod
+    def create_tables(alias):
+        with connections[alias].cursor() as cursor:
+            for table in TABLES:
+                cursor.execute(f'DROP TABLE IF EXISTS {table}')
+            cursor.execute(
+                f'CREATE TABLE {TABLES[0]} (id bigint PRIMARY KEY, '
+                'author integer NOT NULL, text varchar(200) NOT NULL)'
+            )
+            cursor.execute(
+                f'CREATE TABLE {TABLES[1]} (author integer PRIMARY KEY, '
+                'posts integer NOT NULL)'
+            )
+
+    @staticmethod
+    def drop_tables(alias):
+        with connections[alias].cursor() as cursor:
+            for table in TABLES:
+                cursor.execute(f'DROP TABLE {table}')
+
+    @staticmethod
+    def write(alias, number, stop, latencies, errors):
+        """Писатель: транзакции «прочитать счётчик, добавить пост»."""
+        with connections[alias].cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {TABLES[1]} (author, posts) VALUES (%s, 0)',
+                [number]
+            )
+        sequence = failed = 0
+        done = []
+        while not stop.is_set():
+            sequence += 1
+            started = time.perf_counter()
+            try:
+                with atomic_write(using=alias), \
+                        connections[alias].cursor() as cursor:
+                    cursor.execute(
+                        f'SELECT posts FROM {TABLES[1]} WHERE author = %s',
+                        [number]
+                    )
+                    cursor.fetchone()
+                    cursor.execute(
+                        f'INSERT INTO {TABLES[0]} (id, author, text) '
+                        'VALUES (%s, %s, %s)',
+                        [number * 10 ** 9 + sequence, number,
+                         f'Пост {sequence}']
+                    )
+                    cursor.execute(
+                        f'UPDATE {TABLES[1]} SET posts = posts + 1 '
+                        'WHERE author = %s', [number]
+                    )
+            except DatabaseError:
+                failed += 1
+                continue
+            done.append((time.perf_counter() - started) * 1000)
+        latencies.extend(done)
+        errors.append(failed)
+
+    @staticmethod
+    def read(alias, stop, reads):
+        """Читатель: последние посты, как лента."""
+        count = 0
+        while not stop.is_set():
+            try:
+                with connections[alias].cursor() as cursor:
+                    cursor.execute(
+                        f'SELECT id, text FROM {TABLES[0]} '
+                        'ORDER BY id DESC LIMIT 10'
+                    )
+                    cursor.fetchall()
+            except DatabaseError:
+                continue
+            count += 1
+        reads.append(count)
+
+    def measure(self, alias, options):
+        if options['writers'] < 1:
+            raise CommandError('Нужен хотя бы один писатель')
+        stop = threading.Event()
+        latencies, errors, reads = [], [], []
+
+        def run(target, *args):
+            try:
+                target(alias, *args)
+            finally:
+                # У каждого потока своё соединение с базой.
+                connections[alias].close()
+
+        threads = [
+            threading.Thread(
+                target=run,
+                args=(self.write, number, stop, latencies, errors)
+            )
+            for number in range(1, options['writers'] + 1)
+        ] + [
+            threading.Thread(target=run, args=(self.read, stop, reads))
+            for _ in range(options['readers'])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        stop.wait(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        return {
+            'writes': len(latencies) / elapsed,
+            'errors': sum(errors),
+            'p50': statistics.median(latencies) if latencies else 0,
+            'p99': latencies[int(len(latencies) * 0.99)] if latencies else 0,
+            'reads': sum(reads) / elapsed,
+        }
@@ -0,0 +1,41 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.tasks import Worker
+
+
+class Command(BaseCommand):
+    help = ('Выполняет фоновые задачи из очереди core.Task. Воркеров '
+            'можно запускать несколько — задачу получит один из них.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Пауза между опросами пустой очереди, секунды.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и завершиться.'
+        )
+        parser.add_argument(
+            '--keep-days', type=int, default=settings.TASKS_KEEP_DAYS,
+            help='Сколько дней хранить выполненные и упавшие задачи; '
+                 '0 — вечно.'
+        )
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            threads=options['threads'],
+            poll_interval=options['poll_interval'],
+            keep_days=options['keep_days'],
+        )
+        # Текущие задачи дорабатываются, новые не забираются.
+        signal.signal(signal.SIGTERM, lambda *args: worker.stop())
+        try:
+            worker.run(once=options['once'])
+        except KeyboardInterrupt:
+            worker.stop()
+        self.stdout.write(self.style.SUCCESS('Воркер остановлен'))
@@ -0,0 +1,47 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в файлы реплик из '
+            'DATABASE_REPLICAS — для проверки чтения с реплик локально.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--every', type=float,
+            help='Повторять копирование раз в столько секунд '
+                 '(отставание реплик).'
+        )
+
+    def handle(self, *args, **options):
+        aliases = settings.DATABASE_REPLICAS
+        if not aliases:
+            raise CommandError('Реплики не заданы: DATABASE_REPLICAS пуст')
+        if any(connections[alias].vendor != 'sqlite'
+               for alias in ['default'] + aliases):
+            raise CommandError('Копировать можно только базы SQLite')
+        while True:
+            self.sync(aliases)
+            if not options['every']:
+                return
+            time.sleep(options['every'])
+
+    def sync(self, aliases):
+        source = sqlite3.connect(settings.DATABASES['default']['NAME'])
+        try:
+            for alias in aliases:
+                # backup() копирует согласованный снимок, даже если
+                # в основную базу в это время пишут.
+                target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                connections[alias].close()
+                self.stdout.write(f'{alias}: скопирована')
+        finally:
+            source.close()
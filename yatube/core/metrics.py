@@ -0,0 +1,239 @@
+"""Метрики запросов: число SQL-запросов, время базы и шаблонов, кэш.
+
+``MetricsMiddleware`` измеряет каждый запрос и складывает результат
+в гистограммы по имени URL (``posts:index``, ``posts:profile`` ...).
+Гистограммы живут в памяти процесса, как и ``fragment_stats``; их
+отдаёт ``core.views.metrics`` вместе с pid воркера.
+
+``METRICS_QUERY_BUDGETS`` задаёт предельное число SQL-запросов для имени
+URL. При ``METRICS_ENFORCE_BUDGETS`` (включено в тестах) превышение
+бюджета — ошибка ``QueryBudgetExceeded``, иначе — предупреждение в лог.
+"""
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+UNRESOLVED = '<unresolved>'
+
+# Верхние границы корзин гистограмм; последняя корзина — всё, что больше.
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+TIME_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_local = threading.local()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Страница сделала больше SQL-запросов, чем ей положено."""
+
+
+class RequestMetrics:
+    """Счётчики одного запроса."""
+
+    def __init__(self):
+        # Запросы асинхронных view идут и из потоков пула (core.aio).
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.started = time.perf_counter()
+
+    @property
+    def duration(self):
+        return time.perf_counter() - self.started
+
+    def __call__(self, execute, sql, params, many, context):
+        # Обёртка connection.execute_wrapper: видит все запросы,
+        # даже при DEBUG = False.
+        if current() is not self:
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.queries += 1
+                self.db_time += elapsed
+
+
+def current():
+    """Метрики текущего запроса в этом потоке или ``None``."""
+    return getattr(_local, 'metrics', None)
+
+
+def record_template(seconds):
+    metrics = current()
+    if metrics is not None:
+        metrics.template_time += seconds
+
+
+def record_cache(hit):
+    metrics = current()
+    if metrics is not None:
+        if hit:
+            metrics.cache_hits += 1
+        else:
+            metrics.cache_misses += 1
+
+
+@contextmanager
+def collect():
+    """Считать запросы всех баз и время шаблонов внутри блока."""
+    with attached(RequestMetrics()) as metrics:
+        yield metrics
+
+
+@contextmanager
+def attached(metrics):
+    """Относить работу этого потока внутри блока к ``metrics``.
+
+    Соединения с базой у каждого потока свои, поэтому поток пула, который
+    выполняет часть запроса, подключает к своим соединениям метрики
+    потока запроса. ``None`` — ничего не считать.
+    """
+    previous = current()
+    _local.metrics = metrics
+    try:
+        with ExitStack() as stack:
+            if metrics is not None:
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(metrics)
+                    )
+            yield metrics
+    finally:
+        _local.metrics = previous
+
+
+@contextmanager
+def excluded():
+    """Не относить к текущему запросу работу внутри блока.
+
+    Для фоновых задач, которые выполняются синхронно (миниатюры
+    в тестах): в продакшене они не тратят время запроса.
+    """
+    with attached(None):
+        yield
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.total += 1
+        self.sum += value
+
+    def snapshot(self):
+        bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+        return {
+            'buckets': dict(zip(bounds, self.counts)),
+            'count': self.total,
+            'sum': round(self.sum, 3),
+        }
+
+
+class ViewMetrics:
+    """Гистограммы и счётчики одного имени URL."""
+
+    def __init__(self):
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.duration_ms = Histogram(TIME_BUCKETS_MS)
+        self.db_ms = Histogram(TIME_BUCKETS_MS)
+        self.template_ms = Histogram(TIME_BUCKETS_MS)
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def observe(self, metrics, duration):
+        self.queries.observe(metrics.queries)
+        self.duration_ms.observe(duration * 1000)
+        self.db_ms.observe(metrics.db_time * 1000)
+        self.template_ms.observe(metrics.template_time * 1000)
+        self.cache_hits += metrics.cache_hits
+        self.cache_misses += metrics.cache_misses
+
+    def snapshot(self):
+        return {
+            'requests': self.queries.total,
+            'queries': self.queries.snapshot(),
+            'duration_ms': self.duration_ms.snapshot(),
+            'db_ms': self.db_ms.snapshot(),
+            'template_ms': self.template_ms.snapshot(),
+            'cache': {'hits': self.cache_hits, 'misses': self.cache_misses},
+        }
+
+
+class MetricsRegistry:
+    """Метрики всех имён URL в рамках процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def observe(self, name, metrics, duration):
+        with self._lock:
+            self._views.setdefault(name, ViewMetrics()).observe(
+                metrics, duration
+            )
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: self._views[name].snapshot()
+                for name in sorted(self._views)
+            }
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+view_metrics = MetricsRegistry()
+
+
+def check_budget(name, queries):
+    budget = getattr(settings, 'METRICS_QUERY_BUDGETS', {}).get(name)
+    if budget is None or queries <= budget:
+        return
+    message = f'{name}: {queries} SQL-запросов при бюджете {budget}'
+    if getattr(settings, 'METRICS_ENFORCE_BUDGETS', False):
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+class MetricsMiddleware:
+    """Измеряет запрос целиком; ставится первым в ``MIDDLEWARE``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with collect() as metrics:
+            response = self.get_response(request)
+        duration = metrics.duration
+        match = getattr(request, 'resolver_match', None)
+        name = match.view_name if match else UNRESOLVED
+        view_metrics.observe(name, metrics, duration)
+        if getattr(settings, 'METRICS_SERVER_TIMING', False):
+            response['Server-Timing'] = (
+                f'db;dur={metrics.db_time * 1000:.1f}, '
+                f'tpl;dur={metrics.template_time * 1000:.1f}, '
+                f'total;dur={duration * 1000:.1f}'
+            )
+        check_budget(name, metrics.queries)
+        return response
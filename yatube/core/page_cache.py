@@ -0,0 +1,75 @@
+"""Кэш целых страниц для анонимных посетителей.
+
+Гости видят одинаковые страницы, поэтому готовый HTML ленты можно
+отдавать из кэша, не трогая базу и шаблоны. Ключ страницы — адрес
+запроса (с ``?page=`` и ``?cursor=``) и версии областей, которые
+показывает view (``core.caching``). Сигналы увеличивают версии при
+изменении постов и комментариев, и старые ключи просто перестают
+читаться — искать и удалять их не нужно.
+
+Страница, прочитанная с реплики сразу после изменения, могла не увидеть
+его и не сохраняется (``core.replicas.may_be_stale``). Не сохраняется
+и страница с временной разметкой (``core.caching.mark_temporary``).
+
+Авторизованные пользователи кэш обходят: в их страницах имя
+в шапке, кнопки подписки и CSRF-токен формы. Не сохраняются и ответы,
+которые ставят cookie или выдали CSRF-токен, — такая страница
+принадлежит одному посетителю.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from . import metrics
+from .caching import get_versions, track_temporary
+from .conditional import resolve_scopes
+from .replicas import may_be_stale
+
+PAGE_KEY = 'page:{}:{}'
+
+
+def page_key(request, scopes):
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    versions = '.'.join(str(version) for version in get_versions(*scopes))
+    return PAGE_KEY.format(url, versions)
+
+
+def is_cacheable(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_USED')
+    )
+
+
+def anonymous_page_cache(get_scopes):
+    """``get_scopes(*args, **kwargs)`` — области, которые показывает view."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated):
+                return view(request, *args, **kwargs)
+            scopes = resolve_scopes(request, get_scopes, args, kwargs)
+            key = page_key(request, scopes)
+            cached = cache.get(key)
+            metrics.record_cache(cached is not None)
+            if cached is not None:
+                content, content_type = cached
+                return HttpResponse(content, content_type=content_type)
+            with track_temporary() as rendered:
+                response = view(request, *args, **kwargs)
+            if (is_cacheable(request, response) and not rendered.temporary
+                    and not may_be_stale(scopes)):
+                cache.set(key, (response.content, response['Content-Type']),
+                          settings.PAGE_CACHE_TIMEOUT)
+            return response
+
+        return wrapper
+
+    return decorator
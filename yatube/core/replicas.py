@@ -0,0 +1,151 @@
+"""Чтение лент с реплик базы.
+
+``read_from_replica`` помечает view, которым можно читать с реплики:
+на время запроса выбирается следующая по кругу живая реплика из
+``DATABASE_REPLICAS``, и ``ReplicaRouter`` отправляет туда чтения.
+Запись, пользователи и сессии всегда идут в основную базу: иначе только
+что вошедший пользователь мог бы оказаться «не вошедшим» на отставшей
+реплике.
+
+Реплика отстаёт, поэтому после записи (view с ``pin_to_primary``)
+пользователь ``REPLICA_MAX_LAG`` секунд читает с основной базы — это
+помнит cookie. Живость реплики проверяется запросом к
+``django_migrations`` не чаще раза в ``REPLICA_HEALTH_INTERVAL`` секунд;
+упавшая реплика пропускается, а без живых реплик чтения идут в основную
+базу.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+from . import metrics
+from .caching import get_modified
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = 'primary_until'
+# Модели этих приложений всегда читаются с основной базы.
+PRIMARY_APPS = {'auth', 'sessions', 'core'}
+REDIRECTS = (301, 302, 303, 307, 308)
+
+_local = threading.local()
+_lock = threading.Lock()
+_position = 0
+_health = {}
+
+
+def current():
+    """Реплика, с которой читает текущий запрос, или ``None``."""
+    return getattr(_local, 'alias', None)
+
+
+@contextmanager
+def using(alias):
+    """Читать с реплики ``alias`` внутри блока; ``None`` — с основной."""
+    previous = current()
+    _local.alias = alias
+    try:
+        yield
+    finally:
+        _local.alias = previous
+
+
+def is_healthy(alias):
+    now = time.monotonic()
+    with _lock:
+        checked_at, healthy = _health.get(alias, (None, True))
+    if checked_at is not None and now - checked_at < (
+            settings.REPLICA_HEALTH_INTERVAL):
+        return healthy
+    try:
+        # Пустой файл SQLite на месте копии тоже должен считаться
+        # неисправной репликой, поэтому нужна таблица, а не SELECT 1.
+        with metrics.excluded(), connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1 FROM django_migrations LIMIT 1')
+        healthy = True
+    except DatabaseError as error:
+        logger.warning('Реплика %s недоступна: %s', alias, error)
+        healthy = False
+    with _lock:
+        _health[alias] = (now, healthy)
+    return healthy
+
+
+def choose_replica():
+    """Следующая по кругу живая реплика или ``None``."""
+    global _position
+    replicas = settings.DATABASE_REPLICAS
+    for _ in range(len(replicas)):
+        with _lock:
+            alias = replicas[_position % len(replicas)]
+            _position += 1
+        if is_healthy(alias):
+            return alias
+    return None
+
+
+def is_pinned(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def may_be_stale(scopes):
+    """Страница с реплики может не видеть недавнего изменения областей."""
+    if current() is None:
+        return False
+    return time.time() - get_modified(*scopes) < settings.REPLICA_MAX_LAG
+
+
+def read_from_replica(view):
+    """Читать данные view с реплики, если пользователь не писал недавно."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (request.method not in ('GET', 'HEAD')
+                or not settings.DATABASE_REPLICAS or is_pinned(request)):
+            return view(request, *args, **kwargs)
+        with using(choose_replica()):
+            return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def pin_to_primary(view):
+    """После записи (ответ-редирект) читать с основной базы."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if response.status_code in REDIRECTS:
+            response.set_cookie(
+                PIN_COOKIE, str(time.time() + settings.REPLICA_MAX_LAG),
+                max_age=settings.REPLICA_MAX_LAG, httponly=True,
+                samesite='Lax'
+            )
+        return response
+
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APPS:
+            return None
+        return current()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в основной базе.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == 'default'
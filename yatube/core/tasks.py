@@ -0,0 +1,215 @@
+"""Фоновая очередь задач на таблице ``core.Task``.
+
+Побочные эффекты записи (раскладка поста по лентам, индекс поиска,
+миниатюры) не должны удлинять POST-запрос. Функция, объявленная
+декоратором ``@task``, ставится в очередь вызовом ``enqueue``: это одна
+вставка строки в той же транзакции, что и сами данные, — задача не
+потеряется при откате и не увидит несохранённых данных.
+
+Выполняет задачи команда ``run_tasks``: воркер забирает готовые строки
+условным UPDATE (два воркера не получат одну задачу, поэтому их можно
+запускать несколько), выполняет их в пуле потоков и при ошибке
+откладывает повтор с экспоненциальной задержкой. Задача, воркер которой
+умер, снова становится доступна после ``TASKS_LEASE`` секунд.
+
+Ключ идемпотентности (``key``) уникален: повторная постановка с тем же
+ключом ничего не делает, пока задача ждёт, выполняется или выполнена.
+Задача, исчерпавшая попытки (FAILED), освобождает ключ: следующая
+постановка с ним создаст новую задачу, а упавшая останется для разбора
+до ``purge``. Сами задачи тоже должны быть идемпотентны —
+после падения воркера задача выполнится ещё раз.
+
+При ``TASKS_EAGER`` (в тестах) очередь разбирается сразу после
+постановки, в том же потоке.
+"""
+import json
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import metrics
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+
+class TaskDefinition:
+    """Функция, которую можно выполнить в фоне."""
+
+    def __init__(self, func, max_attempts=None, retry_delay=None):
+        self.func = func
+        self.name = f'{func.__module__}.{func.__name__}'
+        self._max_attempts = max_attempts
+        self._retry_delay = retry_delay
+        self.__doc__ = func.__doc__
+
+    @property
+    def max_attempts(self):
+        return self._max_attempts or settings.TASKS_MAX_ATTEMPTS
+
+    @property
+    def retry_delay(self):
+        if self._retry_delay is None:
+            return settings.TASKS_RETRY_DELAY
+        return self._retry_delay
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, *args, key=None, delay=0, **kwargs):
+        """Поставить вызов в очередь; аргументы должны быть JSON."""
+        task = Task(
+            name=self.name,
+            payload=json.dumps({'args': args, 'kwargs': kwargs}),
+            key=key,
+            max_attempts=self.max_attempts,
+            run_at=timezone.now() + timedelta(seconds=delay),
+        )
+        if key is None:
+            task.save()
+        else:
+            Task.objects.bulk_create([task], ignore_conflicts=True)
+        if settings.TASKS_EAGER:
+            with metrics.excluded():
+                run_pending()
+
+
+def task(func=None, *, max_attempts=None, retry_delay=None):
+    """Объявить фоновую задачу: ``@task`` или ``@task(max_attempts=5)``."""
+    if func is None:
+        return lambda func: TaskDefinition(func, max_attempts, retry_delay)
+    return TaskDefinition(func, max_attempts, retry_delay)
+
+
+def claim(limit):
+    """Забрать до ``limit`` готовых задач, в том числе брошенных воркерами."""
+    now = timezone.now()
+    ready = (
+        Q(status=Task.PENDING, run_at__lte=now)
+        | Q(status=Task.RUNNING, locked_until__lt=now)
+    )
+    candidates = Task.objects.filter(ready).order_by(
+        'run_at', 'id'
+    ).values_list('pk', flat=True)[:limit]
+    lease = now + timedelta(seconds=settings.TASKS_LEASE)
+    claimed = [
+        pk for pk in candidates
+        # Условие повторяется в UPDATE: задачу получит один воркер.
+        if Task.objects.filter(ready, pk=pk).update(
+            status=Task.RUNNING, locked_until=lease
+        )
+    ]
+    return list(Task.objects.filter(pk__in=claimed).order_by('run_at', 'id'))
+
+
+def execute(task):
+    """Выполнить забранную задачу и записать результат."""
+    task.attempts += 1
+    retry_delay = settings.TASKS_RETRY_DELAY
+    try:
+        definition = import_string(task.name)
+        retry_delay = definition.retry_delay
+        payload = json.loads(task.payload)
+        definition(*payload['args'], **payload['kwargs'])
+    except Exception as error:
+        logger.exception('Задача %s #%s упала', task.name, task.pk)
+        if task.attempts >= task.max_attempts:
+            # Ключ освобождается: задачу можно поставить заново.
+            changes = {'status': Task.FAILED, 'key': None,
+                       'finished': timezone.now()}
+        else:
+            changes = {'status': Task.PENDING, 'run_at': timezone.now()
+                       + timedelta(seconds=retry_delay
+                                   * 2 ** (task.attempts - 1))}
+        Task.objects.filter(pk=task.pk).update(
+            attempts=task.attempts, locked_until=None,
+            last_error=f'{type(error).__name__}: {error}', **changes
+        )
+        return False
+    Task.objects.filter(pk=task.pk).update(
+        status=Task.DONE, attempts=task.attempts, locked_until=None,
+        finished=timezone.now()
+    )
+    return True
+
+
+def run_pending(limit=100):
+    """Выполнить готовые задачи в текущем потоке; вернуть их число."""
+    done = 0
+    while True:
+        tasks = claim(limit)
+        if not tasks:
+            return done
+        for task in tasks:
+            execute(task)
+        done += len(tasks)
+
+
+def purge(days):
+    """Удалить выполненные и упавшие задачи старше ``days`` дней."""
+    border = timezone.now() - timedelta(days=days)
+    finished = Task.objects.filter(
+        status__in=(Task.DONE, Task.FAILED), finished__lt=border
+    )
+    return finished.delete()[0]
+
+
+def _execute_in_thread(task):
+    try:
+        execute(task)
+    finally:
+        # У потока пула свои соединения с базой.
+        connections.close_all()
+
+
+class Worker:
+    """Цикл воркера: забирает задачи и выполняет их в пуле потоков."""
+
+    PURGE_INTERVAL = 3600
+
+    def __init__(self, threads=4, poll_interval=1.0, keep_days=7):
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.keep_days = keep_days
+        self.stopped = threading.Event()
+        self.purged_at = 0
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self, once=False):
+        running = set()
+        with ThreadPoolExecutor(self.threads,
+                                thread_name_prefix='tasks') as executor:
+            while not self.stopped.is_set():
+                running = {future for future in running if not future.done()}
+                free = self.threads - len(running)
+                tasks = claim(free) if free else []
+                running.update(
+                    executor.submit(_execute_in_thread, task)
+                    for task in tasks
+                )
+                if tasks:
+                    continue
+                if once and not running:
+                    break
+                self.maybe_purge()
+                if running:
+                    wait(running, timeout=self.poll_interval,
+                         return_when=FIRST_COMPLETED)
+                else:
+                    self.stopped.wait(self.poll_interval)
+
+    def maybe_purge(self):
+        now = time.monotonic()
+        if self.keep_days and now - self.purged_at > self.PURGE_INTERVAL:
+            self.purged_at = now
+            purge(self.keep_days)
@@ -0,0 +1,55 @@
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.template import Library, TemplateSyntaxError
+from django.templatetags.cache import CacheNode, do_cache
+
+from core import metrics
+from core.caching import fragment_stats, track_temporary
+
+register = Library()
+
+
+class CountingCacheNode(CacheNode):
+    """Тег ``{% cache %}``, который считает попадания и промахи."""
+
+    def render(self, context):
+        expire_time = self.expire_time_var.resolve(context)
+        if expire_time is not None:
+            try:
+                expire_time = int(expire_time)
+            except (ValueError, TypeError):
+                raise TemplateSyntaxError(
+                    f'"cache" tag got a non-integer timeout: {expire_time!r}'
+                )
+        if self.cache_name:
+            fragment_cache = caches[self.cache_name.resolve(context)]
+        else:
+            try:
+                fragment_cache = caches['template_fragments']
+            except InvalidCacheBackendError:
+                fragment_cache = caches['default']
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        cache_key = make_template_fragment_key(self.fragment_name, vary_on)
+        value = fragment_cache.get(cache_key)
+        fragment_stats.record(self.fragment_name, hit=value is not None)
+        metrics.record_cache(hit=value is not None)
+        if value is None:
+            with track_temporary() as rendered:
+                value = self.nodelist.render(context)
+            if not rendered.temporary:
+                fragment_cache.set(cache_key, value, expire_time)
+        return value
+
+
+@register.tag('cache')
+def do_counting_cache(parser, token):
+    """Подменяет встроенный ``{% cache %}`` в шаблонах с этой библиотекой.
+
+    Синтаксис тот же; в ключ стоит включать версию данных, например
+    ``{% cache 600 post_card post.pk post.updated cards_version %}``.
+    """
+    node = do_cache(parser, token)
+    return CountingCacheNode(
+        node.nodelist, node.expire_time_var, node.fragment_name,
+        node.vary_on, node.cache_name,
+    )
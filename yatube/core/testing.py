@@ -0,0 +1,160 @@
+"""Проверка, что число SQL-запросов страницы не растёт с объёмом данных.
+
+N+1 (запрос на каждую карточку ленты за автором или группой) не видно
+на тестовых данных из одного поста: страница делает столько же
+запросов, сколько и с правильным ``select_related``. Поэтому страница
+запрашивается дважды — на малом и на большом объёме данных — и запросы
+сравниваются без литералов (они заменены на ``?``). Если какой-то
+запрос на больших данных повторяется чаще,
+``QueryGrowthMixin.assertQueriesDoNotGrow`` падает и показывает эти
+запросы и разницу между списками.
+
+``named_routes`` перечисляет именованные маршруты модуля URL, чтобы
+новый маршрут автоматически попадал под проверку.
+
+``capture_thread_queries`` собирает запросы к базе из всех потоков,
+в том числе из пула ``core.aio``: ``CaptureQueriesContext`` видит только
+соединение своего потока.
+
+``SlowQueries`` замедляет все SQL-запросы во всех потоках и запоминает,
+когда каждый шёл, — так видно, какие запросы страницы выполняются
+одновременно (``core.aio``).
+"""
+import difflib
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+from django.db.backends.utils import CursorWrapper
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern
+
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+
+def named_routes(urlconf):
+    """``[(имя с пространством имён, [параметры]), ...]`` модуля URL."""
+    routes = []
+    for pattern in urlconf.urlpatterns:
+        if not isinstance(pattern, URLPattern) or not pattern.name:
+            continue
+        name = pattern.name
+        if getattr(urlconf, 'app_name', None):
+            name = f'{urlconf.app_name}:{name}'
+        routes.append((name, list(pattern.pattern.regex.groupindex)))
+    return routes
+
+
+def normalize(sql):
+    """SQL без значений: запросы к разным строкам совпадают."""
+    return NUMBER.sub('?', STRING.sub('?', sql))
+
+
+@contextmanager
+def capture_queries(aliases=('default',)):
+    """Собрать SQL всех запросов к ``aliases`` внутри блока в список."""
+    queries = []
+    with ExitStack() as stack:
+        contexts = [
+            stack.enter_context(CaptureQueriesContext(connections[alias]))
+            for alias in aliases
+        ]
+        yield queries
+    for context in contexts:
+        queries.extend(query['sql'] for query in context.captured_queries)
+
+
+@contextmanager
+def capture_thread_queries(alias='default'):
+    """Собрать SQL запросов к ``alias`` из всех потоков внутри блока."""
+    queries = []
+    lock = threading.Lock()
+    original = CursorWrapper._execute_with_wrappers
+
+    def execute(cursor, sql, params, many, executor):
+        if cursor.db.alias == alias:
+            with lock:
+                queries.append(sql)
+        return original(cursor, sql, params, many, executor)
+
+    CursorWrapper._execute_with_wrappers = execute
+    try:
+        yield queries
+    finally:
+        CursorWrapper._execute_with_wrappers = original
+
+
+def repeated_growth(small, large):
+    """Запросы, которые на больших данных повторяются чаще.
+
+    ``{sql: (раз на малых, раз на больших)}``. Одиночный новый запрос
+    (COUNT(*) для ссылок на страницы, когда их стало больше одной) ростом
+    не считается: N+1 — это один и тот же запрос на каждый объект.
+    """
+    before = Counter(map(normalize, small))
+    after = Counter(map(normalize, large))
+    return {
+        sql: (before[sql], count) for sql, count in after.items()
+        if count > max(before[sql], 1)
+    }
+
+
+class QueryGrowthMixin:
+    """Для ``TestCase``: сравнение запросов на двух объёмах данных."""
+
+    def assertQueriesDoNotGrow(self, small, large, label=''):
+        grown = repeated_growth(small, large)
+        if not grown:
+            return
+        repeated = '\n'.join(
+            f'{before} -> {after} раз: {sql}'
+            for sql, (before, after) in grown.items()
+        )
+        diff = '\n'.join(difflib.unified_diff(
+            [normalize(sql) for sql in small],
+            [normalize(sql) for sql in large],
+            'мало данных', 'много данных', lineterm='', n=1
+        ))
+        self.fail(
+            f'{label}: {len(small)} SQL-запросов на малых данных, '
+            f'{len(large)} на больших. Повторяются чаще:\n{repeated}\n{diff}'
+        )
+
+
+class SlowQueries:
+    """Задержка ``delay`` секунд перед каждым SQL-запросом внутри блока.
+
+    Работает во всех потоках, в том числе для соединений, открытых до
+    блока (потоки пулов держат их между запросами). ``timeline`` —
+    ``[(sql, начало, конец)]`` по ``time.perf_counter``.
+    """
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.timeline = []
+        self._lock = threading.Lock()
+        self._original = None
+
+    def __enter__(self):
+        original = self._original = CursorWrapper._execute_with_wrappers
+
+        def execute(cursor, sql, params, many, executor):
+            started = time.perf_counter()
+            time.sleep(self.delay)
+            try:
+                return original(cursor, sql, params, many, executor)
+            finally:
+                with self._lock:
+                    self.timeline.append(
+                        (sql, started, time.perf_counter())
+                    )
+
+        CursorWrapper._execute_with_wrappers = execute
+        return self
+
+    def __exit__(self, *exc_info):
+        CursorWrapper._execute_with_wrappers = self._original
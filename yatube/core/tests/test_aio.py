@@ -0,0 +1,102 @@
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from core import aio, metrics, replicas
+
+User = get_user_model()
+
+
+class AsyncViewTests(SimpleTestCase):
+    def test_async_view_returns_result(self):
+        """async def view вызывается как обычная функция."""
+        @aio.async_view
+        async def view(request, number):
+            return await aio.db(lambda: number * 2)
+
+        self.assertEqual(view(None, 21), 42)
+        self.assertEqual(view.__name__, 'view')
+
+    def test_exceptions_propagate(self):
+        """Исключение внутри корутины (Http404) выходит из view."""
+        @aio.async_view
+        async def view(request):
+            raise LookupError('нет')
+
+        with self.assertRaises(LookupError):
+            view(None)
+
+    @override_settings(ASYNC_DB_INLINE=True)
+    def test_inline_mode_runs_in_request_thread(self):
+        """При ASYNC_DB_INLINE функции базы выполняются в потоке запроса."""
+        result = aio.run(aio.db(threading.get_ident))
+        self.assertEqual(result, threading.get_ident())
+
+
+@override_settings(ASYNC_DB_INLINE=False)
+class DatabasePoolTests(TransactionTestCase):
+    def test_independent_calls_run_concurrently(self):
+        """Ответ ждёт самый медленный вызов, а не сумму."""
+        async def page():
+            return await aio.gather(*(
+                aio.db(time.sleep, 0.2) for _ in range(4)
+            ))
+
+        started = time.perf_counter()
+        aio.run(page())
+        self.assertLess(time.perf_counter() - started, 0.6)
+
+    def test_failed_gather_waits_for_other_calls(self):
+        """Ошибка одного вызова выходит после завершения остальных."""
+        finished = []
+
+        def slow():
+            time.sleep(0.2)
+            finished.append(True)
+
+        def fail():
+            raise LookupError('нет')
+
+        async def page():
+            return await aio.gather(aio.db(fail), aio.db(slow))
+
+        with self.assertRaises(LookupError):
+            aio.run(page())
+        self.assertEqual(finished, [True])
+
+    def test_calls_run_in_pool_threads(self):
+        """Вызовы уходят из потока запроса в пул."""
+        self.assertNotEqual(
+            aio.run(aio.db(threading.get_ident)), threading.get_ident()
+        )
+
+    def test_calls_inside_transaction_stay_in_request_thread(self):
+        """В транзакции пул не увидел бы её данных: вызов идёт в потоке."""
+        with transaction.atomic():
+            User.objects.create_user(username='auth')
+            self.assertTrue(aio.run(aio.db(
+                User.objects.filter(username='auth').exists
+            )))
+
+    def test_replica_is_propagated(self):
+        """Поток пула читает с той же реплики, что и запрос."""
+        with replicas.using('replica'):
+            self.assertEqual(aio.run(aio.db(replicas.current)), 'replica')
+        self.assertIsNone(aio.run(aio.db(replicas.current)))
+
+    def test_pool_queries_count_towards_request_metrics(self):
+        """Запросы потоков пула входят в метрики запроса."""
+        User.objects.create_user(username='auth')
+
+        async def page():
+            return await aio.gather(
+                aio.db(User.objects.count),
+                aio.db(User.objects.filter(username='auth').exists),
+            )
+
+        with metrics.collect() as collected:
+            self.assertEqual(aio.run(page()), [1, True])
+        self.assertEqual(collected.queries, 2)
@@ -0,0 +1,168 @@
+import asyncio
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import SimpleTestCase, TransactionTestCase
+from django.urls import reverse
+
+from core.asgi import AsgiHandler
+
+User = get_user_model()
+
+
+def call(handler, path='/', method='GET', query=b'', headers=(),
+         chunks=(b'',)):
+    """Запрос к ASGI-приложению: ``(код, заголовки, [части тела])``."""
+    scope = {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'query_string': query,
+        'root_path': '',
+        'headers': [(b'host', b'localhost')] + list(headers),
+        'client': ('127.0.0.1', 5000),
+        'server': ('localhost', 8000),
+    }
+    incoming = [
+        {'type': 'http.request', 'body': chunk,
+         'more_body': number < len(chunks) - 1}
+        for number, chunk in enumerate(chunks)
+    ]
+    sent = []
+
+    async def receive():
+        return incoming.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(handler(scope, receive, send))
+    start, *body = sent
+    return start['status'], dict(start['headers']), [
+        message['body'] for message in body
+    ]
+
+
+def echo(environ, start_response):
+    """WSGI-приложение, которое отвечает своим окружением."""
+    body = environ['wsgi.input'].read()
+    start_response('201 Created', [('Content-Type', 'text/plain')])
+    keys = ('REQUEST_METHOD', 'PATH_INFO', 'QUERY_STRING', 'CONTENT_TYPE',
+            'HTTP_COOKIE', 'HTTP_X_TAGS', 'REMOTE_ADDR', 'SERVER_PORT')
+    lines = [f'{key}={environ.get(key)}' for key in keys]
+    return [('\n'.join(lines) + '\n').encode('latin-1'), body]
+
+
+def generator(environ, start_response):
+    """Потоковый ответ: start_response вызывается при первой части."""
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    yield b'first '
+    yield b'second'
+
+
+class AsgiAdapterTests(SimpleTestCase):
+    def setUp(self):
+        self.handler = AsgiHandler(echo, threads=2)
+        self.addCleanup(self.handler.close)
+
+    def test_environ_from_scope(self):
+        """Метод, путь, строка запроса и заголовки доходят до WSGI."""
+        status, headers, body = call(
+            self.handler, path='/группа/', method='POST', query=b'page=2',
+            headers=[(b'content-type', b'text/plain'),
+                     (b'cookie', b'a=1'), (b'cookie', b'b=2'),
+                     (b'x-tags', b'one'), (b'x-tags', b'two')],
+            chunks=(b'hello, ', b'world'),
+        )
+        self.assertEqual(status, 201)
+        self.assertEqual(headers[b'content-type'], b'text/plain')
+        lines = b''.join(body).decode('latin-1').splitlines()
+        self.assertEqual(lines, [
+            'REQUEST_METHOD=POST',
+            'PATH_INFO=' + '/группа/'.encode().decode('latin-1'),
+            'QUERY_STRING=page=2',
+            'CONTENT_TYPE=text/plain',
+            'HTTP_COOKIE=a=1; b=2',
+            'HTTP_X_TAGS=one,two',
+            'REMOTE_ADDR=127.0.0.1',
+            'SERVER_PORT=8000',
+            'hello, world',
+        ])
+
+    def test_streaming_response(self):
+        """Потоковый ответ отдаётся по частям."""
+        handler = AsgiHandler(generator, threads=1)
+        self.addCleanup(handler.close)
+        status, _, body = call(handler)
+        self.assertEqual(status, 200)
+        self.assertEqual(body, [b'first ', b'second', b''])
+
+    def test_disconnect_before_body(self):
+        """Клиент ушёл, не дослав тело: приложение не вызывается."""
+        sent = []
+
+        async def receive():
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(self.handler(
+            {'type': 'http', 'method': 'POST', 'path': '/'}, receive, send
+        ))
+        self.assertEqual(sent, [])
+
+    def test_lifespan(self):
+        """Сервер узнаёт о запуске и остановке приложения."""
+        incoming = [{'type': 'lifespan.startup'},
+                    {'type': 'lifespan.shutdown'}]
+        sent = []
+
+        async def receive():
+            return incoming.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        asyncio.run(self.handler({'type': 'lifespan'}, receive, send))
+        self.assertEqual(sent, ['lifespan.startup.complete',
+                                'lifespan.shutdown.complete'])
+
+    def test_websocket_is_not_supported(self):
+        with self.assertRaises(ValueError):
+            asyncio.run(self.handler({'type': 'websocket'}, None, None))
+
+
+class AsgiDjangoTests(TransactionTestCase):
+    def setUp(self):
+        self.handler = AsgiHandler(WSGIHandler(), threads=2)
+        self.addCleanup(self.handler.close)
+        User.objects.create_user(username='auth', password='secret-pass')
+
+    def test_page_is_rendered(self):
+        """Django отвечает через ASGI так же, как через WSGI."""
+        status, headers, body = call(self.handler, reverse('posts:index'))
+        self.assertEqual(status, 200)
+        self.assertTrue(headers[b'content-type'].startswith(b'text/html'))
+        self.assertIn('Последние публикации', b''.join(body).decode())
+
+    def test_login_with_form_and_cookies(self):
+        """Форма с CSRF-токеном и cookie проходит до view и обратно."""
+        login = reverse('users:login')
+        _, headers, body = call(self.handler, login)
+        cookie = headers[b'set-cookie'].split(b';', 1)[0]
+        token = re.search(
+            rb'name="csrfmiddlewaretoken" value="([^"]+)"', b''.join(body)
+        ).group(1)
+        status, headers, _ = call(
+            self.handler, login, method='POST',
+            headers=[(b'cookie', cookie), (b'content-type',
+                     b'application/x-www-form-urlencoded')],
+            chunks=(b'csrfmiddlewaretoken=' + token,
+                    b'&username=auth&password=secret-pass'),
+        )
+        self.assertEqual(status, 302)
+        self.assertIn(b'sessionid=', headers[b'set-cookie'])
@@ -0,0 +1,158 @@
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from core.cache_backend import (MESSAGE_KEY, SEQUENCE_KEY, LocalStore,
+                                TieredCache)
+
+SHARED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tiered-tests-default',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tiered-tests-shared',
+    },
+}
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class TieredCacheTests(SimpleTestCase):
+    def make_worker(self, **options):
+        """Отдельный L1 поверх общего L2 — как в другом процессе."""
+        options.setdefault('SYNC_INTERVAL', 0)
+        worker = TieredCache('shared', {'OPTIONS': options})
+        worker._store = LocalStore()
+        return worker
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.first = self.make_worker()
+        self.second = self.make_worker()
+
+    def test_value_is_shared_between_workers(self):
+        """Запись одного воркера видна другому."""
+        self.first.set('key', 'value')
+        self.assertEqual(self.second.get('key'), 'value')
+
+    def test_second_read_is_served_from_l1(self):
+        """Повторное чтение не ходит в общий кэш."""
+        self.first.set('key', 'value')
+        caches['shared'].delete('key')
+        self.assertEqual(self.first.get('key'), 'value')
+
+    def test_write_invalidates_other_workers_l1(self):
+        """Изменение и удаление ключа сбрасывают копии у других воркеров."""
+        self.first.set('key', 'old')
+        self.assertEqual(self.second.get('key'), 'old')
+        self.first.set('key', 'new')
+        self.assertEqual(self.second.get('key'), 'new')
+        self.first.set('counter', 1)
+        self.assertEqual(self.second.get('counter'), 1)
+        self.first.incr('counter')
+        self.assertEqual(self.second.get('counter'), 2)
+        self.first.delete('key')
+        self.assertIsNone(self.second.get('key'))
+
+    def test_clear_resets_other_workers(self):
+        """Очистка общего кэша сбрасывает L1 остальных воркеров."""
+        self.first.set('key', 'value')
+        self.second.get('key')
+        self.first.clear()
+        self.assertIsNone(self.second.get('key'))
+
+    def test_l1_is_bounded(self):
+        """L1 вытесняет самые старые ключи сверх лимита."""
+        worker = self.make_worker(L1_MAX_ENTRIES=2)
+        for number in range(3):
+            worker.set(f'key{number}', number)
+        self.assertEqual(len(worker._store.entries), 2)
+        self.assertEqual(worker.get('key0'), 0)
+
+    def test_sync_interval_limits_shared_reads(self):
+        """Пока не прошёл SYNC_INTERVAL, L1 отдаёт свою копию."""
+        lazy = self.make_worker(SYNC_INTERVAL=60)
+        self.first.set('key', 'old')
+        self.assertEqual(lazy.get('key'), 'old')
+        self.first.set('key', 'new')
+        self.assertEqual(lazy.get('key'), 'old')
+        lazy._store.synced_at = 0
+        self.assertEqual(lazy.get('key'), 'new')
+
+    def test_batch_write_publishes_one_message(self):
+        """set_many публикует одно сообщение на все свои ключи."""
+        self.first.set_many({'a': 1, 'b': 2})
+        self.assertEqual(self.second.get_many(['a', 'b']), {'a': 1, 'b': 2})
+        self.first.set_many({'a': 3, 'b': 4})
+        self.assertEqual(caches['shared'].get(SEQUENCE_KEY), 2)
+        self.assertEqual(self.second.get_many(['a', 'b']), {'a': 3, 'b': 4})
+
+    def test_shared_reads_do_not_hold_l1_lock(self):
+        """Пока воркер читает сообщения из L2, его L1 не заблокирован."""
+        self.first.set('key', 'value')
+        lock = self.second._store.lock
+        free = []
+
+        def try_lock():
+            if lock.acquire(blocking=False):
+                lock.release()
+                free.append(True)
+
+        read_messages = self.second._read_messages
+
+        def read_in_parallel(seen):
+            thread = threading.Thread(target=try_lock)
+            thread.start()
+            thread.join()
+            return read_messages(seen)
+
+        with mock.patch.object(self.second, '_read_messages',
+                               side_effect=read_in_parallel):
+            self.assertEqual(self.second.get('key'), 'value')
+        self.assertEqual(free, [True])
+
+
+class FileBasedSharedCacheTests(SimpleTestCase):
+    def setUp(self):
+        # Там же, где настоящий файловый кэш (tmpfs, если он есть).
+        os.makedirs(settings.SHARED_CACHE_DIR, exist_ok=True)
+        location = tempfile.mkdtemp(dir=settings.SHARED_CACHE_DIR)
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        shared_caches = {**SHARED_CACHES, 'shared': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': location,
+        }}
+        override = override_settings(CACHES=shared_caches)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(caches['shared'].close)
+
+    def test_concurrent_publish_numbers_are_unique(self):
+        """incr файлового кэша не атомарен: номера сообщений выдаются
+        под блокировкой и не повторяются."""
+        workers = [TieredCache('shared', {'OPTIONS': {}}) for _ in range(4)]
+        for worker in workers:
+            worker._store = LocalStore()
+
+        def write(worker):
+            for number in range(25):
+                worker.set(f'key{number}', number)
+
+        threads = [threading.Thread(target=write, args=[worker])
+                   for worker in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        shared = caches['shared']
+        self.assertEqual(shared.get(SEQUENCE_KEY), 100)
+        self.assertEqual(len(shared.get_many(
+            [MESSAGE_KEY.format(number) for number in range(1, 101)]
+        )), 100)
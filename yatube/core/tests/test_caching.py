@@ -0,0 +1,53 @@
+import warnings
+
+from django.core.cache import CacheKeyWarning, cache
+from django.test import SimpleTestCase
+
+from core.caching import (bump_version, get_modified, get_version,
+                          mark_modified, mark_temporary, track_temporary)
+
+
+class ScopeKeysTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_scope_names_are_safe_for_memcached(self):
+        """Пробелы и кириллица в имени области не дают CacheKeyWarning."""
+        scope = 'group:Тестовый слаг ' + 'х' * 300
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            version = get_version(scope)
+            mark_modified(scope)
+            self.assertIsNotNone(get_modified(scope))
+            self.assertGreater(bump_version(scope), version)
+        self.assertFalse([
+            warning for warning in caught
+            if issubclass(warning.category, CacheKeyWarning)
+        ])
+
+    def test_scopes_do_not_collide(self):
+        """Разные области версионируются независимо."""
+        first, second = get_version('author:a'), get_version('author:b')
+        bump_version('author:a')
+        self.assertEqual(get_version('author:b'), second)
+        self.assertNotEqual(get_version('author:a'), first)
+
+
+class TemporaryRenderTests(SimpleTestCase):
+    def test_inner_mark_reaches_outer_block(self):
+        """Отметка во вложенном блоке видна и во внешнем."""
+        with track_temporary() as page:
+            with track_temporary() as card:
+                mark_temporary()
+            with track_temporary() as other_card:
+                pass
+        self.assertTrue(card.temporary)
+        self.assertFalse(other_card.temporary)
+        self.assertTrue(page.temporary)
+
+    def test_mark_outside_block_is_ignored(self):
+        """Без отслеживания отметка ничего не меняет."""
+        mark_temporary()
+        with track_temporary() as rendered:
+            pass
+        self.assertFalse(rendered.temporary)
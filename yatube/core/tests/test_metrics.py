@@ -0,0 +1,90 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.metrics import QueryBudgetExceeded, view_metrics
+from posts.models import Post
+
+User = get_user_model()
+
+
+class MetricsMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        Post.objects.create(text='Тестовый пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        view_metrics.reset()
+        self.guest_client = Client()
+
+    def test_requests_are_grouped_by_url_name(self):
+        """Метрики копятся по имени URL, а не по адресу."""
+        self.guest_client.get(reverse('posts:index'))
+        self.guest_client.get(reverse('posts:index'), {'page': 2})
+        self.guest_client.get(
+            reverse('posts:profile', args=[self.user.username])
+        )
+        snapshot = view_metrics.snapshot()
+        self.assertEqual(
+            set(snapshot), {'posts:index', 'posts:profile'}
+        )
+        index = snapshot['posts:index']
+        self.assertEqual(index['requests'], 2)
+        self.assertEqual(index['queries']['count'], 2)
+        self.assertGreater(index['queries']['sum'], 0)
+        self.assertEqual(sum(index['template_ms']['buckets'].values()), 2)
+        # Вторая страница — новые ключи страницы и ленты, но та же
+        # карточка поста.
+        self.assertEqual(index['cache'], {'hits': 1, 'misses': 5})
+
+    @override_settings(METRICS_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        """Время базы и шаблонов уходит в заголовке Server-Timing."""
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertRegex(
+            response['Server-Timing'],
+            r'^db;dur=[\d.]+, tpl;dur=[\d.]+, total;dur=[\d.]+$'
+        )
+
+    @override_settings(METRICS_QUERY_BUDGETS={'posts:index': 0})
+    def test_query_budget_is_enforced(self):
+        """Превышение бюджета запросов в тестах — ошибка."""
+        with self.assertRaises(QueryBudgetExceeded):
+            self.guest_client.get(reverse('posts:index'))
+
+    @override_settings(
+        METRICS_QUERY_BUDGETS={'posts:index': 0},
+        METRICS_ENFORCE_BUDGETS=False,
+    )
+    def test_query_budget_only_logged_in_production(self):
+        """Без строгого режима превышение бюджета только логируется."""
+        with self.assertLogs('core.metrics', 'WARNING'):
+            response = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_metrics_endpoint_is_for_staff(self):
+        """Метрики отдаются только персоналу."""
+        self.guest_client.get(reverse('posts:index'))
+        response = self.guest_client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 302)
+        staff_client = Client()
+        staff_client.force_login(self.staff)
+        response = staff_client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('posts:index', response.json()['views'])
+
+    def test_cache_stats_are_labelled_per_process(self):
+        """Счётчики кэша отдаются вместе с pid ответившего воркера."""
+        staff_client = Client()
+        staff_client.force_login(self.staff)
+        response = staff_client.get(reverse('cache_stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['pid'], os.getpid())
+        self.assertIn('fragments', response.json())
@@ -0,0 +1,105 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core import replicas
+from core.testing import capture_thread_queries
+from posts.models import Post
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        replicas._health.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.post = Post.objects.create(text='Тестовый пост', author=self.user)
+        # Страницы, изменённые только что, с реплики не кэшируются.
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def replica_queries(self, client, url):
+        # Ленты запрашивают базу из потоков пула core.aio.
+        with capture_thread_queries('replica') as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return queries
+
+    def test_feeds_are_read_from_replica(self):
+        """Ленты и пост читаются с реплики."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                self.assertTrue(
+                    self.replica_queries(self.authorized_client, url)
+                )
+
+    def test_users_and_sessions_stay_on_primary(self):
+        """Сессия и пользователь запроса читаются с основной базы."""
+        queries = self.replica_queries(
+            self.authorized_client, reverse('posts:index')
+        )
+        for sql in queries:
+            self.assertNotIn('FROM "django_session"', sql)
+            self.assertNotIn('FROM "auth_user"', sql)
+
+    def test_writer_is_pinned_to_primary(self):
+        """После записи пользователь какое-то время читает с основной."""
+        response = self.authorized_client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Комментарий'}
+        )
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+        self.assertEqual(self.replica_queries(
+            self.authorized_client,
+            reverse('posts:post_detail', args=[self.post.pk])
+        ), [])
+
+    def test_unhealthy_replica_is_skipped(self):
+        """Недоступная реплика пропускается, чтение идёт в основную."""
+        with mock.patch.object(connections['replica'], 'cursor',
+                               side_effect=OperationalError('нет связи')), \
+                self.assertLogs('core.replicas', 'WARNING'):
+            self.assertIsNone(replicas.choose_replica())
+        self.assertEqual(
+            self.replica_queries(self.guest_client, reverse('posts:index')),
+            []
+        )
+
+    @override_settings(DATABASE_REPLICAS=['first', 'second'])
+    def test_round_robin(self):
+        """Реплики выбираются по очереди."""
+        with mock.patch.object(replicas, 'is_healthy', return_value=True):
+            chosen = [replicas.choose_replica() for _ in range(4)]
+        self.assertEqual(len(set(chosen[::2])), 1)
+        self.assertEqual(set(chosen), {'first', 'second'})
+
+    def test_fresh_changes_are_not_cached_from_replica(self):
+        """Страницу с реплики сразу после изменения не кэшируют."""
+        url = reverse('posts:index')
+        Post.objects.create(text='Свежий пост', author=self.user)
+        response = self.guest_client.get(url)
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertFalse(response.has_header('ETag'))
+        self.assertIsNotNone(self.guest_client.get(url).context)
+        with mock.patch.object(replicas.time, 'time',
+                               return_value=time.time() + 60):
+            self.guest_client.get(url)
+        self.assertIsNone(self.guest_client.get(url).context)
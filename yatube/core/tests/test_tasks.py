@@ -0,0 +1,124 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core.models import Task
+from core.tasks import claim, purge, run_pending, task
+
+CALLS = []
+
+
+@task
+def record(value, suffix=''):
+    CALLS.append(value + suffix)
+
+
+@task(max_attempts=2, retry_delay=60)
+def fail():
+    raise RuntimeError('сбой')
+
+
+@override_settings(TASKS_EAGER=False)
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_enqueue_only_inserts(self):
+        """Постановка в очередь — одна вставка, задача ждёт воркера."""
+        with self.assertNumQueries(1):
+            record.enqueue('a', suffix='!')
+        self.assertEqual(CALLS, [])
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(CALLS, ['a!'])
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+
+    def test_idempotency_key(self):
+        """Задача с тем же ключом ставится и выполняется один раз."""
+        record.enqueue('a', key='same')
+        record.enqueue('a', key='same')
+        run_pending()
+        record.enqueue('a', key='same')
+        run_pending()
+        self.assertEqual(CALLS, ['a'])
+
+    def test_delayed_task_waits(self):
+        """Отложенная задача не выполняется раньше срока."""
+        record.enqueue('a', delay=60)
+        self.assertEqual(run_pending(), 0)
+
+    def test_failed_task_is_retried_with_backoff(self):
+        """Упавшая задача повторяется позже, затем помечается ошибочной."""
+        fail.enqueue()
+        with self.assertLogs('core.tasks', 'ERROR'):
+            run_pending()
+        queued = Task.objects.get()
+        self.assertEqual(queued.status, Task.PENDING)
+        self.assertEqual(queued.attempts, 1)
+        self.assertGreater(queued.run_at, timezone.now())
+        self.assertIn('сбой', queued.last_error)
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.tasks', 'ERROR'):
+            run_pending()
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.FAILED)
+        self.assertEqual(queued.attempts, 2)
+
+    def test_failed_task_can_be_enqueued_again(self):
+        """Упавшая задача освобождает ключ для новой постановки."""
+        fail.enqueue(key='same')
+        for _ in range(fail.max_attempts):
+            Task.objects.update(run_at=timezone.now())
+            with self.assertLogs('core.tasks', 'ERROR'):
+                run_pending()
+        failed = Task.objects.get()
+        self.assertEqual(failed.status, Task.FAILED)
+        self.assertIsNone(failed.key)
+        fail.enqueue(key='same')
+        queued = Task.objects.get(key='same')
+        self.assertEqual(queued.status, Task.PENDING)
+        self.assertEqual(queued.attempts, 0)
+
+    def test_purge_removes_old_finished_tasks(self):
+        """Старые выполненные и упавшие задачи удаляются, ждущие — нет."""
+        old = timezone.now() - timedelta(days=8)
+        for status in (Task.DONE, Task.FAILED, Task.PENDING):
+            Task.objects.create(name=record.name, status=status,
+                                finished=old)
+        Task.objects.create(name=record.name, status=Task.FAILED,
+                            finished=timezone.now())
+        self.assertEqual(purge(7), 2)
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_task_is_claimed_once(self):
+        """Забранную задачу другой воркер получит только после аренды."""
+        record.enqueue('a')
+        self.assertEqual(len(claim(10)), 1)
+        self.assertEqual(claim(10), [])
+        Task.objects.update(locked_until=timezone.now() - timedelta(1))
+        self.assertEqual(len(claim(10)), 1)
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_mode_runs_immediately(self):
+        """В режиме TASKS_EAGER задача выполняется при постановке."""
+        record.enqueue('a')
+        self.assertEqual(CALLS, ['a'])
+
+
+@override_settings(TASKS_EAGER=False)
+class RunTasksCommandTests(TransactionTestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_worker_drains_queue(self):
+        """Команда с --once выполняет очередь в пуле потоков и выходит."""
+        for value in 'abc':
+            record.enqueue(value)
+        call_command('run_tasks', '--once', '--threads', '2',
+                     stdout=StringIO())
+        self.assertEqual(sorted(CALLS), ['a', 'b', 'c'])
+        self.assertEqual(
+            Task.objects.filter(status=Task.DONE).count(), 3
+        )
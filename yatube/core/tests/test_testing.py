@@ -0,0 +1,46 @@
+import threading
+import time
+
+from django.db import connection, connections
+from django.test import TransactionTestCase
+
+from core.testing import SlowQueries
+
+
+def query():
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+
+
+class SlowQueriesTests(TransactionTestCase):
+    def test_delay_only_inside_block(self):
+        """Каждый запрос внутри блока ждёт delay, после блока — нет."""
+        with SlowQueries(0.05) as slow:
+            started = time.perf_counter()
+            query()
+            self.assertGreaterEqual(time.perf_counter() - started, 0.05)
+        started = time.perf_counter()
+        query()
+        self.assertLess(time.perf_counter() - started, 0.05)
+        self.assertEqual([sql for sql, _, _ in slow.timeline], ['SELECT 1'])
+
+    def test_connections_opened_before_block(self):
+        """Поток с уже открытым соединением тоже замедляется."""
+        opened, run = threading.Event(), threading.Event()
+
+        def worker():
+            try:
+                query()
+                opened.set()
+                run.wait()
+                query()
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        opened.wait()
+        with SlowQueries(0) as slow:
+            run.set()
+            thread.join()
+        self.assertEqual(len(slow.timeline), 1)
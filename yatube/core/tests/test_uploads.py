@@ -0,0 +1,50 @@
+import hashlib
+from io import BytesIO
+
+from django.http.multipartparser import MultiPartParser
+from django.test import SimpleTestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+
+from core.uploads import StreamingUploadHandler, too_large
+
+
+def parse(content, chunk_size=1024):
+    """Разобрать форму с одним файлом так, как это делает запрос."""
+    upload = BytesIO(content)
+    upload.name = 'photo.jpg'
+    body = encode_multipart(BOUNDARY, {'image': upload, 'text': 'Пост'})
+    handler = StreamingUploadHandler()
+    handler.chunk_size = chunk_size
+    post, files = MultiPartParser(
+        {'CONTENT_TYPE': MULTIPART_CONTENT,
+         'CONTENT_LENGTH': str(len(body))},
+        BytesIO(body), [handler]
+    ).parse()
+    return post, files['image']
+
+
+class StreamingUploadHandlerTests(SimpleTestCase):
+    def test_file_written_to_disk_with_hash(self):
+        """Файл из нескольких кусков целиком на диске, хеш совпадает."""
+        content = bytes(range(256)) * 20
+        post, upload = parse(content)
+        self.addCleanup(upload.close)
+        self.assertTrue(upload.temporary_file_path())
+        self.assertEqual(upload.read(), content)
+        self.assertEqual(upload.size, len(content))
+        self.assertEqual(upload.sha256, hashlib.sha256(content).hexdigest())
+        self.assertFalse(too_large(upload))
+        self.assertEqual(post['text'], 'Пост')
+
+    @override_settings(FILE_UPLOAD_MAX_SIZE=2000)
+    def test_oversized_file_is_not_kept(self):
+        """Больше предела на диск не пишется, но остальная форма
+        разбирается, а размер остаётся настоящим."""
+        content = b'x' * 5000
+        post, upload = parse(content)
+        self.addCleanup(upload.close)
+        self.assertLessEqual(len(upload.read()), 2000)
+        self.assertEqual(upload.size, 5000)
+        self.assertIsNone(upload.sha256)
+        self.assertTrue(too_large(upload))
+        self.assertEqual(post['text'], 'Пост')
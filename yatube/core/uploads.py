@@ -0,0 +1,42 @@
+"""Загрузка файлов на диск кусками, с хешем и пределом размера.
+
+``StreamingUploadHandler`` заменяет стандартную пару обработчиков
+Django (маленькие файлы в памяти, большие на диске): любой файл
+пишется во временный файл кусками по 64 КБ, поэтому загрузка не
+держит в памяти больше одного куска. По дороге считается SHA-256
+содержимого (``upload.sha256``) — по нему файлы хранятся без повторов
+(``posts.images``).
+
+Файл больше ``FILE_UPLOAD_MAX_SIZE`` дальше предела не пишется: тело
+запроса дочитывается, чтобы дойти до остальных полей формы, но
+байты выбрасываются. ``upload.size`` остаётся настоящим размером,
+а ``upload.sha256`` — ``None``; такой файл отклоняет форма
+(``too_large``).
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+
+def too_large(upload):
+    return upload.size > settings.FILE_UPLOAD_MAX_SIZE
+
+
+class StreamingUploadHandler(TemporaryFileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+        self.oversized = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.FILE_UPLOAD_MAX_SIZE:
+            self.oversized = True
+        if not self.oversized:
+            self.sha256.update(raw_data)
+            self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        upload = super().file_complete(file_size)
+        upload.sha256 = None if self.oversized else self.sha256.hexdigest()
+        return upload
@@ -1,5 +1,12 @@
+import os
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from .caching import fragment_stats
+from .metrics import view_metrics
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -11,3 +18,18 @@ def permission_denied(request, exception):
 
 def server_error(request):
     return render(request, 'core/500.html', status=500)
+
+
+# Счётчики и гистограммы живут в памяти процесса: ответ описывает только
+# воркер, который его отдал, поэтому в нём есть pid этого воркера.
+@staff_member_required
+def cache_stats(request):
+    return JsonResponse({
+        'pid': os.getpid(),
+        'fragments': fragment_stats.snapshot(),
+    })
+
+
+@staff_member_required
+def metrics(request):
+    return JsonResponse({'pid': os.getpid(), 'views': view_metrics.snapshot()})
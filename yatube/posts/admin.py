@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import Group, Post, Comment, Follow
+from . import search
+from .models import Group, Post, Comment, Follow, Profile
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -10,12 +11,19 @@ class PostAdmin(admin.ModelAdmin):
         'pub_date',
         'author',
         'group',
+        'comments_count',
     )
     list_editable = ('group',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по индексу вместо LIKE '%...%' по всей таблице.
+        if not search.query_terms(search_term):
+            return super().get_search_results(request, queryset, search_term)
+        return search.filter_posts(queryset, search_term), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = (
@@ -31,8 +39,23 @@ class CommentAdmin(admin.ModelAdmin):
     )
     search_fields = ('text',)
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search.query_terms(search_term):
+            return super().get_search_results(request, queryset, search_term)
+        return search.filter_comments(queryset, search_term), False
+
+
+class ProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        'user',
+        'posts_count',
+    )
+    readonly_fields = ('posts_count',)
+    search_fields = ('user__username',)
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow)
+admin.site.register(Profile, ProfileAdmin)
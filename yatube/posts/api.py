@@ -0,0 +1,151 @@
+"""JSON API только для чтения: ленты и пост для мобильных клиентов.
+
+Ленты отдаются с курсорной пагинацией (``?cursor=``, ``?limit=``).
+ETag и Last-Modified строятся, как у HTML-страниц
+(``core.conditional.anonymous_conditional``), по времени изменения
+областей, которые показывает ответ: постов, имён, групп и комментариев
+(карточка несёт их число). Так любая правка, удаление или новый
+комментарий меняют оба валидатора, а ответ 304 не трогает базу.
+Валидаторы получает только ответ 200: у 404 их нет. Тело ответа
+собирается генератором (``StreamingHttpResponse``) по одному посту.
+
+Комментарии поста листаются тем же курсором, что и на странице поста
+(``get_comments_page``). Страница выбирается ещё во view, а генератор
+только сериализует её: запросы к базе видят метрики и бюджет запросов.
+"""
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+
+from core.conditional import anonymous_conditional
+
+from .models import Group, Post
+from .paginator import CursorPaginator
+from .scopes import COMMENTS, FEED, GROUPS, USERS, author_scope, group_scope
+from .views import get_comments_page, post_detail_scopes
+
+User = get_user_model()
+
+
+def index_posts():
+    return Post.objects.for_feed()
+
+
+def group_posts(slug):
+    return Post.objects.for_feed().filter(group__slug=slug)
+
+
+def profile_posts(username):
+    return Post.objects.for_feed().filter(author__username=username)
+
+
+def index_scopes():
+    return [FEED, USERS, COMMENTS]
+
+
+def group_scopes(slug):
+    return [group_scope(slug), USERS, COMMENTS]
+
+
+def profile_scopes(username):
+    return [author_scope(username), GROUPS, COMMENTS]
+
+
+def dumps(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def serialize_post(request, post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date,
+        'author': post.author.username,
+        'group': post.group.slug if post.group else None,
+        'image': request.build_absolute_uri(post.image.url)
+        if post.image else None,
+        'comments_count': post.comments_count,
+        'url': request.build_absolute_uri(
+            reverse('posts:api_post_detail', args=[post.pk])
+        ),
+    }
+
+
+def page_url(request, cursor):
+    if not cursor:
+        return None
+    query = request.GET.copy()
+    query.pop('page', None)
+    query['cursor'] = cursor
+    return request.build_absolute_uri('?' + query.urlencode())
+
+
+def stream_page(request, page_obj):
+    yield '{"results": ['
+    for number, post in enumerate(page_obj):
+        yield (',' if number else '') + dumps(serialize_post(request, post))
+    yield '], "next": {}, "previous": {}}}'.format(
+        dumps(page_url(request, page_obj.next_cursor)),
+        dumps(page_url(request, page_obj.previous_cursor)),
+    )
+
+
+def feed_response(request, posts):
+    try:
+        limit = int(request.GET.get('limit', settings.PAGE))
+    except ValueError:
+        limit = settings.PAGE
+    limit = min(max(limit, 1), settings.API_MAX_PAGE)
+    paginator = CursorPaginator(posts, limit)
+    page_obj = paginator.get_page(
+        request.GET.get('page'), request.GET.get('cursor')
+    )
+    return StreamingHttpResponse(
+        stream_page(request, page_obj), content_type='application/json'
+    )
+
+
+@anonymous_conditional(index_scopes)
+def index(request):
+    return feed_response(request, index_posts())
+
+
+@anonymous_conditional(group_scopes)
+def group_list(request, slug):
+    get_object_or_404(Group, slug=slug)
+    return feed_response(request, group_posts(slug))
+
+
+@anonymous_conditional(profile_scopes)
+def profile(request, username):
+    get_object_or_404(User, username=username)
+    return feed_response(request, profile_posts(username))
+
+
+def stream_post(request, post, comments):
+    yield '{"post": ' + dumps(serialize_post(request, post))
+    yield ', "comments": ['
+    for number, comment in enumerate(comments):
+        yield (',' if number else '') + dumps({
+            'id': comment.pk,
+            'author': comment.author.username,
+            'text': comment.text,
+            'created': comment.created,
+        })
+    yield '], "next": {}}}'.format(
+        dumps(page_url(request, comments.next_cursor))
+    )
+
+
+@anonymous_conditional(post_detail_scopes)
+def post_detail(request, post_id):
+    post = get_object_or_404(Post.objects.for_feed(), pk=post_id)
+    comments = get_comments_page(post.pk, request.GET.get('cursor'))
+    return StreamingHttpResponse(
+        stream_post(request, post, comments), content_type='application/json'
+    )
@@ -0,0 +1,68 @@
+"""Денормализованные счётчики постов автора и комментариев поста."""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count_subquery(model, field, outer='pk'):
+    counts = (
+        model.objects.filter(**{field: OuterRef(outer)})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def change_posts_count(user_id, delta):
+    from .models import Post, Profile
+
+    profiles = Profile.objects.filter(user_id=user_id)
+    if delta < 0:
+        profiles = profiles.filter(posts_count__gte=-delta)
+    updated = profiles.update(posts_count=F('posts_count') + delta)
+    if not updated and delta > 0:
+        # Профиля ещё нет: создаём его сразу с честным значением.
+        Profile.objects.get_or_create(
+            user_id=user_id,
+            defaults={
+                'posts_count': Post.objects.filter(author_id=user_id).count()
+            }
+        )
+
+
+def change_followers_count(user_id, delta):
+    from .models import Profile
+
+    profiles = Profile.objects.filter(user_id=user_id)
+    if delta < 0:
+        profiles = profiles.filter(followers_count__gte=-delta)
+    profiles.update(followers_count=F('followers_count') + delta)
+
+
+def change_comments_count(post_id, delta):
+    from .models import Post
+
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comments_count__gte=-delta)
+    posts.update(comments_count=F('comments_count') + delta)
+
+
+def rebuild_counters():
+    """Пересчитать все счётчики с нуля."""
+    from .models import Comment, Follow, Post, Profile
+
+    with transaction.atomic():
+        missing = get_user_model().objects.filter(profile__isnull=True)
+        Profile.objects.bulk_create(
+            Profile(user_id=user_id)
+            for user_id in missing.values_list('pk', flat=True)
+        )
+        Profile.objects.update(
+            posts_count=_count_subquery(Post, 'author', 'user_id'),
+            followers_count=_count_subquery(Follow, 'author', 'user_id'),
+        )
+        Post.objects.update(comments_count=_count_subquery(Comment, 'post'))
@@ -0,0 +1,179 @@
+"""Письма подписчикам с новыми постами авторов.
+
+Письмо на каждый пост каждому подписчику — это 100 000 отправок на один
+пост популярного автора. Вместо этого новые посты копятся, и раз
+в ``DIGEST_INTERVAL`` секунд каждый подписчик получает одно письмо
+со всеми постами за это время.
+
+Первый пост окна ставит в очередь ``core.tasks`` задачу рассылки
+с ключом окна (``posts.tasks.schedule_digests``), остальные посты того
+же окна её не дублируют. Рассылка идёт пачками по ``DIGEST_CHUNK_SIZE``
+подписчиков: посты пачки выбираются по подпискам (``Follow``) и дате
+публикации — два запроса на пачку, а не на подписчика. Ленты подписок
+(``TimelineEntry``) для этого не годятся: их заполняет фоновая задача,
+которая к рассылке может ещё стоять в очереди, и опоздавший пост
+оказался бы раньше отметки отправки. Письма пачки уходят через одно
+соединение с почтовым сервером.
+
+Что уже отправлено, помнит ``Profile.digest_sent_until``, а каждое
+письмо записывается в ``Digest`` с состоянием. Если письмо не ушло,
+отметка не сдвигается, соединение открывается заново (сессия после
+ошибки SMTP может быть сломана, и иначе не ушли бы и остальные письма
+пачки), а для этого подписчика ставится отдельная задача повтора
+(``posts.tasks.retry_digest``) через ``DIGEST_RETRY_DELAY`` секунд.
+Повтор шлёт только его письмо за то же окно.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Digest, Follow, Post, Profile
+
+logger = logging.getLogger(__name__)
+
+SUBJECT = 'Новые посты авторов, на которых вы подписаны'
+
+
+def recipients():
+    """Профили активных подписчиков с адресом почты, по возрастанию id."""
+    readers = Follow.objects.values('user_id')
+    return Profile.objects.filter(
+        user__in=readers, user__is_active=True
+    ).exclude(user__email='').select_related('user').order_by('pk')
+
+
+def collect(profiles, since, until):
+    """Новые посты для каждого профиля пачки: ``{user_id: [post, ...]}``."""
+    border = min(since.values())
+    readers = defaultdict(list)
+    follows = Follow.objects.filter(
+        user_id__in=[profile.user_id for profile in profiles]
+    ).values_list('author_id', 'user_id')
+    for author_id, user_id in follows:
+        readers[author_id].append(user_id)
+    found = defaultdict(list)
+    posts = Post.objects.for_feed().filter(
+        author_id__in=readers, pub_date__gt=border, pub_date__lte=until
+    ).order_by('-pub_date', '-pk')
+    for post in posts:
+        for user_id in readers[post.author_id]:
+            if post.pub_date > since[user_id]:
+                found[user_id].append(post)
+    return dict(found)
+
+
+def build_message(user, posts):
+    shown = posts[:settings.DIGEST_MAX_POSTS]
+    body = render_to_string('posts/email/digest.txt', {
+        'user': user,
+        'posts': shown,
+        'more': len(posts) - len(shown),
+        'site_url': settings.SITE_URL,
+    })
+    return EmailMessage(SUBJECT, body, to=[user.email])
+
+
+def reopen(connection):
+    """Закрыть соединение после ошибки и открыть новое."""
+    try:
+        connection.close()
+    except Exception:
+        # Сломанная сессия может не закрыться чисто: она и не нужна.
+        pass
+    try:
+        connection.open()
+    except Exception as error:
+        # Следующее письмо попробует открыть соединение само.
+        logger.warning('Почтовый сервер недоступен: %s', error)
+
+
+def send_chunk(profiles, until, connection):
+    """Отправить письма пачке профилей.
+
+    Вернуть число отправленных писем и id подписчиков, чьи письма
+    не ушли.
+    """
+    oldest = until - timedelta(seconds=settings.DIGEST_MAX_AGE)
+    default = until - timedelta(seconds=settings.DIGEST_INTERVAL)
+    since = {
+        profile.user_id: max(profile.digest_sent_until or default, oldest)
+        for profile in profiles
+    }
+    posts = collect(profiles, since, until)
+    done, digests, failed = [], [], []
+    for profile in profiles:
+        user_posts = posts.get(profile.user_id)
+        if user_posts:
+            try:
+                connection.send_messages(
+                    [build_message(profile.user, user_posts)]
+                )
+            except Exception as error:
+                logger.warning('Дайджест для %s не отправлен: %s',
+                               profile.user, error)
+                digests.append(Digest(
+                    user_id=profile.user_id, posts_count=len(user_posts),
+                    status=Digest.FAILED, error=str(error)
+                ))
+                failed.append(profile.user_id)
+                reopen(connection)
+                continue
+            digests.append(Digest(
+                user_id=profile.user_id, posts_count=len(user_posts),
+                status=Digest.SENT
+            ))
+        profile.digest_sent_until = until
+        done.append(profile)
+    Digest.objects.bulk_create(digests)
+    Profile.objects.bulk_update(done, ['digest_sent_until'])
+    return sum(digest.status == Digest.SENT for digest in digests), failed
+
+
+def schedule_retries(user_ids, until):
+    from .tasks import retry_digest
+
+    for user_id in user_ids:
+        retry_digest.enqueue(
+            user_id, until.isoformat(),
+            key=f'retry_digest:{user_id}:{until.isoformat()}',
+            delay=settings.DIGEST_RETRY_DELAY
+        )
+
+
+def send_digests(chunk_size=None):
+    """Разослать дайджесты всем подписчикам; вернуть число писем."""
+    chunk_size = chunk_size or settings.DIGEST_CHUNK_SIZE
+    until = timezone.now()
+    sent = last_pk = 0
+    with get_connection() as connection:
+        while True:
+            profiles = list(recipients().filter(pk__gt=last_pk)[:chunk_size])
+            if not profiles:
+                return sent
+            chunk_sent, failed = send_chunk(profiles, until, connection)
+            schedule_retries(failed, until)
+            sent += chunk_sent
+            last_pk = profiles[-1].pk
+
+
+def retry(user_id, until):
+    """Повторить письмо одного подписчика за окно до ``until``.
+
+    Вернуть ``False``, если оно снова не ушло.
+    """
+    profiles = list(recipients().filter(
+        Q(digest_sent_until__isnull=True) | Q(digest_sent_until__lt=until),
+        user_id=user_id
+    ))
+    if not profiles:
+        # Письмо уже ушло со следующей рассылкой или подписок больше нет.
+        return True
+    with get_connection() as connection:
+        _, failed = send_chunk(profiles, until, connection)
+    return not failed
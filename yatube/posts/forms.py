@@ -1,5 +1,11 @@
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
 
+from core.uploads import too_large
+
+from . import images
 from .models import Post, Comment
 
 
@@ -16,6 +22,28 @@ class PostForm(forms.ModelForm):
             'свой опыт использования акксесуара для сна',
         }
 
+    def clean_image(self):
+        """Новая картинка уменьшается и получает имя по содержимому
+        (``posts.images``); уже сохранённая остаётся как есть."""
+        image = self.cleaned_data['image']
+        if not isinstance(image, UploadedFile) or too_large(image):
+            return image
+        return images.prepare(image, Post._meta.get_field('image').storage)
+
+    def clean(self):
+        # Обрезанный на пределе файл ImageField считает битой картинкой;
+        # пользователю важнее знать, что файл просто слишком большой.
+        upload = self.files.get('image')
+        if upload is not None and too_large(upload):
+            self.errors.pop('image', None)
+            self.add_error('image', forms.ValidationError(
+                'Файл больше %s' % filesizeformat(
+                    settings.FILE_UPLOAD_MAX_SIZE
+                ),
+                code='file_too_large'
+            ))
+        return super().clean()
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,149 @@
+"""Картинки постов: проверка, уменьшение и хранение без повторов.
+
+Загрузка уже лежит на диске (``core.uploads``), и ``ImageField`` формы
+проверил её ``verify()`` — без декодирования пикселей. ``prepare``
+читает только заголовок: формат из ``EXTENSIONS`` и не больше
+``POST_IMAGE_MAX_PIXELS`` пикселей, иначе картинка даже не
+декодируется. Затем:
+
+* большая сторона уменьшается до ``POST_IMAGE_MAX_DIMENSION``; JPEG
+  сразу декодируется в уменьшенном масштабе (``draft``: 1/2, 1/4, 1/8),
+  поэтому пиксели оригинала целиком в памяти не появляются;
+* поворот из EXIF применяется к пикселям, а EXIF, XMP и комментарии
+  не сохраняются — в них бывают координаты съёмки; остаётся только
+  цветовой профиль ICC;
+* имя файла — SHA-256 загрузки (``posts/<sha256>.jpg``). Повторная
+  загрузка той же картинки не декодируется и не пишется: пост получает
+  уже сохранённый файл.
+
+Анимации (GIF, WebP, APNG) сохраняются всеми кадрами без уменьшения,
+поэтому больше ``POST_IMAGE_MAX_DIMENSION`` их не принимают.
+"""
+import hashlib
+import math
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from PIL import Image
+
+UPLOAD_TO = 'posts/'
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+# Режимы, которые формат сохраняет без преобразования.
+MODES = {'JPEG': ('RGB', 'L'), 'WEBP': ('RGB', 'RGBA')}
+ORIENTATION = 0x0112
+TRANSPOSE = {
+    2: Image.FLIP_LEFT_RIGHT,
+    3: Image.ROTATE_180,
+    4: Image.FLIP_TOP_BOTTOM,
+    5: Image.TRANSPOSE,
+    6: Image.ROTATE_270,
+    7: Image.TRANSVERSE,
+    8: Image.ROTATE_90,
+}
+
+
+def digest(upload):
+    """SHA-256 содержимого: готовый от ``core.uploads`` или по кускам."""
+    sha256 = getattr(upload, 'sha256', None)
+    if sha256:
+        return sha256
+    hasher = hashlib.sha256()
+    for chunk in upload.chunks():
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def inspect(upload):
+    """Формат картинки по заголовку; пиксели не декодируются."""
+    upload.seek(0)
+    try:
+        with Image.open(upload) as image:
+            image_format, (width, height) = image.format, image.size
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError(
+            'Файл не похож на картинку', code='invalid_image'
+        )
+    if image_format not in EXTENSIONS:
+        raise ValidationError(
+            'Подойдёт картинка JPEG, PNG, GIF или WebP',
+            code='invalid_format'
+        )
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            f'Картинка {width}×{height} слишком большая: не больше '
+            f'{settings.POST_IMAGE_MAX_PIXELS // 10 ** 6} Мпикс',
+            code='too_many_pixels'
+        )
+    return image_format
+
+
+def storage_name(upload, image_format):
+    return f'{UPLOAD_TO}{digest(upload)}.{EXTENSIONS[image_format]}'
+
+
+def prepare(upload, storage):
+    """Картинка для поля ``image``: имя сохранённого файла или ``File``.
+
+    ``ValidationError`` — если картинку нельзя принять.
+    """
+    image_format = inspect(upload)
+    name = storage_name(upload, image_format)
+    if storage.exists(name):
+        return name
+    content = process(upload, image_format)
+    return File(content, name=name[len(UPLOAD_TO):])
+
+
+def downsample(image, image_format):
+    """Уменьшить до ``POST_IMAGE_MAX_DIMENSION`` и повернуть по EXIF."""
+    limit = settings.POST_IMAGE_MAX_DIMENSION
+    orientation = image.getexif().get(ORIENTATION)
+    scale = min(limit / max(image.size), 1)
+    # Только для JPEG: декодер сразу отдаёт картинку, уменьшенную в 2–8
+    # раз, но не меньше итоговой, дальше её доводит thumbnail.
+    image.draft('RGB', tuple(math.ceil(side * scale) for side in image.size))
+    image.thumbnail((limit, limit), Image.LANCZOS)
+    if orientation in TRANSPOSE:
+        image = image.transpose(TRANSPOSE[orientation])
+    modes = MODES.get(image_format)
+    if modes and image.mode not in modes:
+        image = image.convert(modes[-1] if (
+            'A' in image.mode or 'transparency' in image.info
+        ) else modes[0])
+    return image
+
+
+def process(upload, image_format):
+    """Перекодировать картинку без метаданных в файл (в памяти до
+    ``FILE_UPLOAD_MAX_MEMORY_SIZE``, дальше на диске)."""
+    upload.seek(0)
+    content = SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    options = {'quality': settings.POST_IMAGE_QUALITY}
+    try:
+        with Image.open(upload) as source:
+            icc_profile = source.info.get('icc_profile')
+            if icc_profile:
+                options['icc_profile'] = icc_profile
+            if getattr(source, 'is_animated', False):
+                limit = settings.POST_IMAGE_MAX_DIMENSION
+                if max(source.size) > limit:
+                    raise ValidationError(
+                        f'Анимация должна быть не больше {limit} px',
+                        code='animation_too_large'
+                    )
+                source.save(content, image_format, save_all=True, **options)
+            else:
+                downsample(source, image_format).save(
+                    content, image_format, **options
+                )
+    except (OSError, SyntaxError, ValueError) as error:
+        content.close()
+        raise ValidationError(
+            f'Картинку не удалось прочитать: {error}', code='invalid_image'
+        )
+    content.seek(0)
+    return content
@@ -0,0 +1,86 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+
+from posts.models import Post
+from posts.paginator import NEXT, CursorPaginator
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время выборки N-й страницы ленты: OFFSET + COUNT(*) '
+            'против курсора. Синтетические посты откатываются после замера.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--per-page', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--pages', type=int, nargs='+', default=[1, 10, 100, 1000, 5000]
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.seed(options['posts'])
+                self.measure(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, total):
+        author = User.objects.create(username='bench_pagination_author')
+        batch = 5000
+        for start in range(0, total, batch):
+            Post.objects.bulk_create(
+                Post(text=f'Пост {number}', author=author)
+                for number in range(start, min(start + batch, total))
+            )
+
+    def measure(self, options):
+        per_page = options['per_page']
+        queryset = Post.objects.all()
+        ordered = queryset.order_by('-pub_date', '-id')
+        total = queryset.count()
+        self.stdout.write(f'{"страница":>10} {"offset, мс":>12} '
+                          f'{"курсор, мс":>12}')
+        for number in options['pages']:
+            offset = (number - 1) * per_page
+            if offset >= total:
+                continue
+            anchor = ordered[offset - 1] if offset else None
+
+            def by_offset():
+                list(Paginator(ordered, per_page).page(number))
+
+            def by_cursor():
+                paginator = CursorPaginator(queryset, per_page)
+                if anchor is None:
+                    list(paginator.get_page(1))
+                    return
+                token = paginator.encode_cursor(NEXT, number, anchor)
+                list(paginator.get_page(cursor=token))
+
+            offset_ms = self.timeit(by_offset, options['repeat'])
+            cursor_ms = self.timeit(by_cursor, options['repeat'])
+            self.stdout.write(
+                f'{number:>10} {offset_ms:>12.2f} {cursor_ms:>12.2f}'
+            )
+
+    @staticmethod
+    def timeit(func, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            elapsed = (time.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best
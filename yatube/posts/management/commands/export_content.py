@@ -0,0 +1,53 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.transfer import MODELS, export_records, write_csv, write_jsonl
+
+
+class Command(BaseCommand):
+    help = ('Выгружает группы, посты, комментарии и подписки в JSONL '
+            '(все модели в одном файле) или CSV (одна модель).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-',
+                            help='Файл; по умолчанию stdout.')
+        parser.add_argument('--format', choices=('jsonl', 'csv'))
+        parser.add_argument('--models', nargs='+', choices=MODELS,
+                            default=list(MODELS))
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        output = options['output']
+        file_format = options['format'] or (
+            'csv' if output.endswith('.csv') else 'jsonl'
+        )
+        models = [model for model in MODELS if model in options['models']]
+        if file_format == 'csv' and len(models) != 1:
+            raise CommandError('В CSV выгружается ровно одна модель')
+        stream = sys.stdout if output == '-' else open(
+            output, 'w', encoding='utf-8', newline=''
+        )
+        started = time.perf_counter()
+        try:
+            if file_format == 'csv':
+                written = write_csv(
+                    export_records(models[0], options['chunk_size']),
+                    stream, models[0]
+                )
+            else:
+                written = sum(
+                    write_jsonl(
+                        export_records(model, options['chunk_size']), stream
+                    )
+                    for model in models
+                )
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+        elapsed = time.perf_counter() - started
+        self.stderr.write(
+            f'Выгружено {written} записей за {elapsed:.1f} с '
+            f'({written / elapsed if elapsed else 0:.0f} в секунду)'
+        )
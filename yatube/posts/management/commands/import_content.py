@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.transfer import (MODELS, Importer, TransferError, finalize,
+                            read_checkpoint, read_csv, read_jsonl)
+
+
+class Command(BaseCommand):
+    help = ('Загружает выгрузку export_content пачками bulk_create. '
+            'С --checkpoint прерванную загрузку можно продолжить --resume. '
+            'CSV-файлы одной выгрузки (посты, затем комментарии) грузятся '
+            'с общим --checkpoint: комментарии получают тот же сдвиг id '
+            'постов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=('jsonl', 'csv'))
+        parser.add_argument('--model', choices=MODELS,
+                            help='Модель в CSV-файле.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл с номером последней загруженной строки.'
+        )
+        parser.add_argument('--resume', action='store_true')
+        parser.add_argument(
+            '--post-offset', type=int,
+            help='Сдвиг id постов; по умолчанию из --checkpoint или '
+                 'наибольший id поста в базе.'
+        )
+        parser.add_argument(
+            '--comment-offset', type=int,
+            help='Сдвиг id комментариев, как --post-offset.'
+        )
+        parser.add_argument(
+            '--no-finalize', action='store_true',
+            help='Не пересчитывать счётчики, ленты и индекс поиска '
+                 '(если следом грузится ещё один файл).'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'jsonl'
+        )
+        if file_format == 'csv' and not options['model']:
+            raise CommandError('Для CSV нужен --model')
+        if options['resume'] and not options['checkpoint']:
+            raise CommandError('--resume работает только с --checkpoint')
+        if (file_format == 'csv' and options['model'] == 'comment'
+                and options['post_offset'] is None
+                and 'post_offset' not in (
+                    read_checkpoint(options['checkpoint']) or {})):
+            # Посты этой выгрузки уже в базе, и максимальный id поста
+            # сдвинул бы ссылки комментариев мимо них.
+            raise CommandError(
+                'Для комментариев из CSV нужен --checkpoint загрузки '
+                'постов или --post-offset'
+            )
+        importer = Importer(
+            batch_size=options['batch_size'],
+            checkpoint=options['checkpoint'],
+            progress=self.report,
+            post_offset=options['post_offset'],
+            comment_offset=options['comment_offset'],
+        )
+        with open(path, encoding='utf-8', newline='') as stream:
+            records = (
+                read_csv(stream, options['model']) if file_format == 'csv'
+                else read_jsonl(stream)
+            )
+            try:
+                loaded = importer.run(records, resume=options['resume'])
+            except TransferError as error:
+                raise CommandError(error)
+        if not options['no_finalize']:
+            finalize()
+        self.stdout.write(self.style.SUCCESS(f'Загружено записей: {loaded}'))
+
+    def report(self, position, rate):
+        self.stderr.write(f'строка {position}: {rate:.0f} записей в секунду')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.search import get_index
+
+
+class Command(BaseCommand):
+    help = ('Перестраивает индекс поиска по постам и комментариям '
+            '(например, после смены SEARCH_BACKEND или loaddata).')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            get_index().rebuild()
+        self.stdout.write(self.style.SUCCESS('Индекс поиска перестроен'))
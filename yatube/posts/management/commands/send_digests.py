@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.digests import send_digests
+
+
+class Command(BaseCommand):
+    help = ('Рассылает подписчикам дайджесты новых постов. Обычно '
+            'рассылку ставит в очередь первый пост окна; команда — '
+            'для ручного запуска и cron.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int)
+
+    def handle(self, *args, **options):
+        sent = send_digests(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Отправлено писем: {sent}'))
@@ -0,0 +1,104 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# SQLite вставляет пачку одним составным SELECT (не больше 500 частей).
+BATCH_SIZE = 500
+
+
+def fill_timeline(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    Profile = apps.get_model('posts', 'Profile')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    followers = (
+        Follow.objects.filter(author_id=OuterRef('user_id'))
+        .order_by()
+        .values('author_id')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Profile.objects.update(followers_count=Coalesce(
+        Subquery(followers, output_field=models.IntegerField()), 0
+    ))
+    # Как posts.timeline: до TIMELINE_BACKFILL_LIMIT последних постов на
+    # подписку, популярных авторов не раскладываем, вставляем пачками.
+    limit = settings.TIMELINE_BACKFILL_LIMIT
+    celebrities = Profile.objects.filter(
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).values('user_id')
+    author_ids = list(
+        Follow.objects.exclude(author_id__in=celebrities)
+        .order_by('author_id')
+        .values_list('author_id', flat=True)
+        .distinct()
+    )
+    for author_id in author_ids:
+        posts = list(
+            Post.objects.filter(author_id=author_id)
+            .order_by('-pub_date', '-id')
+            .values_list('pk', 'pub_date')[:limit]
+        )
+        if not posts:
+            continue
+        followers = Follow.objects.filter(
+            author_id=author_id
+        ).order_by('user_id').values_list('user_id', flat=True)
+        chunk_size = max(1, BATCH_SIZE // len(posts))
+        last_user_id = 0
+        while True:
+            user_ids = list(
+                followers.filter(user_id__gt=last_user_id)[:chunk_size]
+            )
+            if not user_ids:
+                break
+            TimelineEntry.objects.bulk_create(
+                [TimelineEntry(user_id=user_id, post_id=post_id,
+                               pub_date=pub_date)
+                 for user_id in user_ids
+                 for post_id, pub_date in posts],
+                batch_size=BATCH_SIZE
+            )
+            last_user_id = user_ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0009_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Число подписчиков'),
+        ),
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации поста')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.Post', verbose_name='Пост')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='Читатель')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи ленты',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='timeline_user_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_timeline_entry'),
+        ),
+        migrations.RunPython(fill_timeline, migrations.RunPython.noop),
+    ]
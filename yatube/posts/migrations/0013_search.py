@@ -0,0 +1,79 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:32
+
+import re
+from collections import Counter
+
+from django.db import OperationalError, migrations, models
+import django.db.models.deletion
+
+FTS_TABLE = 'posts_search'
+
+
+def create_search_index(apps, schema_editor):
+    """Таблица FTS5 на SQLite, если модуль есть, иначе таблица вхождений."""
+    if schema_editor.connection.vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                f"body, post_id UNINDEXED, "
+                f"tokenize='unicode61 remove_diacritics 0')"
+            )
+        except OperationalError:
+            pass
+        else:
+            schema_editor.execute(
+                f'INSERT INTO {FTS_TABLE}(rowid, body, post_id) '
+                f'SELECT id * 2, text, id FROM posts_post'
+            )
+            schema_editor.execute(
+                f'INSERT INTO {FTS_TABLE}(rowid, body, post_id) '
+                f'SELECT id * 2 + 1, text, post_id FROM posts_comment'
+            )
+            return
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    SearchPosting = apps.get_model('posts', 'SearchPosting')
+    documents = [
+        (pk, None, text) for pk, text in Post.objects.values_list('pk', 'text')
+    ] + list(Comment.objects.values_list('post_id', 'pk', 'text'))
+    for post_id, comment_id, text in documents:
+        words = re.findall(r'[^\W_]+', text.lower())
+        SearchPosting.objects.bulk_create(
+            SearchPosting(term=word[:64], post_id=post_id,
+                          comment_id=comment_id, frequency=frequency)
+            for word, frequency in Counter(words).items()
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Слово')),
+                ('frequency', models.PositiveIntegerField(verbose_name='Число вхождений')),
+                ('comment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Comment', verbose_name='Комментарий')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Вхождение слова',
+                'verbose_name_plural': 'Вхождения слов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchposting',
+            index=models.Index(fields=['term', 'post'], name='search_term_idx'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -13,6 +13,14 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для ленты: автор и группа одним JOIN, чтобы шаблон
+        не ходил в базу за каждым постом. Число комментариев хранится
+        в самом посте (``comments_count``)."""
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
     group = models.ForeignKey(
         Group,
@@ -26,6 +34,9 @@ class Post(models.Model):
     pub_date = models.DateTimeField(
         verbose_name='Дата создания',
         auto_now_add=True, )
+    updated = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True, )
     author = models.ForeignKey(
         User,
         verbose_name='Имя пользователя',
@@ -37,11 +48,33 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Ленты читаются по (pub_date, id) — см. posts.paginator.
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -69,6 +102,15 @@ class Comment(models.Model):
         verbose_name='Дата и время публикации комментария'
     )
 
+    class Meta:
+        ordering = ['created', 'id']
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_idx'
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -93,3 +135,125 @@ class Follow(models.Model):
                 name='unique_follow'
             )
         ]
+
+
+class Profile(models.Model):
+    """Счётчики автора, которые иначе пришлось бы считать COUNT(*)."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='profile',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0
+    )
+    # Посты до этого момента уже ушли в дайджест (posts.digests).
+    digest_sent_until = models.DateTimeField(
+        'Дайджест отправлен по',
+        null=True,
+        blank=True
+    )
+
+    class Meta:
+        verbose_name = 'Профиль'
+        verbose_name_plural = 'Профили'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class Digest(models.Model):
+    """Письмо подписчику с новыми постами авторов (posts.digests)."""
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUSES = (
+        (SENT, 'Отправлено'),
+        (FAILED, 'Ошибка отправки'),
+    )
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='digests',
+        verbose_name='Получатель'
+    )
+    created = models.DateTimeField('Дата отправки', auto_now_add=True)
+    posts_count = models.PositiveIntegerField('Число постов')
+    status = models.CharField('Состояние', max_length=10, choices=STATUSES)
+    error = models.TextField('Ошибка', blank=True)
+
+    class Meta:
+        ordering = ['-created']
+        verbose_name = 'Дайджест'
+        verbose_name_plural = 'Дайджесты'
+
+    def __str__(self):
+        return f'{self.user} {self.created:%d.%m.%Y %H:%M}'
+
+
+class TimelineEntry(models.Model):
+    """Пост в ленте подписок конкретного пользователя (fan-out on write)."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    # Копия даты поста: лента читается одним диапазоном по индексу.
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_idx'
+            )
+        ]
+
+
+class SearchPosting(models.Model):
+    """Вхождение слова в пост или комментарий.
+
+    Запасной инвертированный индекс поиска для баз без FTS5
+    (см. posts.search).
+    """
+    term = models.CharField('Слово', max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Пост'
+    )
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Комментарий'
+    )
+    frequency = models.PositiveIntegerField('Число вхождений')
+
+    class Meta:
+        verbose_name = 'Вхождение слова'
+        verbose_name_plural = 'Вхождения слов'
+        indexes = [
+            models.Index(fields=['term', 'post'], name='search_term_idx'),
+        ]
@@ -0,0 +1,315 @@
+import base64
+import binascii
+import hashlib
+import json
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import DatabaseError, connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+LAST = 'l'
+COUNT_KEY = 'paginator_count:{}'
+
+
+def estimate_rows(model):
+    """Число строк таблицы по статистике базы или ``None``.
+
+    PostgreSQL хранит оценку в ``pg_class.reltuples``, SQLite — в
+    ``sqlite_stat1`` после ``ANALYZE``. Оценка не требует COUNT(*).
+    """
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE relname = %s'
+    elif connection.vendor == 'sqlite':
+        # Первое число stat — строк в индексе, то есть в таблице.
+        sql = ("SELECT MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 "
+               "WHERE tbl = %s")
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        # В SQLite без ANALYZE таблицы sqlite_stat1 нет.
+        return None
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (keyset) вместо OFFSET.
+
+    Страница по курсору выбирается одним запросом
+    ``WHERE (pub_date, id) < (...) ORDER BY pub_date DESC, id DESC LIMIT n``,
+    поэтому её стоимость не зависит от глубины. Номер страницы (``?page=N``)
+    по-прежнему поддерживается для старых ссылок, но тоже обходится без
+    COUNT(*): наличие следующей страницы проверяется лишней строкой.
+
+    Страницы остаются обычными ``Page``; курсоры соседних страниц лежат
+    в ``page.next_cursor`` и ``page.previous_cursor``. ``num_pages`` после
+    выборки страницы — известная нижняя граница (текущая страница плюс
+    следующая, если она есть), точное число даёт ``count``.
+
+    ``transform`` превращает выбранные строки в объекты страницы, например
+    записи ленты в посты; курсоры при этом строятся по исходным строкам.
+
+    Для ссылок на страницы есть ``get_elided_page_range`` (как в Django
+    3.2): первые и последние страницы и окно вокруг текущей. Номер
+    последней страницы берётся из ``approximate_count`` — подсказки
+    ``count_hint`` (например, счётчика постов автора), статистики базы
+    для всей таблицы или COUNT(*), закэшированного на
+    ``PAGINATOR_COUNT_TIMEOUT`` секунд. Сама последняя страница
+    открывается курсором ``last_cursor`` без OFFSET.
+
+    Ссылки для шаблона даёт ``page.page_links``: соседние и последняя
+    страницы открываются курсорами, ``?page=N`` остаётся только для
+    первых ``OFFSET_LINK_PAGES`` страниц, где OFFSET дёшев. Остальные
+    номера показываются без ссылки, так что ни одна ссылка пагинатора
+    не ведёт на OFFSET-сканирование глубины ленты.
+    """
+    ELLIPSIS = '…'
+    OFFSET_LINK_PAGES = 3
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id'),
+                 transform=None, count_hint=None, **kwargs):
+        self.ordering = tuple(ordering)
+        self.transform = transform
+        self.count_hint = count_hint
+        self._known_pages = None
+        super().__init__(object_list.order_by(*self.ordering), per_page,
+                         **kwargs)
+
+    @property
+    def num_pages(self):
+        if self._known_pages is not None:
+            return self._known_pages
+        return self.exact_num_pages
+
+    @property
+    def exact_num_pages(self):
+        return super().num_pages
+
+    @cached_property
+    def approximate_count(self):
+        """Число объектов без COUNT(*) на каждый запрос; может отставать."""
+        if self.count_hint is not None:
+            return self.count_hint
+        query = str(self.object_list.query).encode()
+        key = COUNT_KEY.format(hashlib.md5(query).hexdigest())
+        count = cache.get(key)
+        if count is None:
+            if not self.object_list.query.where:
+                count = estimate_rows(self.object_list.model)
+            if count is None:
+                count = self.count
+            cache.set(key, count, settings.PAGINATOR_COUNT_TIMEOUT)
+        return count
+
+    @cached_property
+    def approximate_num_pages(self):
+        pages = -(-self.approximate_count // self.per_page)
+        return max(pages, self._known_pages or 1)
+
+    def get_elided_page_range(self, number=1, *, on_each_side=3, on_ends=2):
+        """Номера страниц со свёрнутыми пропусками (``ELLIPSIS``).
+
+        Сколько бы ни было страниц, номеров не больше
+        ``2 * (on_each_side + on_ends) + 3``.
+        """
+        last = max(self.approximate_num_pages, number)
+        if last <= (on_each_side + on_ends) * 2:
+            yield from range(1, last + 1)
+            return
+        if number > 1 + on_each_side + on_ends + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < last - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(last - on_ends + 1, last + 1)
+        else:
+            yield from range(number + 1, last + 1)
+
+    def get_page_links(self, page):
+        """Пары ``(номер, строка запроса)`` для ссылок на страницы.
+
+        Строка пуста у текущей страницы, у пропуска и у номеров, до
+        которых нет курсора и которые дальше ``OFFSET_LINK_PAGES``.
+        """
+        last = self.approximate_num_pages
+        for number in self.get_elided_page_range(
+            page.number, on_each_side=1, on_ends=1
+        ):
+            yield number, self._page_query(page, number, last)
+
+    def _page_query(self, page, number, last):
+        if number == self.ELLIPSIS or number == page.number:
+            return ''
+        if number == last:
+            return f'cursor={page.last_cursor}'
+        if number == page.number - 1 and page.previous_cursor:
+            return f'cursor={page.previous_cursor}'
+        if number == page.number + 1 and page.next_cursor:
+            return f'cursor={page.next_cursor}'
+        if number <= self.OFFSET_LINK_PAGES:
+            return f'page={number}'
+        return ''
+
+    def validate_number(self, number):
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы должен быть целым числом')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        return number
+
+    def get_page(self, number=None, cursor=None):
+        """Вернуть страницу по курсору или номеру, не падая на мусоре."""
+        if cursor:
+            page = self.cursor_page(cursor)
+            if page is not None:
+                return page
+        try:
+            number = self.validate_number(number)
+        except (PageNotAnInteger, EmptyPage):
+            number = 1
+        page = self.page(number)
+        if not page.object_list and number > 1:
+            # Редкий случай ссылки за пределы ленты: только здесь нужен COUNT.
+            page = self.page(self.exact_num_pages)
+        return page
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        return self._build_page(rows, number, len(rows) > self.per_page)
+
+    def cursor_page(self, cursor):
+        """Страница после/до курсора или ``None``, если курсор испорчен."""
+        decoded = self.decode_cursor(cursor)
+        if decoded is None:
+            return None
+        direction, number, values = decoded
+        if direction == LAST:
+            # Последняя страница — первая в обратном порядке; её номер
+            # приблизительный, курсоры от неё ведут точно.
+            rows = list(
+                self.object_list.order_by(*self._reversed_ordering())
+                [:self.per_page + 1]
+            )
+            number = 1
+            if len(rows) > self.per_page:
+                number = max(self.approximate_num_pages, 2)
+            return self._build_page(rows[:self.per_page][::-1], number, False)
+        if direction == NEXT:
+            rows = list(
+                self.object_list.filter(self._keyset_filter(values))
+                [:self.per_page + 1]
+            )
+            return self._build_page(rows, number, len(rows) > self.per_page)
+        rows = list(
+            self.object_list
+            .order_by(*self._reversed_ordering())
+            .filter(self._keyset_filter(values, backwards=True))
+            [:self.per_page + 1]
+        )
+        if len(rows) <= self.per_page:
+            # Дошли до начала ленты, как бы ни был записан номер в курсоре.
+            number = 1
+        return self._build_page(rows[:self.per_page][::-1], number, True)
+
+    def _build_page(self, rows, number, has_next):
+        self._known_pages = number + 1 if has_next else number
+        rows = rows[:self.per_page]
+        object_list = self.transform(rows) if self.transform else rows
+        page = self._get_page(object_list, number, self)
+        page.next_cursor = ''
+        page.previous_cursor = ''
+        page.last_cursor = self.encode_cursor(LAST, 1, None)
+        # Вызывается шаблоном лениво: внутри закэшированного фрагмента
+        # подсчёт страниц не нужен.
+        page.page_links = partial(self.get_page_links, page)
+        if has_next:
+            page.next_cursor = self.encode_cursor(NEXT, number + 1, rows[-1])
+        if number > 1 and rows:
+            page.previous_cursor = self.encode_cursor(
+                PREVIOUS, number - 1, rows[0]
+            )
+        return page
+
+    def encode_cursor(self, direction, number, obj):
+        values = [] if obj is None else [
+            getattr(obj, field.lstrip('-')) for field in self.ordering
+        ]
+        # isoformat() вместо DjangoJSONEncoder: тот обрезает микросекунды,
+        # и курсор перестал бы точно указывать на пост.
+        payload = json.dumps([direction, number, values],
+                             default=lambda value: value.isoformat())
+        token = base64.urlsafe_b64encode(payload.encode())
+        return token.decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            payload = base64.urlsafe_b64decode(
+                cursor + '=' * (-len(cursor) % 4)
+            )
+            direction, number, values = json.loads(payload.decode())
+            if direction not in (NEXT, PREVIOUS, LAST):
+                return None
+            if direction != LAST and len(values) != len(self.ordering):
+                return None
+            number = self.validate_number(number)
+            model = self.object_list.model
+            values = [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (binascii.Error, UnicodeDecodeError, TypeError, ValueError,
+                ValidationError, PageNotAnInteger, EmptyPage):
+            return None
+        return direction, number, values
+
+    def _reversed_ordering(self):
+        return tuple(
+            field[1:] if field.startswith('-') else '-' + field
+            for field in self.ordering
+        )
+
+    def _keyset_filter(self, values, backwards=False):
+        """Лексикографическое сравнение кортежа полей сортировки.
+
+        Отдельное нестрогое условие на первое поле позволяет базе начать
+        поиск по индексу с нужного места, а не фильтровать ленту с начала.
+        """
+        first = self.ordering[0]
+        descending = first.startswith('-') != backwards
+        bound = Q(**{
+            f'{first.lstrip("-")}__{"lte" if descending else "gte"}': values[0]
+        })
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != backwards
+            term = Q(**{
+                f'{name}__{"lt" if descending else "gt"}': values[index]
+            })
+            for previous, value in zip(self.ordering[:index], values):
+                term &= Q(**{previous.lstrip('-'): value})
+            condition |= term
+        return bound & condition
@@ -0,0 +1,33 @@
+"""Области данных, от которых зависят страницы ленты.
+
+Имена областей входят в ключи ``core.caching``: сигналы отмечают
+изменение областей, а view по ним строят ETag и Last-Modified.
+"""
+FEED = 'feed'
+# Имена и профили пользователей видны на всех страницах.
+USERS = 'users'
+# Названия групп видны на карточках постов в любой ленте.
+GROUPS = 'groups'
+# Число комментариев на карточках постов в JSON API.
+COMMENTS = 'comments'
+# Поля пользователя, которые показывают страницы.
+USER_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def post_scopes(post, group_slugs=()):
+    """Всё, что показывает пост: ленты, группа, профиль автора, сам пост."""
+    scopes = [FEED, post_scope(post.pk), author_scope(post.author.username)]
+    scopes.extend(group_scope(slug) for slug in group_slugs if slug)
+    return scopes
@@ -0,0 +1,366 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+Инвертированный индекс обновляется фоновыми задачами, которые сигналы
+ставят при сохранении и удалении постов и комментариев (см.
+posts.signals, posts.tasks), поэтому запрос не сканирует таблицы через
+``LIKE '%слово%'``. Пока задача удаления ждёт, поиск не показывает
+удалённый пост: результаты читаются из ``Post``.
+
+На SQLite с FTS5 индекс — виртуальная таблица ``posts_search``
+(создаётся миграцией): у поста rowid равен ``2 * id``, у комментария
+``2 * id + 1``, так что запись документа обновляется по первичному ключу.
+На остальных базах работает запасной индекс ``SearchPosting``
+(слово → документ); ранжирует и режет на страницы для него тоже база
+(``PostingHits``), в Python приходит только срез id.
+
+Результатом поиска по постам считается пост, в тексте которого или
+в одном из комментариев к которому есть все слова запроса.
+"""
+import math
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+
+from .models import Comment, Post, SearchPosting
+
+FTS_TABLE = 'posts_search'
+TOKEN_RE = re.compile(r'[^\W_]+')
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 10
+BATCH_SIZE = 1000
+# Через сколько секунд снова проверять базу, в которой не было FTS5:
+# таблицу могут создать миграцией, не перезапуская воркеры.
+FTS_PROBE_INTERVAL = 60
+
+_fts_tables = {}
+
+
+def tokenize(text):
+    """Слова текста в нижнем регистре — так же их делит FTS5 unicode61."""
+    return [
+        token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall(text.lower())
+    ]
+
+
+def query_terms(query):
+    """Уникальные слова запроса в исходном порядке."""
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+def post_rowid(post_id):
+    return post_id * 2
+
+
+def comment_rowid(comment_id):
+    return comment_id * 2 + 1
+
+
+def has_fts_table():
+    """Есть ли в текущей базе таблица FTS5.
+
+    Найденная таблица запоминается навсегда, отсутствие — на
+    ``FTS_PROBE_INTERVAL`` секунд.
+    """
+    if connection.vendor != 'sqlite':
+        return False
+    name = connection.settings_dict['NAME']
+    found, probed_at = _fts_tables.get(name, (False, None))
+    now = time.monotonic()
+    if not found and (
+        probed_at is None or now - probed_at >= FTS_PROBE_INTERVAL
+    ):
+        found = FTS_TABLE in connection.introspection.table_names()
+        _fts_tables[name] = (found, now)
+    return found
+
+
+class FtsHits:
+    def __init__(self, terms):
+        # Каждое слово в кавычках: пользовательский ввод не станет
+        # синтаксисом FTS5 (OR, NEAR, column:...).
+        self.match = ' '.join(f'"{term}"' for term in terms)
+
+    def count(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(DISTINCT post_id) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s',
+                [self.match]
+            )
+            return cursor.fetchone()[0]
+
+    def ids(self, offset, limit):
+        # rank в FTS5 — bm25, чем меньше, тем релевантнее.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT post_id FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s GROUP BY post_id '
+                f'ORDER BY MIN(rank), post_id DESC LIMIT %s OFFSET %s',
+                [self.match, limit, offset]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class FtsIndex:
+    """Индекс в виртуальной таблице SQLite FTS5."""
+
+    def index_post(self, post):
+        self._replace(post_rowid(post.pk), post.text, post.pk)
+
+    def index_comment(self, comment):
+        self._replace(comment_rowid(comment.pk), comment.text,
+                      comment.post_id)
+
+    def remove_post(self, post_id):
+        self._delete(post_rowid(post_id))
+
+    def remove_comment(self, comment_id):
+        self._delete(comment_rowid(comment_id))
+
+    def search(self, terms):
+        return FtsHits(terms)
+
+    def filter_posts(self, queryset, terms):
+        return self._filter(queryset, terms, 'post_id', 0)
+
+    def filter_comments(self, queryset, terms):
+        return self._filter(queryset, terms, 'rowid >> 1', 1)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE}(rowid, body, post_id) '
+                f'SELECT id * 2, text, id FROM posts_post'
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE}(rowid, body, post_id) '
+                f'SELECT id * 2 + 1, text, post_id FROM posts_comment'
+            )
+
+    def _filter(self, queryset, terms, column, parity):
+        # Подзапрос прямо в IN: RawSQL в pk__in SQLite прочитал бы
+        # как скалярный подзапрос и вернул бы только первую строку.
+        meta = queryset.model._meta
+        return queryset.extra(
+            where=[
+                f'{meta.db_table}.{meta.pk.column} IN ('
+                f'SELECT {column} FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s AND (rowid & 1) = %s)'
+            ],
+            params=[FtsHits(terms).match, parity]
+        )
+
+    def _replace(self, rowid, text, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [rowid]
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE}(rowid, body, post_id) '
+                f'VALUES (%s, %s, %s)',
+                [rowid, text, post_id]
+            )
+
+    def _delete(self, rowid):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [rowid]
+            )
+
+
+class PostingHits:
+    """Ранжирование по ``SearchPosting`` одним запросом к базе.
+
+    Score документа — сумма ``idf * tf * (k1 + 1) / (tf + k1)`` по словам
+    запроса (BM25 без поправки на длину); документ должен содержать
+    все слова, пост получает лучший score среди своих документов.
+    Группирует, сортирует и режет на страницы база: в Python приходят
+    только число документов на слово и id страницы.
+    """
+    K1 = 1.2
+
+    def __init__(self, terms):
+        self.terms = terms
+        self._idf = None
+
+    def idf(self):
+        if self._idf is None:
+            document_frequency = dict(
+                SearchPosting.objects.filter(term__in=self.terms)
+                .order_by().values_list('term').annotate(Count('pk'))
+            )
+            total = Post.objects.count() + Comment.objects.count()
+            self._idf = {
+                term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+                for term, df in document_frequency.items()
+            }
+        return self._idf
+
+    def _scores(self):
+        """SQL «пост — лучший score» и его параметры; None — ничего нет."""
+        idf = self.idf()
+        if len(idf) < len(self.terms):
+            return None, []
+        meta = SearchPosting._meta
+        post = meta.get_field('post').column
+        comment = meta.get_field('comment').column
+        weights = ' '.join('WHEN %s THEN %s' for _ in idf)
+        placeholders = ', '.join(['%s'] * len(idf))
+        sql = (
+            f'SELECT {post} AS post_id, MAX(score) AS score FROM ('
+            f'SELECT {post}, SUM(CASE term {weights} END * frequency '
+            f'* %s / (frequency + %s)) AS score '
+            f'FROM {meta.db_table} WHERE term IN ({placeholders}) '
+            f'GROUP BY {post}, {comment} HAVING COUNT(*) = %s'
+            f') documents GROUP BY {post}'
+        )
+        params = [value for item in idf.items() for value in item]
+        params += [self.K1 + 1, self.K1, *idf, len(idf)]
+        return sql, params
+
+    def count(self):
+        sql, params = self._scores()
+        if sql is None:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM ({sql}) posts', params)
+            return cursor.fetchone()[0]
+
+    def ids(self, offset, limit):
+        sql, params = self._scores()
+        if sql is None:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'{sql} ORDER BY score DESC, post_id DESC LIMIT %s OFFSET %s',
+                params + [limit, offset]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostingIndex:
+    """Запасной индекс в обычной таблице, работает на любой базе."""
+
+    def index_post(self, post):
+        self._replace(post.pk, None, post.text)
+
+    def index_comment(self, comment):
+        self._replace(comment.post_id, comment.pk, comment.text)
+
+    def remove_post(self, post_id):
+        SearchPosting.objects.filter(post_id=post_id).delete()
+
+    def remove_comment(self, comment_id):
+        SearchPosting.objects.filter(comment_id=comment_id).delete()
+
+    def search(self, terms):
+        return PostingHits(terms)
+
+    def filter_posts(self, queryset, terms):
+        for term in terms:
+            queryset = queryset.filter(pk__in=SearchPosting.objects.filter(
+                term=term, comment__isnull=True
+            ).values('post_id'))
+        return queryset
+
+    def filter_comments(self, queryset, terms):
+        for term in terms:
+            queryset = queryset.filter(pk__in=SearchPosting.objects.filter(
+                term=term, comment__isnull=False
+            ).values('comment_id'))
+        return queryset
+
+    def rebuild(self):
+        SearchPosting.objects.all().delete()
+        postings = []
+        documents = [
+            ((pk, None, text) for pk, text in
+             Post.objects.values_list('pk', 'text').iterator()),
+            (Comment.objects.values_list('post_id', 'pk', 'text').iterator()),
+        ]
+        for source in documents:
+            for post_id, comment_id, text in source:
+                postings.extend(self._postings(post_id, comment_id, text))
+                if len(postings) >= BATCH_SIZE:
+                    SearchPosting.objects.bulk_create(postings)
+                    postings = []
+        SearchPosting.objects.bulk_create(postings)
+
+    def _replace(self, post_id, comment_id, text):
+        SearchPosting.objects.filter(
+            post_id=post_id, comment_id=comment_id
+        ).delete()
+        SearchPosting.objects.bulk_create(
+            self._postings(post_id, comment_id, text)
+        )
+
+    @staticmethod
+    def _postings(post_id, comment_id, text):
+        return [
+            SearchPosting(term=term, post_id=post_id, comment_id=comment_id,
+                          frequency=frequency)
+            for term, frequency in Counter(tokenize(text)).items()
+        ]
+
+
+INDEXES = {
+    'fts5': FtsIndex(),
+    'python': PostingIndex(),
+}
+
+
+def get_index():
+    """Индекс из ``SEARCH_BACKEND``: ``fts5``, ``python`` или ``auto``."""
+    backend = getattr(settings, 'SEARCH_BACKEND', 'auto')
+    if backend == 'auto':
+        backend = 'fts5' if has_fts_table() else 'python'
+    return INDEXES[backend]
+
+
+class SearchResults:
+    """Найденные посты по релевантности; годится для ``Paginator``.
+
+    Индекс возвращает только id нужного среза, посты для ленты
+    выбираются одним запросом.
+    """
+
+    def __init__(self, query, index=None):
+        self.query = query
+        self.terms = query_terms(query)
+        index = index or get_index()
+        self.hits = index.search(self.terms) if self.terms else None
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.hits.count() if self.hits else 0
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            raise TypeError('Результаты поиска читаются только срезами')
+        start = key.start or 0
+        stop = self.count() if key.stop is None else key.stop
+        if not self.hits or stop <= start:
+            return []
+        ids = self.hits.ids(start, stop - start)
+        posts = Post.objects.for_feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def filter_posts(queryset, query):
+    """Посты queryset, в тексте которых есть все слова запроса."""
+    return get_index().filter_posts(queryset, query_terms(query))
+
+
+def filter_comments(queryset, query):
+    """Комментарии queryset, в тексте которых есть все слова запроса."""
+    return get_index().filter_comments(queryset, query_terms(query))
@@ -0,0 +1,153 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.caching import bump_version, mark_modified
+
+from . import tasks, timeline
+from .scopes import (COMMENTS, FEED, GROUPS, USER_FIELDS, USERS,
+                     author_scope, group_scope, post_scope, post_scopes)
+from .counters import (change_comments_count, change_followers_count,
+                       change_posts_count)
+from .models import Comment, Follow, Group, Post, Profile, User
+
+
+@receiver(post_save, sender=User)
+def create_profile(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Profile.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_posts_count(instance.author_id, 1)
+        tasks.fan_out_post.enqueue(instance.pk, key=f'fan_out:{instance.pk}')
+        tasks.schedule_digests()
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    change_posts_count(instance.author_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_comments_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    change_comments_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_followers_count(instance.author_id, 1)
+        tasks.add_author.enqueue(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    change_followers_count(instance.author_id, -1)
+    tasks.remove_author.enqueue(instance.user_id, instance.author_id)
+    if timeline.fell_under_limit(instance.author_id):
+        tasks.add_followers.enqueue(instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        # Ключ с датой правки: повторная отправка той же версии поста
+        # не ставит задачу дважды, а новая правка — ставит.
+        tasks.index_post.enqueue(
+            instance.pk,
+            key=f'index_post:{instance.pk}:{instance.updated.isoformat()}'
+        )
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    tasks.unindex_post.enqueue(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        # Комментарий правят только в админке: правку индексируем всегда.
+        tasks.index_comment.enqueue(
+            instance.pk,
+            key=f'index_comment:{instance.pk}' if created else None
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    tasks.unindex_comment.enqueue(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_groups(sender, raw=False, **kwargs):
+    if not raw:
+        bump_version('feed')
+        bump_version('groups')
+
+
+@receiver(pre_save, sender=Post)
+def remember_group(sender, instance, raw=False, **kwargs):
+    # Пост могли перенести в другую группу: её страница тоже меняется.
+    if not raw and instance.pk:
+        instance._previous_group_slug = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group__slug', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_modified(sender, instance, raw=False, **kwargs):
+    if not raw:
+        slugs = {getattr(instance, '_previous_group_slug', None)}
+        if instance.group_id:
+            slugs.add(instance.group.slug)
+        mark_modified(*post_scopes(instance, slugs))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_modified(sender, instance, raw=False, **kwargs):
+    if not raw:
+        mark_modified(COMMENTS, post_scope(instance.post_id))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_modified(sender, instance, raw=False, **kwargs):
+    if not raw:
+        mark_modified(FEED, GROUPS, group_scope(instance.slug))
+
+
+@receiver(pre_save, sender=User)
+def remember_names(sender, instance, raw=False, update_fields=None,
+                   **kwargs):
+    # Вход сохраняет только last_login, регистрация создаёт пользователя
+    # без постов: ни то ни другое страницы не меняет.
+    if raw or not instance.pk or (
+        update_fields is not None and not set(update_fields) & set(USER_FIELDS)
+    ):
+        return
+    instance._previous_names = User.objects.filter(
+        pk=instance.pk
+    ).values_list(*USER_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def author_modified(sender, instance, raw=False, **kwargs):
+    previous = instance.__dict__.pop('_previous_names', None)
+    names = tuple(getattr(instance, field) for field in USER_FIELDS)
+    if raw or previous is None or previous == names:
+        return
+    # Смена имени меняет и страницу по старому адресу профиля.
+    mark_modified(USERS, author_scope(previous[0]),
+                  author_scope(instance.username))
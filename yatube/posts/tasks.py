@@ -0,0 +1,114 @@
+"""Фоновые задачи постов и комментариев (см. ``core.tasks``).
+
+Задачи получают id, а не объекты: к моменту выполнения пост могли
+изменить или удалить, поэтому данные читаются заново. Все задачи
+идемпотентны и переживают повторный запуск.
+"""
+import time
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+
+from core.tasks import task
+
+from . import digests, search, thumbnails, timeline
+from .models import Comment, Follow, Post
+
+
+class ThumbnailError(Exception):
+    pass
+
+
+class DigestError(Exception):
+    pass
+
+
+@task
+def fan_out_post(post_id):
+    """Разложить новый пост по лентам подписчиков."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        timeline.fan_out_post(post)
+
+
+def is_following(user_id, author_id):
+    return Follow.objects.filter(user_id=user_id, author_id=author_id).exists()
+
+
+@task
+def add_author(user_id, author_id):
+    """Подписка: перенести последние посты автора в ленту читателя."""
+    # Пока задача ждала, читатель мог отписаться.
+    if is_following(user_id, author_id):
+        timeline.add_author(user_id, author_id)
+
+
+@task
+def remove_author(user_id, author_id):
+    """Отписка: убрать посты автора из ленты читателя."""
+    # Пока задача ждала, читатель мог подписаться снова.
+    if not is_following(user_id, author_id):
+        timeline.remove_author(user_id, author_id)
+
+
+@task
+def add_followers(author_id):
+    """Автор перестал быть популярным: заполнить ленты его подписчиков."""
+    timeline.add_followers(author_id)
+
+
+@task
+def index_post(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        search.get_index().index_post(post)
+    else:
+        # Пост удалили, пока задача ждала: запись могла успеть появиться.
+        search.get_index().remove_post(post_id)
+
+
+@task
+def unindex_post(post_id):
+    search.get_index().remove_post(post_id)
+
+
+@task
+def index_comment(comment_id):
+    comment = Comment.objects.filter(pk=comment_id).first()
+    if comment is not None:
+        search.get_index().index_comment(comment)
+    else:
+        search.get_index().remove_comment(comment_id)
+
+
+@task
+def unindex_comment(comment_id):
+    search.get_index().remove_comment(comment_id)
+
+
+@task
+def generate_thumbnails(name):
+    if not thumbnails.generate(name):
+        raise ThumbnailError(f'Миниатюры для {name} не созданы')
+
+
+@task
+def send_digests():
+    digests.send_digests()
+
+
+@task
+def retry_digest(user_id, until):
+    """Повторить неотправленный дайджест одного подписчика."""
+    if not digests.retry(user_id, parse_datetime(until)):
+        raise DigestError(f'Дайджест для {user_id} снова не отправлен')
+
+
+def schedule_digests():
+    """Поставить рассылку дайджестов на конец текущего окна, одну на окно."""
+    interval = settings.DIGEST_INTERVAL
+    now = time.time()
+    window = int(now // interval)
+    send_digests.enqueue(
+        key=f'digests:{window}', delay=(window + 1) * interval - now
+    )
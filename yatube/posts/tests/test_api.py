@@ -0,0 +1,188 @@
+import json
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class FeedApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(settings.PAGE + 3):
+            cls.post = Post.objects.create(
+                text=f'Пост {i}', author=cls.user, group=cls.group
+            )
+        Comment.objects.create(post=cls.post, author=cls.user, text='Ок')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def get_json(self, url, **params):
+        response = self.guest_client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, json.loads(b''.join(response.streaming_content))
+
+    def test_feeds_walk_with_cursor(self):
+        """Ленты отдаются страницами по курсору без повторов."""
+        urls = [
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', args=[self.group.slug]),
+            reverse('posts:api_profile', args=[self.user.username]),
+        ]
+        expected = list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'pk', flat=True
+            )
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                _, first = self.get_json(url)
+                self.assertEqual(len(first['results']), settings.PAGE)
+                self.assertIsNone(first['previous'])
+                response = self.guest_client.get(first['next'])
+                second = json.loads(b''.join(response.streaming_content))
+                self.assertIsNone(second['next'])
+                self.assertEqual(
+                    [post['id'] for post in
+                     first['results'] + second['results']],
+                    expected
+                )
+
+    def test_post_fields(self):
+        """Пост в API — текст, автор, группа, число комментариев."""
+        _, data = self.get_json(reverse('posts:api_index'), limit=1)
+        post = data['results'][0]
+        self.assertEqual(post['id'], self.post.pk)
+        self.assertEqual(post['author'], self.user.username)
+        self.assertEqual(post['group'], self.group.slug)
+        self.assertEqual(post['comments_count'], 1)
+
+    def test_post_detail_lists_comments(self):
+        """Пост отдаётся вместе с комментариями."""
+        _, data = self.get_json(
+            reverse('posts:api_post_detail', args=[self.post.pk])
+        )
+        self.assertEqual(data['post']['text'], self.post.text)
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']], ['Ок']
+        )
+        self.assertIsNone(data['next'])
+
+    @override_settings(COMMENTS_PAGE=2)
+    def test_post_detail_comments_walk_with_cursor(self):
+        """Комментарии поста отдаются страницами по курсору."""
+        for i in range(3):
+            Comment.objects.create(
+                post=self.post, author=self.user, text=f'Ещё {i}'
+            )
+        url = reverse('posts:api_post_detail', args=[self.post.pk])
+        _, first = self.get_json(url)
+        self.assertEqual(len(first['comments']), 2)
+        _, second = self.get_json(first['next'])
+        self.assertIsNone(second['next'])
+        self.assertEqual(
+            [comment['text'] for comment in
+             first['comments'] + second['comments']],
+            ['Ок', 'Ещё 0', 'Ещё 1', 'Ещё 2']
+        )
+
+    def test_post_detail_queries_run_in_view(self):
+        """Тело ответа собирается без запросов к базе."""
+        response = self.guest_client.get(
+            reverse('posts:api_post_detail', args=[self.post.pk])
+        )
+        with CaptureQueriesContext(connection) as queries:
+            b''.join(response.streaming_content)
+        self.assertEqual(len(queries), 0)
+
+    def test_unchanged_feed_returns_304(self):
+        """Неизменная лента отвечает 304 без запросов к базе."""
+        url = reverse('posts:api_index')
+        response, _ = self.get_json(url)
+        with self.assertNumQueries(0):
+            cached = self.guest_client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(cached.status_code, 304)
+        cached = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(cached.status_code, 304)
+
+    def test_changes_invalidate_etag(self):
+        """Новый пост или комментарий меняет ETag ленты и поста."""
+        urls = [
+            reverse('posts:api_index'),
+            reverse('posts:api_post_detail', args=[self.post.pk]),
+        ]
+        etags = {url: self.get_json(url)[0]['ETag'] for url in urls}
+        Comment.objects.create(post=self.post, author=self.user, text='Ещё')
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url]
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_changes_invalidate_last_modified(self):
+        """Комментарий и правка старого поста сдвигают Last-Modified."""
+        old_post = Post.objects.order_by('pub_date').first()
+        changes = [
+            lambda: Comment.objects.create(
+                post=self.post, author=self.user, text='Ещё'
+            ),
+            lambda: Post.objects.get(pk=old_post.pk).save(),
+        ]
+        urls = [
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', args=[self.group.slug]),
+            reverse('posts:api_profile', args=[self.user.username]),
+            reverse('posts:api_post_detail', args=[self.post.pk]),
+        ]
+        for number, change in enumerate(changes, 1):
+            modified = {
+                url: self.get_json(url)[0]['Last-Modified'] for url in urls
+            }
+            # Last-Modified точен до секунды: изменение — в следующей.
+            with mock.patch('core.caching.time.time',
+                            return_value=time.time() + 2 * number):
+                change()
+            for url in urls:
+                with self.subTest(change=number, url=url):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_MODIFIED_SINCE=modified[url]
+                    )
+                    self.assertEqual(response.status_code, 200)
+
+    def test_unknown_objects_return_404(self):
+        """Несуществующие группа, автор и пост — 404."""
+        urls = [
+            reverse('posts:api_group_list', args=['missing']),
+            reverse('posts:api_profile', args=['missing']),
+            reverse('posts:api_post_detail', args=[0]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertFalse(response.has_header('ETag'))
+                self.assertFalse(response.has_header('Last-Modified'))
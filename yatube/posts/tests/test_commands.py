@@ -0,0 +1,154 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from posts.models import Comment, Follow, Group, Post, TimelineEntry
+from posts.search import SearchResults
+
+User = get_user_model()
+
+
+class TransferCommandsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(5):
+            post = Post.objects.create(
+                text=f'Пост номер {i}', author=cls.author, group=cls.group
+            )
+            Comment.objects.create(
+                post=post, author=cls.reader, text=f'Комментарий {i}'
+            )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def export(self, name, *args):
+        call_command('export_content', '--output', self.path(name), *args,
+                     stderr=StringIO())
+
+    def load(self, name, *args):
+        call_command('import_content', self.path(name), *args,
+                     stdout=StringIO(), stderr=StringIO())
+
+    def snapshot(self):
+        return (
+            list(Post.objects.order_by('pk').values_list(
+                'pk', 'author__username', 'group__slug', 'text', 'pub_date'
+            )),
+            list(Comment.objects.order_by('pk').values_list(
+                'post_id', 'author__username', 'text', 'created'
+            )),
+            list(Follow.objects.values_list(
+                'user__username', 'author__username'
+            )),
+        )
+
+    def clear(self):
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        User.objects.all().delete()
+
+    def test_jsonl_round_trip(self):
+        """Выгрузка и загрузка в пустую базу сохраняют данные и даты."""
+        before = self.snapshot()
+        self.export('content.jsonl')
+        self.clear()
+        self.load('content.jsonl', '--batch-size', '3')
+        self.assertEqual(self.snapshot(), before)
+        author = User.objects.get(username='author')
+        self.assertEqual(author.profile.posts_count, 5)
+        self.assertEqual(author.profile.followers_count, 1)
+        self.assertEqual(Post.objects.first().comments_count, 1)
+        self.assertEqual(TimelineEntry.objects.count(), 5)
+        self.assertEqual(len(SearchResults('комментарий')), 5)
+
+    def test_import_does_not_overwrite_existing_posts(self):
+        """Загрузка в непустую базу сдвигает id и не теряет посты."""
+        self.export('content.jsonl')
+        self.load('content.jsonl')
+        self.assertEqual(Post.objects.count(), 10)
+        self.assertEqual(Comment.objects.count(), 10)
+        for post in Post.objects.all():
+            self.assertEqual(post.comments.get().text[-1], post.text[-1])
+
+    def test_resume_from_checkpoint(self):
+        """Прерванная загрузка продолжается с контрольной точки."""
+        self.export('content.jsonl')
+        self.clear()
+        with open(self.path('content.jsonl'), encoding='utf-8') as stream:
+            lines = stream.readlines()
+        with open(self.path('part.jsonl'), 'w', encoding='utf-8') as stream:
+            stream.writelines(lines[:4])
+        checkpoint = self.path('checkpoint.json')
+        self.load('part.jsonl', '--checkpoint', checkpoint, '--no-finalize')
+        with open(checkpoint, encoding='utf-8') as stream:
+            self.assertEqual(json.load(stream)['position'], 4)
+        self.load('content.jsonl', '--checkpoint', checkpoint, '--resume')
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertEqual(Comment.objects.count(), 5)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_csv_round_trip(self):
+        """CSV выгружает и загружает одну модель."""
+        self.export('groups.csv', '--models', 'group')
+        Group.objects.all().delete()
+        self.load('groups.csv', '--model', 'group')
+        self.assertEqual(
+            list(Group.objects.values_list('slug', 'title', 'description')),
+            [('test-slug', 'Тестовая группа', 'Тестовое описание')]
+        )
+
+    def load_csv_content(self):
+        """Загрузить посты и комментарии из CSV двумя запусками."""
+        checkpoint = self.path('checkpoint.json')
+        self.load('post.csv', '--model', 'post', '--checkpoint', checkpoint,
+                  '--no-finalize')
+        self.load('comment.csv', '--model', 'comment',
+                  '--checkpoint', checkpoint)
+
+    def export_csv_content(self):
+        self.export('post.csv', '--models', 'post')
+        self.export('comment.csv', '--models', 'comment')
+
+    def test_csv_posts_then_comments(self):
+        """Комментарии из CSV ссылаются на посты, загруженные раньше."""
+        before = self.snapshot()[:2]
+        self.export_csv_content()
+        self.clear()
+        self.load_csv_content()
+        self.assertEqual(self.snapshot()[:2], before)
+
+    def test_csv_comments_follow_shifted_posts(self):
+        """В непустой базе комментарии получают тот же сдвиг id постов."""
+        self.export_csv_content()
+        self.load_csv_content()
+        self.assertEqual(Comment.objects.count(), 10)
+        for post in Post.objects.all():
+            self.assertEqual(post.comments.get().text[-1], post.text[-1])
+
+    def test_csv_comments_need_post_offset(self):
+        """Без сдвига постов комментарии из CSV не загружаются."""
+        self.export_csv_content()
+        with self.assertRaises(CommandError):
+            self.load('comment.csv', '--model', 'comment')
+        self.load('comment.csv', '--model', 'comment', '--post-offset', '0')
+        self.assertEqual(Comment.objects.count(), 10)
@@ -0,0 +1,146 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import Task
+from core.tasks import run_pending
+from posts.digests import send_digests
+from posts.models import Digest, Follow, Post, Profile, TimelineEntry
+
+User = get_user_model()
+
+
+class DigestTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.star = User.objects.create_user(username='star')
+        cls.readers = [
+            User.objects.create_user(
+                username=f'reader{i}', email=f'reader{i}@example.com'
+            )
+            for i in range(3)
+        ]
+        cls.silent = User.objects.create_user(username='silent')
+        for reader in cls.readers + [cls.silent]:
+            Follow.objects.create(user=reader, author=cls.author)
+
+    def test_posts_are_batched_into_one_letter(self):
+        """Подписчик получает одно письмо со всеми новыми постами."""
+        for i in range(3):
+            Post.objects.create(text=f'Пост номер {i}', author=self.author)
+        self.assertEqual(send_digests(chunk_size=2), 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            sorted(reader.email for reader in self.readers)
+        )
+        for i in range(3):
+            self.assertIn(f'Пост номер {i}', mail.outbox[0].body)
+        self.assertEqual(
+            Digest.objects.filter(status=Digest.SENT, posts_count=3).count(),
+            3
+        )
+
+    def test_sent_posts_are_not_repeated(self):
+        """Повторная рассылка не шлёт уже отправленные посты."""
+        Post.objects.create(text='Старый пост', author=self.author)
+        send_digests()
+        mail.outbox.clear()
+        self.assertEqual(send_digests(), 0)
+        Post.objects.create(text='Новый пост', author=self.author)
+        send_digests()
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertIn('Новый пост', mail.outbox[0].body)
+        self.assertNotIn('Старый пост', mail.outbox[0].body)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_posts_of_popular_authors_without_fan_out(self):
+        """Посты авторов без раскладки по лентам тоже попадают в письмо."""
+        Follow.objects.create(user=self.readers[0], author=self.star)
+        Post.objects.create(text='Пост звезды', author=self.star)
+        send_digests()
+        letter, = [message for message in mail.outbox
+                   if message.to == [self.readers[0].email]]
+        self.assertIn('Пост звезды', letter.body)
+
+    def test_posts_without_fan_out_yet_are_sent(self):
+        """Пост, ещё не разложенный по лентам, не теряется для рассылки."""
+        Post.objects.create(text='Пост', author=self.author)
+        TimelineEntry.objects.all().delete()
+        self.assertEqual(send_digests(), 3)
+        self.assertIn('Пост', mail.outbox[0].body)
+
+    def test_failed_letter_is_retried(self):
+        """Неотправленное письмо не сдвигает отметку и уходит позже."""
+        Post.objects.create(text='Пост', author=self.author)
+        with mock.patch(
+            'django.core.mail.backends.locmem.EmailBackend.send_messages',
+            side_effect=ConnectionError('нет связи')
+        ), self.assertLogs('posts.digests', 'WARNING'):
+            self.assertEqual(send_digests(), 0)
+        self.assertEqual(
+            Digest.objects.filter(status=Digest.FAILED).count(), 3
+        )
+        self.assertFalse(Profile.objects.filter(
+            user__in=self.readers, digest_sent_until__isnull=False
+        ).exists())
+        self.assertEqual(send_digests(), 3)
+        # Отложенные повторы видят, что письма уже ушли.
+        Task.objects.filter(name='posts.tasks.retry_digest').update(
+            run_at=timezone.now()
+        )
+        mail.outbox.clear()
+        run_pending()
+        self.assertEqual(mail.outbox, [])
+
+    def test_only_failed_letter_is_retried(self):
+        """После ошибки соединение открывается заново, а повторяется
+        только неотправленное письмо."""
+        Post.objects.create(text='Пост', author=self.author)
+        backend = 'django.core.mail.backends.locmem.EmailBackend'
+        send_messages = mail.get_connection().send_messages.__func__
+        calls = []
+
+        def fail_first(connection, messages):
+            calls.append(messages[0].to[0])
+            if len(calls) == 1:
+                raise ConnectionError('обрыв')
+            return send_messages(connection, messages)
+
+        with mock.patch(f'{backend}.send_messages', autospec=True,
+                        side_effect=fail_first), \
+                mock.patch(f'{backend}.open') as reopen, \
+                self.assertLogs('posts.digests', 'WARNING'):
+            self.assertEqual(send_digests(), 2)
+        reopen.assert_called()
+        failed = self.readers[0].email
+        self.assertEqual(calls[0], failed)
+        retry = Task.objects.get(name='posts.tasks.retry_digest')
+        self.assertEqual(retry.status, Task.PENDING)
+        self.assertGreater(retry.run_at, timezone.now())
+        mail.outbox.clear()
+        Task.objects.filter(pk=retry.pk).update(run_at=timezone.now())
+        run_pending()
+        self.assertEqual([message.to for message in mail.outbox], [[failed]])
+        self.assertEqual(send_digests(), 0)
+
+    def test_old_posts_are_skipped(self):
+        """Посты до подписки на рассылку в первое письмо не попадают."""
+        post = Post.objects.create(text='Давний пост', author=self.author)
+        long_ago = timezone.now() - timedelta(days=2)
+        Post.objects.filter(pk=post.pk).update(pub_date=long_ago)
+        self.assertEqual(send_digests(), 0)
+
+    def test_one_send_task_per_window(self):
+        """Посты одного окна ставят в очередь одну рассылку."""
+        for i in range(3):
+            Post.objects.create(text=f'Пост {i}', author=self.author)
+        task = Task.objects.get(name='posts.tasks.send_digests')
+        self.assertEqual(task.status, Task.PENDING)
+        self.assertGreater(task.run_at, timezone.now())
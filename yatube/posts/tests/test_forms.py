@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 
@@ -19,7 +20,9 @@ User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+# Фоновый поток миниатюр не видит данных TestCase и упирается
+# в блокировку его транзакции.
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
 class PostFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -38,6 +41,7 @@ class PostFormTests(TestCase):
             b'\x02\x00\x01\x00\x00\x02\x02\x0C'
             b'\x0A\x00\x3B'
         )
+        cls.small_gif_sha256 = hashlib.sha256(small_gif).hexdigest()
         cls.uploaded = SimpleUploadedFile(
             name='small.gif',
             content=small_gif,
@@ -103,6 +107,8 @@ class PostFormTests(TestCase):
 
     def test_create_post_with_image(self):
         """Валидная форма с картинкой создаёт запись в Post."""
+        # Файл уже прочитан при создании поста в setUpClass.
+        self.uploaded.seek(0)
         form_data = {
             'text': 'Test text 4',
             'author': self.author,
@@ -110,9 +116,11 @@ class PostFormTests(TestCase):
             'image': self.uploaded,
         }
         self.create_helper(form_data)
-        self.assertTrue(
-            Post.objects.filter(
-                image='posts/small.gif').exists())
+        # Имя файла — SHA-256 загруженной картинки (posts.images).
+        self.assertEqual(
+            Post.objects.latest('pub_date').image.name,
+            f'posts/{self.small_gif_sha256}.gif'
+        )
 
     def test_create_post_guest_user(self):
         """Проверяем что гость не может опубликовать пост"""
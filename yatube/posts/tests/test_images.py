@@ -0,0 +1,148 @@
+import hashlib
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import images
+from posts.forms import PostForm
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def picture(size, image_format='JPEG', exif=None, **options):
+    content = BytesIO()
+    image = Image.new('RGB', size, 'red')
+    if exif is not None:
+        options['exif'] = exif
+    image.save(content, image_format, **options)
+    return content.getvalue()
+
+
+def orientation_exif(orientation):
+    exif = Image.Exif()
+    exif[images.ORIENTATION] = orientation
+    # Координаты съёмки (GPSInfo) — то, что не должно попасть на сайт.
+    exif[0x8825] = {1: 'N', 2: (55.0, 45.0, 0.0)}
+    return exif.tobytes()
+
+
+# Фоновый поток миниатюр не видит данных TestCase и упирается
+# в блокировку его транзакции.
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_IMAGE_MAX_DIMENSION=64,
+                   THUMBNAIL_ASYNC=False)
+class PostImageFormTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+
+    def submit(self, content, name='photo.jpg'):
+        form = PostForm(
+            data={'text': 'Пост с картинкой'},
+            files={'image': SimpleUploadedFile(name, content)},
+        )
+        if form.is_valid():
+            form.instance.author = self.author
+            form.save()
+        return form
+
+    def saved(self, form):
+        with Image.open(form.instance.image.path) as image:
+            return image.format, image.size, image.getexif()
+
+    def test_large_image_is_downsampled(self):
+        """Большая сторона уменьшается до POST_IMAGE_MAX_DIMENSION."""
+        form = self.submit(picture((300, 150)))
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(self.saved(form)[:2], ('JPEG', (64, 32)))
+
+    def test_small_image_keeps_size(self):
+        form = self.submit(picture((40, 20), 'PNG'), 'photo.png')
+        self.assertEqual(self.saved(form)[:2], ('PNG', (40, 20)))
+
+    def test_exif_orientation_applied_and_stripped(self):
+        """Поворот из EXIF применён к пикселям, сам EXIF не сохранён."""
+        form = self.submit(
+            picture((60, 30), exif=orientation_exif(6))
+        )
+        image_format, size, exif = self.saved(form)
+        self.assertEqual(size, (30, 60))
+        self.assertEqual(dict(exif), {})
+
+    def test_name_is_content_hash(self):
+        """Имя файла — SHA-256 загрузки, а не имя от пользователя."""
+        content = picture((40, 20))
+        form = self.submit(content, 'IMG_0001.jpg')
+        self.assertEqual(
+            form.instance.image.name,
+            f'posts/{hashlib.sha256(content).hexdigest()}.jpg'
+        )
+
+    def test_duplicate_reuses_stored_file(self):
+        """Та же картинка второй раз не обрабатывается и не пишется."""
+        content = picture((300, 150))
+        first = self.submit(content, 'one.jpg').instance
+        stored = Post.objects.values_list('image', flat=True)
+        with self.settings(POST_IMAGE_MAX_DIMENSION=1):
+            # С другим пределом новая обработка дала бы 1×1.
+            second = self.submit(content, 'two.jpg').instance
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(list(stored), [first.image.name] * 2)
+        with Image.open(second.image.path) as image:
+            self.assertEqual(image.size, (64, 32))
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100 * 100)
+    def test_too_many_pixels(self):
+        """Картинка больше предела пикселей отклоняется до декодирования."""
+        form = self.submit(picture((200, 100), 'PNG'), 'photo.png')
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'too_many_pixels')
+        self.assertFalse(Post.objects.exists())
+
+    def test_format_not_allowed(self):
+        form = self.submit(picture((20, 20), 'BMP'), 'photo.bmp')
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'invalid_format')
+
+    def test_animation_keeps_frames(self):
+        """Все кадры анимации сохраняются."""
+        content = BytesIO()
+        frames = [Image.new('P', (32, 32), color) for color in (1, 2, 3)]
+        frames[0].save(content, 'GIF', save_all=True,
+                       append_images=frames[1:])
+        form = self.submit(content.getvalue(), 'anim.gif')
+        self.assertTrue(form.is_valid(), form.errors)
+        with Image.open(form.instance.image.path) as image:
+            self.assertEqual(image.n_frames, 3)
+
+    @override_settings(FILE_UPLOAD_MAX_SIZE=2000)
+    def test_file_too_large(self):
+        """Файл больше FILE_UPLOAD_MAX_SIZE: понятная ошибка, поста нет."""
+        client = Client()
+        client.force_login(self.author)
+        response = client.post(reverse('posts:post_create'), {
+            'text': 'Пост',
+            'image': SimpleUploadedFile(
+                'photo.png', picture((200, 200), 'PNG', compress_level=0)
+            ),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.context['form'].errors['image'],
+            ['Файл больше 2,0\xa0КБ']
+        )
+        self.assertFalse(Post.objects.exists())
@@ -0,0 +1,68 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TransactionTestCase
+from django.urls import reverse
+
+from core.testing import SlowQueries
+from posts.models import Comment, Follow, Post
+
+User = get_user_model()
+
+DELAY = 0.1
+
+
+class ParallelQueriesTest(TransactionTestCase):
+    """Независимые запросы страницы идут одновременно, и страница ждёт
+    самый медленный из них, а не их сумму."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.author)
+        self.post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.create(post=self.post, author=reader,
+                               text='Комментарий')
+        self.client = Client()
+        self.client.force_login(reader)
+
+    def timeline(self, url):
+        with SlowQueries(DELAY) as slow:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return slow.timeline
+
+    def assertConcurrent(self, timeline, labels):
+        """Запросы с подписями из ``labels`` шли одновременно."""
+        found = {}
+        for sql, started, finished in timeline:
+            for label, matches in labels.items():
+                if matches(sql):
+                    self.assertNotIn(label, found, sql)
+                    found[label] = (started, finished)
+        self.assertEqual(set(found), set(labels))
+        starts, ends = zip(*found.values())
+        # Каждый начался раньше, чем закончился любой другой.
+        self.assertLess(max(starts), min(ends))
+
+    def test_profile(self):
+        """Автор, страница постов и подписка — одновременно."""
+        timeline = self.timeline(
+            reverse('posts:profile', args=[self.author.username])
+        )
+        self.assertConcurrent(timeline, {
+            'автор': lambda sql: sql.startswith('SELECT "auth_user"')
+            and '"auth_user"."username" =' in sql,
+            'страница': lambda sql: 'FROM "posts_post"' in sql,
+            'подписка': lambda sql: 'FROM "posts_follow"' in sql,
+        })
+
+    def test_post_detail(self):
+        """Пост и страница комментариев — одновременно."""
+        timeline = self.timeline(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        self.assertConcurrent(timeline, {
+            'пост': lambda sql: 'FROM "posts_post"' in sql,
+            'комментарии': lambda sql: 'FROM "posts_comment"' in sql,
+        })
@@ -0,0 +1,179 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+import posts.urls
+import users.urls
+from core.testing import QueryGrowthMixin, capture_queries, named_routes
+from posts import thumbnails
+from posts.models import Comment, Follow, Group, Post, PostQuerySet
+
+User = get_user_model()
+
+GUEST = 'guest'
+READER = 'reader'
+AUTHOR = 'author'
+
+# Параметры GET-запросов и данные форм для пишущих маршрутов.
+GET_DATA = {
+    'posts:search': {'q': 'Пост'},
+}
+POST_DATA = {
+    'posts:post_create': {'text': 'Новый пост'},
+    'posts:post_edit': {'text': 'Исправленный пост'},
+    'posts:add_comment': {'text': 'Новый комментарий'},
+}
+
+
+def image_file(name):
+    image = BytesIO()
+    Image.new('RGB', (40, 20), 'red').save(image, 'png')
+    return SimpleUploadedFile(name, image.getvalue())
+
+
+# Фоновый поток миниатюр не видит данных TestCase и упирается
+# в блокировку его транзакции.
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR),
+                   THUMBNAIL_ASYNC=False)
+class QueryCountGrowthTest(QueryGrowthMixin, TestCase):
+    """Запросы к базе каждого маршрута posts и users не зависят от
+    числа постов, комментариев, подписок и картинок в ленте."""
+
+    SMALL = 2
+    LARGE = 3 * settings.PAGE
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Пост для комментариев', author=cls.author, group=cls.group
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.users = []
+
+    def grow(self, total):
+        """Довести объём данных до ``total`` на каждую ленту и пост."""
+        while len(self.users) < total:
+            user = User.objects.create_user(
+                username=f'user{len(self.users)}'
+            )
+            self.users.append(user)
+            Follow.objects.create(user=user, author=self.author)
+            Follow.objects.create(user=self.reader, author=user)
+        for number, user in enumerate(self.users[:total]):
+            # Посты разных авторов и групп: N+1 по автору или группе
+            # карточки даст разные запросы. У каждого поста своя картинка
+            # с готовыми миниатюрами — sorl ищет их по карточке.
+            group = Group.objects.create(
+                title=f'Группа {number}', slug=f'group-{total}-{number}',
+                description='Описание'
+            )
+            for author, post_group in ((self.author, self.group),
+                                       (user, group)):
+                post = Post.objects.create(
+                    text=f'Пост {number}', author=author, group=post_group,
+                    image=image_file(f'{total}-{number}.png')
+                )
+                thumbnails.generate(post.image.name)
+            Comment.objects.create(
+                post=self.post, author=user, text=f'Комментарий {number}'
+            )
+
+    def route_kwargs(self, name, params):
+        values = {
+            'slug': self.group.slug,
+            'username': self.author.username,
+            'post_id': self.post.pk,
+        }
+        missing = set(params) - set(values)
+        if missing:
+            self.fail(f'{name}: нет значения для {", ".join(missing)}')
+        return {param: values[param] for param in params}
+
+    def cases(self, names=None):
+        """``(подпись, клиент, метод, адрес, данные)`` маршрутов."""
+        routes = named_routes(posts.urls) + named_routes(users.urls)
+        cases = []
+        for name, params in routes:
+            if names is not None and name not in names:
+                continue
+            url = reverse(name, kwargs=self.route_kwargs(name, params))
+            for client in (GUEST, READER, AUTHOR):
+                cases.append((f'GET {name} ({client})', client, 'get', url,
+                              GET_DATA.get(name)))
+                if name in POST_DATA:
+                    cases.append((f'POST {name} ({client})', client, 'post',
+                                  url, POST_DATA[name]))
+        return cases
+
+    def client_for(self, kind):
+        client = Client()
+        if kind == READER:
+            client.force_login(self.reader)
+        elif kind == AUTHOR:
+            client.force_login(self.author)
+        return client
+
+    def measure(self, names=None):
+        # Прошлый замер мог отписать читателя (profile_unfollow): маршруты
+        # должны видеть одинаковое состояние на малых и больших данных.
+        Follow.objects.get_or_create(user=self.reader, author=self.author)
+        queries = {}
+        for label, kind, method, url, data in self.cases(names):
+            client = self.client_for(kind)
+            cache.clear()
+            with capture_queries() as captured:
+                response = getattr(client, method)(url, data)
+            self.assertLess(response.status_code, 500, label)
+            queries[label] = captured
+        return queries
+
+    def test_queries_do_not_grow_with_data(self):
+        """Число запросов одинаково на малых и больших данных."""
+        self.grow(self.SMALL)
+        small = self.measure()
+        self.grow(self.LARGE)
+        large = self.measure()
+        for label in small:
+            with self.subTest(route=label):
+                self.assertQueriesDoNotGrow(small[label], large[label],
+                                            label)
+
+    # Бюджет запросов core.metrics сработал бы раньше сравнения.
+    @override_settings(METRICS_ENFORCE_BUDGETS=False)
+    def test_guard_catches_n_plus_one(self):
+        """Лента без select_related падает с запросами за авторами."""
+        with mock.patch.object(PostQuerySet, 'for_feed',
+                               lambda queryset: queryset.all()):
+            with self.assertLogs('core.metrics', 'WARNING') as logs:
+                self.grow(self.SMALL)
+                small = self.measure(['posts:index'])
+                self.grow(self.LARGE)
+                large = self.measure(['posts:index'])
+        self.assertIn('SQL-запросов при бюджете', logs.output[0])
+        label = 'GET posts:index (reader)'
+        with self.assertRaisesMessage(AssertionError, 'FROM "auth_user"'):
+            self.assertQueriesDoNotGrow(small[label], large[label], label)
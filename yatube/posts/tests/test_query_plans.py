@@ -0,0 +1,98 @@
+import re
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Таблицы в SQL от ORM всегда в кавычках; так не попадают служебные
+# запросы вроде чтения sqlite_stat1 с именем таблицы в параметре.
+POSTS_TABLES = re.compile(r'"posts_\w+"')
+# Полный проход по таблице без индекса: "SCAN posts_post" или
+# "SCAN TABLE posts_post" (формат зависит от версии SQLite).
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?posts_\w+\b(?! USING)')
+
+
+class QueryPlanTests(TestCase):
+    """Ленты и комментарии читаются по индексам, без сортировок в памяти."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(settings.PAGE + 3):
+            post = Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group
+            )
+            Comment.objects.create(post=post, author=cls.reader, text='Ок')
+        cls.post = post
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_indexed(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        page_obj = response.context.get('page_obj')
+        cursors = (getattr(page_obj, 'next_cursor', ''),
+                   getattr(page_obj, 'last_cursor', ''))
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or not POSTS_TABLES.search(sql):
+                continue
+            for detail in self.explain(sql):
+                self.assertNotIn('TEMP B-TREE', detail, f'{url}: {sql}')
+                self.assertIsNone(
+                    FULL_SCAN.match(detail), f'{url}: {detail}: {sql}'
+                )
+        return cursors
+
+    def test_feeds_use_indexes(self):
+        """Первая, следующая и последняя страницы каждой ленты."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                next_cursor, last_cursor = self.assert_indexed(url)
+                self.assertTrue(next_cursor)
+                self.assert_indexed(f'{url}?cursor={next_cursor}')
+                self.assert_indexed(f'{url}?cursor={last_cursor}')
+
+    @override_settings(COMMENTS_PAGE=1)
+    def test_post_detail_comments_use_index(self):
+        """Комментарии поста выбираются по индексу (post, created)."""
+        Comment.objects.create(post=self.post, author=self.reader, text='Ещё')
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.assert_indexed(url)
+        cursor = self.client.get(url).context['comments'].next_cursor
+        self.assertTrue(cursor)
+        self.assert_indexed(
+            reverse('posts:post_comments', args=[self.post.pk])
+            + f'?cursor={cursor}'
+        )
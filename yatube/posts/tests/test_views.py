@@ -1,16 +1,37 @@
+import shutil
+import tempfile
+import time
+from io import BytesIO
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
 from django.urls import reverse
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django import forms
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from PIL import Image
 
-from posts.models import Post, Group, Comment, Follow
+from core.caching import fragment_stats, get_version
+from core.models import Task
+from core.tasks import run_pending
+from posts import search, thumbnails, timeline
+from posts.models import Post, Group, Comment, Follow, TimelineEntry
+from posts.paginator import NEXT, CursorPaginator
+from posts.search import SearchResults
 
 
 User = get_user_model()
 
 
+# Фоновый поток миниатюр не видит данных TestCase и упирается
+# в блокировку его транзакции.
+@override_settings(THUMBNAIL_ASYNC=False)
 class PostURLTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -269,6 +290,97 @@ class PaginatorViewsTest(TestCase):
                 remainder_posts
             )
 
+    def test_cursor_pages_walk_whole_feed(self):
+        """Курсоры ведут по ленте без повторов и пропусков в обе стороны."""
+        response = self.guest_client.get(reverse('posts:index'))
+        first_page = list(response.context['page_obj'])
+        next_cursor = response.context['page_obj'].next_cursor
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': next_cursor}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.number, 2)
+        self.assertFalse(page_obj.has_next())
+        self.assertEqual(
+            first_page + list(page_obj),
+            list(Post.objects.order_by('-pub_date', '-id'))
+        )
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': page_obj.previous_cursor}
+        )
+        self.assertEqual(list(response.context['page_obj']), first_page)
+        self.assertEqual(response.context['page_obj'].number, 1)
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': 'мусор'}
+        )
+        self.assertEqual(response.context['page_obj'].number, 1)
+        self.assertEqual(len(response.context['page_obj']), settings.PAGE)
+
+    def test_last_page_link_opens_feed_end(self):
+        """Ссылка на последнюю страницу открывает конец ленты курсором."""
+        cache.clear()
+        response = self.guest_client.get(reverse('posts:index'))
+        page_obj = response.context['page_obj']
+        self.assertIn(
+            f'href="?cursor={page_obj.last_cursor}">2</a>',
+            response.content.decode()
+        )
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': page_obj.last_cursor}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.number, 2)
+        self.assertFalse(page_obj.has_next())
+        self.assertEqual(
+            list(page_obj),
+            list(Post.objects.order_by('-pub_date', '-id'))[-settings.PAGE:]
+        )
+
+    def test_profile_page_count_comes_from_counter(self):
+        """Число страниц профиля берётся из счётчика, без COUNT(*)."""
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            self.guest_client.get(
+                reverse('posts:profile', args=[self.user.username])
+            )
+        self.assertFalse(
+            [q for q in context.captured_queries if 'COUNT(' in q['sql']]
+        )
+
+    def test_page_range_is_windowed(self):
+        """Номеров страниц не больше окна, сколько бы их ни было."""
+        paginator = CursorPaginator(Post.objects.all(), 1, count_hint=10000)
+        self.assertEqual(
+            list(paginator.get_elided_page_range(5000, on_each_side=2,
+                                                 on_ends=1)),
+            [1, '…', 4998, 4999, 5000, 5001, 5002, '…', 10000]
+        )
+        self.assertEqual(
+            list(paginator.get_elided_page_range(2, on_each_side=2,
+                                                 on_ends=1)),
+            [1, 2, 3, 4, '…', 10000]
+        )
+
+    def test_deep_page_links_use_cursors(self):
+        """Глубже первых страниц ссылки ведут по курсорам, а не OFFSET."""
+        paginator = CursorPaginator(Post.objects.all(), 1, count_hint=10000)
+        page = paginator.cursor_page(
+            paginator.encode_cursor(NEXT, 5000, Post.objects.first())
+        )
+        links = dict(page.page_links())
+        self.assertEqual(links[1], 'page=1')
+        self.assertEqual(links[page.number], '')
+        self.assertEqual(links[10000], f'cursor={page.last_cursor}')
+        self.assertEqual(links[page.number - 1],
+                         f'cursor={page.previous_cursor}')
+        for number, query in page.page_links():
+            if query.startswith('page='):
+                self.assertLessEqual(number,
+                                     CursorPaginator.OFFSET_LINK_PAGES)
+
 
 class FollowViewsTest(TestCase):
     @classmethod
@@ -340,3 +452,751 @@ class FollowViewsTest(TestCase):
         response_follower = self.authorized_client.get(reverse(
             'posts:follow_index'))
         self.assertIn(self.new_post, response_follower.context['page_obj'])
+
+    def test_follow_fills_and_unfollow_clears_timeline(self):
+        """Подписка переносит посты автора в ленту, отписка убирает."""
+        post = Post.objects.create(text='старый пост', author=self.user_author)
+        self.authorized_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.user_author}
+        ))
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=post).exists()
+        )
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.user_author}
+        ))
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_follow_index_reads_celebrity_posts(self):
+        """Посты популярных авторов подмешиваются в ленту при чтении."""
+        Follow.objects.create(user=self.user, author=self.user_author)
+        new_post = Post.objects.create(
+            text='post fo followers',
+            author=self.user_author
+        )
+        self.assertFalse(TimelineEntry.objects.exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(new_post, response.context['page_obj'])
+
+    @override_settings(TIMELINE_BACKFILL_LIMIT=2)
+    def test_add_followers_fills_timelines_in_chunks(self):
+        """Ленты подписчиков заполняются пачками и не больше предела."""
+        posts = [
+            Post.objects.create(text=f'пост {i}', author=self.user_author)
+            for i in range(3)
+        ]
+        readers = [self.user] + [
+            User.objects.create_user(username=f'reader{i}') for i in range(4)
+        ]
+        for reader in readers:
+            Follow.objects.create(user=reader, author=self.user_author)
+        TimelineEntry.objects.all().delete()
+        # Пачка — два подписчика на два поста.
+        with mock.patch.object(timeline, 'BATCH_SIZE', 4):
+            timeline.add_followers(self.user_author.pk)
+        self.assertEqual(
+            set(TimelineEntry.objects.values_list('user', 'post')),
+            {(reader.pk, post.pk) for reader in readers
+             for post in posts[1:]}
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_celebrity_posts_kept_after_falling_under_limit(self):
+        """Посты, написанные автором в популярности, остаются в ленте
+        подписчиков, когда подписчиков становится меньше предела."""
+        Follow.objects.create(user=self.user, author=self.user_author)
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=other, author=self.user_author)
+        post = Post.objects.create(text='популярный', author=self.user_author)
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        Follow.objects.filter(user=other).delete()
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=post).exists()
+        )
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.author = User.objects.create_user(username='author')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def add_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(
+                text=f'Пост {i}',
+                author=self.author,
+                group=self.group,
+            )
+            Comment.objects.create(post=post, author=self.reader, text='Ок')
+
+    def count_queries(self, client, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_feed_query_count_does_not_grow_with_page_size(self):
+        """Число запросов ленты не зависит от числа постов на странице."""
+        pages = {
+            self.guest_client: [
+                reverse('posts:index'),
+                reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+                reverse('posts:profile', args=[self.author.username]),
+            ],
+            self.authorized_client: [reverse('posts:follow_index')],
+        }
+        self.add_posts(settings.PAGE + 1)
+        for client, urls in pages.items():
+            for url in urls:
+                with self.subTest(url=url):
+                    self.assertEqual(
+                        self.count_queries(client, url),
+                        self.count_queries(client, url + '?page=2')
+                    )
+
+    def test_index_page_is_single_query(self):
+        """Главная страница для гостя с прогретым кэшем — без запросов."""
+        self.add_posts(settings.PAGE + 1)
+        self.guest_client.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            self.guest_client.get(reverse('posts:index'))
+
+
+class IndexCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(text='Старый текст', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        fragment_stats.reset()
+        self.guest_client = Client()
+
+    def test_repeated_index_is_served_from_cache(self):
+        """Повторный запрос главной берёт ленту из кэша."""
+        # Гостю страница целиком отдаётся из кэша страниц, а фрагменты
+        # нужны авторизованным.
+        client = Client()
+        client.force_login(self.user)
+        client.get(reverse('posts:index'))
+        client.get(reverse('posts:index'))
+        stats = fragment_stats.snapshot()
+        self.assertEqual(stats['index_page'], {'hits': 1, 'misses': 1})
+        self.assertEqual(stats['post_card'], {'hits': 0, 'misses': 1})
+
+    def test_author_rename_invalidates_cards(self):
+        """Новое имя автора видно в закэшированной карточке."""
+        client = Client()
+        client.force_login(self.user)
+        client.get(reverse('posts:index'))
+        self.user.first_name = 'Новое имя'
+        self.user.save()
+        content = client.get(reverse('posts:index')).content.decode()
+        self.assertIn('Новое имя', content)
+
+    def test_comment_keeps_feed_version(self):
+        """Комментарий не сбрасывает кэш ленты: она его не показывает."""
+        feed_version = get_version('feed')
+        Comment.objects.create(post=self.post, author=self.user, text='Ок')
+        self.assertEqual(get_version('feed'), feed_version)
+
+    def test_post_changes_invalidate_index(self):
+        """Новый и изменённый посты сразу видны на главной."""
+        self.guest_client.get(reverse('posts:index'))
+        self.post.text = 'Новый текст'
+        self.post.save()
+        new_post = Post.objects.create(text='Свежий пост', author=self.user)
+        content = self.guest_client.get(reverse('posts:index')).content
+        self.assertIn('Новый текст'.encode(), content)
+        self.assertIn(new_post.text.encode(), content)
+        new_post.delete()
+        content = self.guest_client.get(reverse('posts:index')).content
+        self.assertNotIn(new_post.text.encode(), content)
+        self.assertEqual(fragment_stats.snapshot()['post_card']['hits'], 1)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR))
+class ThumbnailViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        image = BytesIO()
+        Image.new('RGB', (40, 20), 'red').save(image, 'png')
+        cls.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=cls.user,
+            image=SimpleUploadedFile('red.png', image.getvalue()),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def get_detail(self):
+        return self.guest_client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        ).content.decode()
+
+    def test_missing_thumbnail_is_scheduled_not_rendered(self):
+        """Без готовой миниатюры страница показывает заглушку."""
+        with mock.patch('posts.thumbnails.schedule') as schedule:
+            content = self.get_detail()
+        self.assertIn('Изображение обрабатывается', content)
+        schedule.assert_called()
+
+    @override_settings(THUMBNAIL_ASYNC=False)
+    def test_generated_thumbnails_are_rendered(self):
+        """После генерации готовы все размеры и страница их показывает."""
+        self.assertTrue(thumbnails.generate(self.post.image.name))
+        backend = thumbnails.PregeneratedBackend()
+        for geometry, options in thumbnails.SIZES:
+            with self.subTest(geometry=geometry):
+                self.assertIsNotNone(backend.get_ready_thumbnail(
+                    self.post.image.name, geometry, **options
+                ))
+        content = self.get_detail()
+        self.assertNotIn('Изображение обрабатывается', content)
+        self.assertIn('<img class="card-img my-2"', content)
+        self.assertIn('480w', content)
+
+    def test_generation_keeps_feed_versions(self):
+        """Готовые миниатюры не сбрасывают кэш лент и не трогают пост."""
+        updated = self.post.updated
+        feed_version = get_version('feed')
+        self.assertTrue(thumbnails.generate(self.post.image.name))
+        self.assertEqual(get_version('feed'), feed_version)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.updated, updated)
+
+    def test_failed_file_is_not_scheduled_again(self):
+        """Файл без исходника не ставится в очередь на каждом рендере."""
+        with self.assertLogs(level='WARNING'):
+            self.assertFalse(thumbnails.generate('posts/missing.png'))
+        with mock.patch.object(thumbnails, 'get_executor') as get_executor:
+            thumbnails.schedule('posts/missing.png')
+        get_executor.assert_not_called()
+        self.assertFalse(thumbnails.is_pending('posts/missing.png'))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR))
+class AsyncThumbnailViewsTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(shutil.rmtree, settings.MEDIA_ROOT, True)
+        image = BytesIO()
+        Image.new('RGB', (40, 20), 'red').save(image, 'png')
+        self.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=User.objects.create_user(username='auth'),
+            image=SimpleUploadedFile('red.png', image.getvalue()),
+        )
+
+    def get_detail(self):
+        return Client().get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        ).content.decode()
+
+    def test_thumbnails_are_generated_in_background(self):
+        """Рендер отдаёт заглушку, а миниатюры готовит пул потоков."""
+        response = Client().get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        self.assertIn('Изображение обрабатывается', response.content.decode())
+        # Заглушка временная: страницу не кэшируют и не валидируют.
+        self.assertFalse(response.has_header('ETag'))
+        self.assertIn('no-cache', response['Cache-Control'])
+        deadline = time.monotonic() + 10
+        while (self.post.image.name in thumbnails._pending
+               and time.monotonic() < deadline):
+            time.sleep(0.05)
+        self.assertIn('<img class="card-img my-2"', self.get_detail())
+
+
+@override_settings(SEARCH_BACKEND='fts5')
+class SearchViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'
+        )
+        cls.rare = Post.objects.create(text='Кот и пёс', author=cls.user)
+        cls.often = Post.objects.create(text='Кот кот', author=cls.user)
+        cls.other = Post.objects.create(text='Про сон', author=cls.user)
+        cls.comment = Comment.objects.create(
+            post=cls.other, author=cls.user, text='Снился кот'
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query, **params):
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.context['page_obj']
+
+    def test_search_ranks_posts_and_comments(self):
+        """Поиск находит посты по тексту и комментариям, частые выше."""
+        page_obj = self.search('КОТ')
+        self.assertEqual(page_obj.paginator.count, 3)
+        self.assertEqual(page_obj[0], self.often)
+        self.assertCountEqual(page_obj, [self.rare, self.often, self.other])
+        self.assertEqual(list(self.search('кот пёс')), [self.rare])
+
+    def test_index_follows_changes(self):
+        """Правка и удаление поста и комментария обновляют индекс."""
+        rare = Post.objects.get(pk=self.rare.pk)
+        rare.text = 'Только пёс'
+        rare.save()
+        Comment.objects.get(pk=self.comment.pk).delete()
+        self.assertEqual(list(self.search('кот')), [self.often])
+        self.assertEqual(list(self.search('только')), [self.rare])
+        Post.objects.get(pk=self.often.pk).delete()
+        self.assertEqual(list(self.search('кот')), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        """Служебные символы и пустой запрос не ломают поиск."""
+        for query in ('"кот', 'кот OR пёс', 'NEAR(кот', '***', ''):
+            with self.subTest(query=query):
+                self.search(query)
+        self.assertEqual(self.search('***').paginator.count, 0)
+
+    def test_search_is_paginated(self):
+        """Результаты делятся на страницы по settings.PAGE."""
+        Post.objects.bulk_create(
+            Post(text=f'Кот номер {i}', author=self.user)
+            for i in range(settings.PAGE)
+        )
+        from posts.search import get_index
+        get_index().rebuild()
+        self.assertEqual(len(self.search('кот')), settings.PAGE)
+        self.assertEqual(len(self.search('кот', page=2)), 3)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке ищет по индексу."""
+        client = Client()
+        client.force_login(self.admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'кот'}
+        )
+        self.assertEqual(response.context['cl'].result_count, 2)
+        response = client.get(
+            reverse('admin:posts_comment_changelist'), {'q': 'кот'}
+        )
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+
+@override_settings(SEARCH_BACKEND='python')
+class PostingSearchViewsTest(SearchViewsTest):
+    """Те же проверки для запасного индекса без FTS5."""
+
+    def test_postings_are_ranked_in_database(self):
+        """Вхождения слов группирует база, в Python они не читаются."""
+        with CaptureQueriesContext(connection) as queries:
+            self.search('кот')
+        postings = [query['sql'] for query in queries
+                    if 'posts_searchposting' in query['sql']]
+        self.assertTrue(postings)
+        for sql in postings:
+            self.assertIn('GROUP BY', sql)
+
+    def test_fts_table_probed_again(self):
+        """Отсутствие FTS5 запоминается ненадолго: таблицу, созданную
+        после запуска, поиск находит без перезапуска."""
+        name = connection.settings_dict['NAME']
+        self.addCleanup(search._fts_tables.pop, name, None)
+        search._fts_tables[name] = (False, time.monotonic())
+        self.assertFalse(search.has_fts_table())
+        search._fts_tables[name] = (
+            False, time.monotonic() - search.FTS_PROBE_INTERVAL
+        )
+        self.assertTrue(search.has_fts_table())
+
+
+class ConditionalViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.user, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.urls = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_list', args=[self.group.slug]),
+            'other_group': reverse(
+                'posts:group_list', args=[self.other_group.slug]
+            ),
+            'profile': reverse('posts:profile', args=[self.user.username]),
+            'detail': reverse('posts:post_detail', args=[self.post.pk]),
+        }
+
+    def get_etags(self):
+        return {
+            name: self.guest_client.get(url)['ETag']
+            for name, url in self.urls.items()
+        }
+
+    def revalidate(self, name, etag):
+        return self.guest_client.get(
+            self.urls[name], HTTP_IF_NONE_MATCH=etag
+        ).status_code
+
+    def test_anonymous_pages_are_cacheable(self):
+        """Анонимам отдаются валидаторы и заголовки для прокси."""
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                response = self.guest_client.get(url)
+                self.assertTrue(response.has_header('ETag'))
+                self.assertTrue(response.has_header('Last-Modified'))
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('Cookie', response['Vary'])
+
+    def test_not_modified_costs_at_most_one_query(self):
+        """Ответ 304 стоит не больше одного запроса к базе."""
+        for name, etag in self.get_etags().items():
+            with self.subTest(page=name):
+                with CaptureQueriesContext(connection) as context:
+                    status = self.revalidate(name, etag)
+                self.assertEqual(status, 304)
+                self.assertLessEqual(len(context), 1)
+        response = self.guest_client.get(self.urls['index'])
+        response = self.guest_client.get(
+            self.urls['index'],
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate_only_their_scopes(self):
+        """Новый пост в группе меняет её ленты, но не чужую группу."""
+        etags = self.get_etags()
+        Post.objects.create(
+            text='Новый пост', author=self.user, group=self.group
+        )
+        expected = {
+            'index': 200,
+            'group': 200,
+            'other_group': 304,
+            'profile': 200,
+            'detail': 200,
+        }
+        for name, status in expected.items():
+            with self.subTest(page=name):
+                self.assertEqual(self.revalidate(name, etags[name]), status)
+
+    def test_comment_and_group_move_invalidate_pages(self):
+        """Комментарий меняет пост, перенос поста — обе группы."""
+        etags = self.get_etags()
+        Comment.objects.create(post=self.post, author=self.user, text='Ок')
+        self.assertEqual(self.revalidate('detail', etags['detail']), 200)
+        self.assertEqual(self.revalidate('index', etags['index']), 304)
+        post = Post.objects.get(pk=self.post.pk)
+        post.group = self.other_group
+        post.save()
+        self.assertEqual(self.revalidate('group', etags['group']), 200)
+        self.assertEqual(
+            self.revalidate('other_group', etags['other_group']), 200
+        )
+
+    def test_user_changes_invalidate_only_shown_names(self):
+        """Регистрация и вход не меняют страниц, смена имени — меняет."""
+        etags = self.get_etags()
+        newcomer = User.objects.create_user(username='newcomer')
+        self.client.force_login(newcomer)
+        newcomer.email = 'newcomer@example.com'
+        newcomer.save()
+        for name, etag in etags.items():
+            with self.subTest(page=name):
+                self.assertEqual(self.revalidate(name, etag), 304)
+        self.user.first_name = 'Автор'
+        self.user.save()
+        for name, etag in etags.items():
+            with self.subTest(page=name):
+                self.assertEqual(self.revalidate(name, etag), 200)
+
+    def test_group_rename_invalidates_profile(self):
+        """Профиль показывает названия групп и меняется вместе с ними."""
+        etags = self.get_etags()
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertEqual(self.revalidate('profile', etags['profile']), 200)
+
+    def test_authorized_pages_are_private(self):
+        """Страницы авторизованного не кэшируются прокси и не дают 304."""
+        etag = self.guest_client.get(self.urls['index'])['ETag']
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(self.urls['index'], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+
+
+class PageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.user, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        ]
+
+    def test_guest_pages_are_served_from_cache(self):
+        """Повторная страница для гостя не трогает базу и шаблоны."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                with self.assertNumQueries(1 if 'posts/' in url else 0):
+                    second = self.guest_client.get(url)
+                self.assertIsNone(second.context)
+                self.assertEqual(second.content, first.content)
+                self.assertEqual(second['Content-Type'],
+                                 first['Content-Type'])
+
+    def test_changes_bump_page_versions(self):
+        """Новый пост и комментарий сразу видны гостю."""
+        for url in self.urls:
+            self.guest_client.get(url)
+        new_post = Post.objects.create(
+            text='Свежий пост', author=self.user, group=self.group
+        )
+        for url in self.urls[:3]:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), new_post.text)
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Свежий комментарий')
+        self.assertContains(
+            self.guest_client.get(self.urls[3]), 'Свежий комментарий'
+        )
+
+    def test_pages_are_cached_separately(self):
+        """Страницы ленты с разными параметрами не смешиваются."""
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=self.user)
+            for i in range(settings.PAGE)
+        )
+        first = self.guest_client.get(self.urls[0])
+        second = self.guest_client.get(self.urls[0], {'page': 2})
+        self.assertEqual(len(second.context['page_obj']), 1)
+        self.assertNotEqual(first.content, second.content)
+
+    def test_authorized_user_bypasses_cache(self):
+        """Авторизованный получает свою страницу, а не гостевую."""
+        self.guest_client.get(self.urls[0])
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(self.urls[0])
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, f'Пользователь: {self.user.username}')
+        self.assertNotContains(
+            self.guest_client.get(self.urls[0]), 'Пользователь:'
+        )
+
+
+@override_settings(TASKS_EAGER=False)
+class BackgroundTasksTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        run_pending()
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_follow_fills_timeline_in_worker(self):
+        """Подписка и отписка меняют ленту в воркере, а не в запросе."""
+        post = Post.objects.create(text='Старый пост', author=self.author)
+        run_pending()
+        follower = User.objects.create_user(username='follower')
+        client = Client()
+        client.force_login(follower)
+        client.get(reverse('posts:profile_follow', args=[self.author]))
+        self.assertFalse(TimelineEntry.objects.filter(user=follower).exists())
+        run_pending()
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=follower, post=post).exists()
+        )
+        client.get(reverse('posts:profile_unfollow', args=[self.author]))
+        self.assertTrue(TimelineEntry.objects.filter(user=follower).exists())
+        run_pending()
+        self.assertFalse(TimelineEntry.objects.filter(user=follower).exists())
+
+    def test_search_removal_waits_for_worker(self):
+        """Удалённые пост и комментарий уходят из индекса в воркере."""
+        post = Post.objects.create(text='Удаляемый пост', author=self.author)
+        Comment.objects.create(
+            post=post, author=self.reader, text='Удаляемый комментарий'
+        )
+        run_pending()
+        self.assertEqual(len(SearchResults('удаляемый')), 1)
+        post.delete()
+        pending = set(Task.objects.filter(status=Task.PENDING)
+                      .values_list('name', flat=True))
+        self.assertIn('posts.tasks.unindex_post', pending)
+        self.assertIn('posts.tasks.unindex_comment', pending)
+        run_pending()
+        self.assertEqual(len(SearchResults('удаляемый')), 0)
+
+    def test_stale_follow_task_is_skipped(self):
+        """Задача подписки, дождавшаяся отписки, ленту не заполняет."""
+        Post.objects.create(text='Старый пост', author=self.author)
+        run_pending()
+        follower = User.objects.create_user(username='follower')
+        Follow.objects.create(user=follower, author=self.author)
+        Follow.objects.filter(user=follower).delete()
+        run_pending()
+        self.assertFalse(TimelineEntry.objects.filter(user=follower).exists())
+
+    def test_side_effects_wait_for_worker(self):
+        """Лента подписчика и поиск обновляются воркером, а не запросом."""
+        self.author_client.post(
+            reverse('posts:post_create'), {'text': 'Пост из очереди'}
+        )
+        post = Post.objects.get()
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        self.assertEqual(
+            set(Task.objects.filter(status=Task.PENDING)
+                .values_list('name', flat=True)),
+            {'posts.tasks.fan_out_post', 'posts.tasks.index_post',
+             'posts.tasks.index_comment', 'posts.tasks.send_digests'}
+        )
+        self.assertFalse(TimelineEntry.objects.exists())
+        run_pending()
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertEqual(len(SearchResults('очереди')), 1)
+        self.assertEqual(len(SearchResults('ок')), 1)
+
+
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+        for i in range(settings.COMMENTS_PAGE + 5):
+            author = User.objects.create_user(
+                username=f'reader{i}', first_name=f'Читатель{i}'
+            )
+            Comment.objects.create(
+                post=cls.post, author=author, text=f'Комментарий {i}'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.detail_url = reverse('posts:post_detail', args=[self.post.pk])
+        self.comments_url = reverse(
+            'posts:post_comments', args=[self.post.pk]
+        )
+
+    def test_detail_renders_first_page(self):
+        """Пост показывает первую страницу комментариев и «Показать ещё»."""
+        response = self.guest_client.get(self.detail_url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), settings.COMMENTS_PAGE)
+        self.assertEqual(comments[0].text, 'Комментарий 0')
+        self.assertTrue(comments.next_cursor)
+        self.assertContains(response, 'Читатель0')
+        self.assertContains(response, 'Показать ещё комментарии')
+        self.assertNotContains(
+            response, f'Комментарий {settings.COMMENTS_PAGE}<'
+        )
+
+    def test_load_more_returns_fragment(self):
+        """Подгрузка отдаёт оставшиеся комментарии фрагментом."""
+        cursor = self.guest_client.get(
+            self.detail_url
+        ).context['comments'].next_cursor
+        with self.assertNumQueries(2):
+            response = self.guest_client.get(
+                self.comments_url, {'cursor': cursor}
+            )
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            [f'Комментарий {i}' for i in range(
+                settings.COMMENTS_PAGE, settings.COMMENTS_PAGE + 5
+            )]
+        )
+        self.assertFalse(comments.next_cursor)
+        self.assertNotContains(response, '<html')
+        self.assertNotContains(response, 'Показать ещё комментарии')
+
+    def test_comment_authors_are_joined(self):
+        """Авторы комментариев выбираются вместе с комментариями."""
+        with CaptureQueriesContext(connection) as context:
+            self.guest_client.get(self.detail_url)
+        self.assertFalse([
+            query for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+            and 'FROM "auth_user"' in query['sql']
+        ])
+
+    def test_load_more_for_missing_post(self):
+        """Комментарии несуществующего поста — 404."""
+        response = self.guest_client.get(
+            reverse('posts:post_comments', args=[0])
+        )
+        self.assertEqual(response.status_code, 404)
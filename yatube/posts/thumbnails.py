@@ -0,0 +1,226 @@
+"""Миниатюры картинок постов готовятся в фоне, а не во время рендера.
+
+``PregeneratedBackend`` подключается через ``THUMBNAIL_BACKEND``: тег
+``{% thumbnail %}`` получает миниатюру, только если она уже готова,
+иначе ставит её в очередь и отдаёт пустой результат (шаблон показывает
+заглушку из ``{% empty %}``). Создаёт файлы пул потоков с обычным
+бэкендом sorl. Для только что загруженной картинки view ставит задачу
+в очередь ``core.tasks`` (``enqueue``), и миниатюры готовит воркер.
+
+Готовность миниатюры sorl проверяет по карточке: чтение кэша, а при
+промахе — запрос к базе. Ленты заранее вызывают ``prefetch`` для всей
+страницы: одно чтение кэша и не больше одного запроса.
+
+Заглушка отмечается ``core.caching.mark_temporary``: карточка и страница
+с ней не кэшируются, поэтому готовая миниатюра не сбрасывает кэш лент.
+Неудачи запоминаются в общем кэше на ``THUMBNAIL_RETRY_AFTER`` секунд:
+до этого файл не ставится в очередь на каждом рендере.
+"""
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedDbStore
+from sorl.thumbnail.models import KVStore
+
+from core import metrics
+from core.caching import mark_modified, mark_temporary
+
+from . import tasks
+from .models import Post
+from .scopes import post_scopes
+
+logger = logging.getLogger(__name__)
+
+# Размеры, которые используют шаблоны: карточка ленты и поста (и её
+# половина для узких экранов в srcset), лента подписок. Новый размер
+# в шаблоне нужно добавить и сюда.
+CARD_SIZE = '960x339'
+CARD_SMALL_SIZE = '480x170'
+FOLLOW_SIZE = '1024x1024'
+SIZES = (
+    (CARD_SIZE, {'crop': 'center', 'upscale': True}),
+    (CARD_SMALL_SIZE, {'crop': 'center', 'upscale': True}),
+    (FOLLOW_SIZE, {'upscale': True}),
+)
+CARD_SIZES = (CARD_SIZE, CARD_SMALL_SIZE)
+FAILED_KEY = 'thumbnail_failed:{}'
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+class PregeneratedBackend(ThumbnailBackend):
+    """Бэкенд sorl, который никогда не генерирует миниатюру в запросе."""
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        thumbnail = self.get_ready_thumbnail(file_, geometry_string, **options)
+        if thumbnail is None:
+            schedule(file_)
+            if not settings.THUMBNAIL_ASYNC:
+                thumbnail = self.get_ready_thumbnail(
+                    file_, geometry_string, **options
+                )
+            if thumbnail is None and is_pending(file_):
+                mark_temporary()
+        return thumbnail
+
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        """Готовая миниатюра из key-value хранилища sorl или ``None``."""
+        return default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, **options)
+        )
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """Файл миниатюры, как его назовёт sorl; сам файл не создаётся."""
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+
+def prefetch(posts, *geometries):
+    """Заранее прочитать готовность миниатюр ``geometries`` для постов.
+
+    Ключи страницы читаются из кэша sorl одним ``get_many``, недостающие —
+    одним запросом к базе, и кэш заполняется так же, как при чтении по
+    одному ключу. Другие хранилища sorl проверяются как обычно.
+    """
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDbStore):
+        return
+    backend = PregeneratedBackend()
+    sizes = dict(SIZES)
+    keys = {
+        add_prefix(backend.thumbnail_file(post.image, geometry,
+                                          **sizes[geometry]).key)
+        for post in posts if post.image
+        for geometry in geometries
+    }
+    missing = keys - set(kvstore.cache.get_many(keys))
+    if not missing:
+        return
+    found = dict(
+        KVStore.objects.filter(key__in=missing).values_list('key', 'value')
+    )
+    kvstore.cache.set_many(
+        {key: found.get(key, EMPTY_VALUE) for key in missing},
+        sorl_settings.THUMBNAIL_CACHE_TIMEOUT
+    )
+
+
+def failed_key(name):
+    return FAILED_KEY.format(hashlib.md5(name.encode()).hexdigest())
+
+
+def is_pending(file_):
+    """Файл ждёт миниатюр в пуле этого процесса."""
+    with _pending_lock:
+        return getattr(file_, 'name', file_) in _pending
+
+
+def generate(name):
+    """Создать все размеры миниатюр для файла ``name``.
+
+    Карточки с заглушкой не кэшировались, поэтому обычно сбрасывать
+    нечего. Заглушку файла, который раньше не удался, кэш считал
+    окончательной: после успеха меняются ``updated`` его постов (ключ
+    карточки) и отметки областей, где они видны.
+    """
+    backend = ThumbnailBackend()
+    try:
+        created = [
+            backend.get_thumbnail(name, geometry, **options)
+            for geometry, options in SIZES
+        ]
+        # Без исходника sorl молча возвращает несозданную миниатюру.
+        if not all(default.kvstore.get(image) for image in created):
+            logger.warning('Нет исходного файла для миниатюр: %s', name)
+            remember_failure(name)
+            return False
+        if cache.get(failed_key(name)):
+            cache.delete(failed_key(name))
+            posts = Post.objects.filter(image=name).select_related(
+                'author', 'group'
+            )
+            for post in posts:
+                mark_modified(*post_scopes(
+                    post, [post.group.slug] if post.group else []
+                ))
+            posts.update(updated=timezone.now())
+        return True
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+        remember_failure(name)
+        return False
+    finally:
+        with _pending_lock:
+            _pending.discard(name)
+
+
+def remember_failure(name):
+    cache.set(failed_key(name), True, settings.THUMBNAIL_RETRY_AFTER)
+
+
+def _run_in_worker(name):
+    try:
+        generate(name)
+    finally:
+        # У потока пула свои соединения с базой (kvstore sorl).
+        connections.close_all()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails'
+            )
+        return _executor
+
+
+def schedule(file_):
+    """Поставить файл в очередь; повторные вызовы до готовности — no-op."""
+    name = getattr(file_, 'name', file_)
+    # Кэш читается без блокировки; очередь проверяется ещё раз под ней.
+    if not name or is_pending(name) or cache.get(failed_key(name)):
+        return
+    with _pending_lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    if not settings.THUMBNAIL_ASYNC:
+        with metrics.excluded():
+            generate(name)
+        return
+    get_executor().submit(_run_in_worker, name)
+
+
+def enqueue(post):
+    """Хук для view: создать миниатюры новой картинки в фоновой задаче."""
+    if post.image:
+        name = post.image.name
+        tasks.generate_thumbnails.enqueue(name, key=f'thumbnails:{name}')
@@ -0,0 +1,141 @@
+"""Лента подписок: fan-out on write с откатом на чтение для популярных.
+
+Новый пост сразу раскладывается по ``TimelineEntry`` всех подписчиков
+автора, и ``follow_index`` читает ленту одним диапазоном по индексу
+``(user, pub_date, post)``. Авторы, у которых подписчиков больше
+``settings.TIMELINE_FANOUT_LIMIT``, не раскладываются: их посты
+подмешиваются в ленту при чтении. Когда такой автор опускается до
+предела, его посты переносятся в ленты всех подписчиков
+(``add_followers``), иначе написанное им, пока он был популярен,
+пропало бы из лент. Подписка и отписка меняют ленту фоновыми задачами
+(``posts.tasks.add_author``, ``remove_author``), а не в запросе.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Follow, Post, Profile, TimelineEntry
+
+# SQLite вставляет пачку одним составным SELECT, а в нём не больше 500
+# частей (SQLITE_MAX_COMPOUND_SELECT).
+BATCH_SIZE = 500
+
+
+def is_celebrity(author_id):
+    return Profile.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).exists()
+
+
+def fan_out_post(post):
+    """Разложить новый пост по лентам подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        batch_size=BATCH_SIZE,
+        # Задачу раскладки могут запустить повторно (posts.tasks).
+        ignore_conflicts=True
+    )
+
+
+def recent_posts(author_id):
+    return Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('pk', 'pub_date')[:settings.TIMELINE_BACKFILL_LIMIT]
+
+
+def add_author(user_id, author_id):
+    """Подписка: перенести в ленту последние посты автора."""
+    if is_celebrity(author_id):
+        return
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in recent_posts(author_id)),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def fell_under_limit(author_id):
+    """Автор только что потерял подписчика и перестал быть популярным."""
+    return Profile.objects.filter(
+        user_id=author_id,
+        followers_count=settings.TIMELINE_FANOUT_LIMIT
+    ).exists()
+
+
+def add_followers(author_id):
+    """Перенести последние посты автора в ленты всех его подписчиков.
+
+    Подписчики читаются пачками по ``user_id``, чтобы в памяти и в одной
+    вставке было не больше ``BATCH_SIZE`` записей (и не меньше одного
+    подписчика): у автора на пределе популярности их тысячи.
+    """
+    if is_celebrity(author_id):
+        return
+    posts = list(recent_posts(author_id))
+    if not posts:
+        return
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).order_by('user_id').values_list('user_id', flat=True)
+    chunk_size = max(1, BATCH_SIZE // len(posts))
+    last_user_id = 0
+    while True:
+        user_ids = list(
+            followers.filter(user_id__gt=last_user_id)[:chunk_size]
+        )
+        if not user_ids:
+            return
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=user_id, post_id=post_id,
+                           pub_date=pub_date)
+             for user_id in user_ids
+             for post_id, pub_date in posts],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True
+        )
+        last_user_id = user_ids[-1]
+
+
+def remove_author(user_id, author_id):
+    """Отписка: убрать посты автора из ленты."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def rebuild():
+    """Заполнить ленты заново, например после загрузки без сигналов."""
+    with transaction.atomic():
+        TimelineEntry.objects.all().delete()
+        follows = Follow.objects.values_list('user_id', 'author_id')
+        for user_id, author_id in follows.iterator():
+            add_author(user_id, author_id)
+
+
+def get_feed(user):
+    """Вернуть ``(queryset, опции пагинатора)`` для ленты подписок."""
+    celebrities = list(Follow.objects.filter(
+        user=user,
+        author__profile__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).values_list('author_id', flat=True))
+    if celebrities:
+        entries = TimelineEntry.objects.filter(user=user).values('post_id')
+        posts = Post.objects.for_feed().filter(
+            Q(pk__in=entries) | Q(author_id__in=celebrities)
+        )
+        return posts, {}
+    entries = TimelineEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group'
+    )
+    return entries, {
+        'ordering': ('-pub_date', '-post_id'),
+        'transform': lambda rows: [entry.post for entry in rows],
+    }
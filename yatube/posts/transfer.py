@@ -0,0 +1,327 @@
+"""Потоковая выгрузка и загрузка групп, постов, комментариев и подписок.
+
+Формат JSONL — по объекту на строку с ключом ``model``, в порядке
+``MODELS``: группы, посты, комментарии, подписки. CSV — одна модель
+на файл, колонки из ``FIELDS``. Пользователи и группы записываются
+естественными ключами (username, slug); посты и комментарии — своими id,
+чтобы комментарии ссылались на посты без таблицы соответствия.
+
+Загрузка читает файл генератором и вставляет объекты ``bulk_create``
+пачками, каждая пачка — отдельная транзакция, после которой в файл
+контрольной точки пишется номер последней строки и сдвиги id. Авторы
+и группы ищутся по словарям в памяти, недостающие создаются.
+bulk_create не вызывает сигналы, поэтому после загрузки счётчики, ленты
+подписок и индекс поиска перестраиваются целиком (``finalize``).
+
+CSV несёт одну модель, поэтому полная загрузка — несколько запусков:
+посты, затем комментарии. Комментарии должны получить тот же сдвиг id
+постов, что и сами посты, поэтому запуски делят один файл контрольной
+точки (``--checkpoint``) или получают сдвиг явно (``--post-offset``).
+
+Файлы картинок не переносятся: в посте остаётся только имя файла.
+"""
+import csv
+import json
+import os
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+
+from core.caching import bump_version, mark_modified
+
+from . import search, timeline
+from .counters import rebuild_counters
+from .models import Comment, Follow, Group, Post
+from .scopes import FEED, GROUPS, USERS, author_scope, group_scope
+
+User = get_user_model()
+
+MODELS = ('group', 'post', 'comment', 'follow')
+FIELDS = {
+    'group': ('slug', 'title', 'description'),
+    'post': ('id', 'author', 'group', 'text', 'pub_date', 'updated',
+             'image'),
+    'comment': ('id', 'post', 'author', 'text', 'created'),
+    'follow': ('user', 'author'),
+}
+EXPORT_COLUMNS = {
+    'group': ('slug', 'title', 'description'),
+    'post': ('pk', 'author__username', 'group__slug', 'text', 'pub_date',
+             'updated', 'image'),
+    'comment': ('pk', 'post_id', 'author__username', 'text', 'created'),
+    'follow': ('user__username', 'author__username'),
+}
+EXPORT_QUERYSETS = {
+    'group': Group.objects,
+    'post': Post.objects,
+    'comment': Comment.objects,
+    'follow': Follow.objects,
+}
+
+
+class TransferError(Exception):
+    pass
+
+
+def export_records(model, chunk_size=5000):
+    """Записи модели по возрастанию id, без загрузки таблицы в память."""
+    rows = EXPORT_QUERYSETS[model].order_by('pk').values_list(
+        *EXPORT_COLUMNS[model]
+    )
+    for row in rows.iterator(chunk_size=chunk_size):
+        record = {'model': model}
+        for field, value in zip(FIELDS[model], row):
+            record[field] = value.isoformat() if hasattr(
+                value, 'isoformat'
+            ) else value
+        yield record
+
+
+def write_jsonl(records, stream):
+    written = 0
+    for record in records:
+        stream.write(json.dumps(record, ensure_ascii=False))
+        stream.write('\n')
+        written += 1
+    return written
+
+
+def write_csv(records, stream, model):
+    writer = csv.DictWriter(stream, FIELDS[model], extrasaction='ignore')
+    writer.writeheader()
+    written = 0
+    for record in records:
+        writer.writerow(record)
+        written += 1
+    return written
+
+
+def read_jsonl(stream):
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            raise TransferError(f'Строка {number}: {error}')
+        if record.get('model') not in MODELS:
+            raise TransferError(f'Строка {number}: неизвестная модель')
+        yield record
+
+
+def read_csv(stream, model):
+    for row in csv.DictReader(stream):
+        row['model'] = model
+        for field in ('id', 'post'):
+            if row.get(field):
+                row[field] = int(row[field])
+        yield row
+
+
+@contextmanager
+def keep_dates():
+    """Не подменять загружаемые даты на текущие (auto_now, auto_now_add)."""
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Post._meta.get_field('updated'),
+        Comment._meta.get_field('created'),
+    ]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def read_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as stream:
+        return json.load(stream)
+
+
+def write_checkpoint(path, state):
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as stream:
+        json.dump(state, stream)
+    os.replace(temporary, path)
+
+
+class Importer:
+    """Загрузка записей пачками по ``batch_size``.
+
+    ``post_offset`` и ``comment_offset`` сдвигают id постов и комментариев,
+    чтобы не столкнуться с уже существующими. Если сдвиги не заданы, они
+    берутся из контрольной точки (её пишет и прошлый запуск с другим
+    файлом), а без неё — текущие максимальные id (на пустой базе id
+    сохраняются). ``resume`` продолжает прерванный запуск с сохранённой
+    строки.
+    """
+
+    def __init__(self, batch_size=5000, checkpoint=None, progress=None,
+                 post_offset=None, comment_offset=None):
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint
+        self.progress = progress
+        self.position = 0
+        self.loaded = 0
+        self.post_offset = post_offset
+        self.comment_offset = comment_offset
+        self.users = {}
+        self.groups = {}
+        self.pending = {model: [] for model in MODELS}
+
+    def run(self, records, resume=False):
+        state = read_checkpoint(self.checkpoint) or {}
+        skip = state.get('position', 0) if resume else 0
+        if self.post_offset is None:
+            self.post_offset = state.get('post_offset')
+        if self.comment_offset is None:
+            self.comment_offset = state.get('comment_offset')
+        if self.post_offset is None:
+            self.post_offset = Post.objects.aggregate(m=Max('pk'))['m'] or 0
+        if self.comment_offset is None:
+            self.comment_offset = (
+                Comment.objects.aggregate(m=Max('pk'))['m'] or 0
+            )
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.started = time.perf_counter()
+        self.position = skip
+        with keep_dates():
+            for position, record in enumerate(records, 1):
+                if position <= skip:
+                    continue
+                self.pending[record['model']].append(record)
+                self.position = position
+                if sum(map(len, self.pending.values())) >= self.batch_size:
+                    self.flush()
+            self.flush()
+        return self.loaded
+
+    def flush(self):
+        batch = self.pending
+        self.pending = {model: [] for model in MODELS}
+        with transaction.atomic():
+            self.resolve_users(batch)
+            self.resolve_groups(batch)
+            for model in ('post', 'comment', 'follow'):
+                objects = [
+                    getattr(self, f'build_{model}')(record)
+                    for record in batch[model]
+                ]
+                EXPORT_QUERYSETS[model].bulk_create(
+                    objects, ignore_conflicts=True
+                )
+        self.loaded += sum(map(len, batch.values()))
+        if self.checkpoint:
+            write_checkpoint(self.checkpoint, {
+                'position': self.position,
+                'post_offset': self.post_offset,
+                'comment_offset': self.comment_offset,
+            })
+        if self.progress:
+            elapsed = time.perf_counter() - self.started
+            self.progress(self.position, self.loaded / elapsed
+                          if elapsed else 0)
+
+    def resolve_users(self, batch):
+        names = set()
+        for record in batch['post'] + batch['comment']:
+            names.add(record['author'])
+        for record in batch['follow']:
+            names.update((record['user'], record['author']))
+        missing = names - set(self.users)
+        if missing:
+            # Пароль непригоден для входа: его задают через сброс.
+            password = make_password(None)
+            User.objects.bulk_create(
+                (User(username=name, password=password) for name in missing),
+                ignore_conflicts=True
+            )
+            self.users.update(User.objects.filter(
+                username__in=missing
+            ).values_list('username', 'pk'))
+
+    def resolve_groups(self, batch):
+        groups = {
+            record['slug']: Group(
+                slug=record['slug'], title=record['title'],
+                description=record['description']
+            )
+            for record in batch['group']
+        }
+        for record in batch['post']:
+            slug = record.get('group')
+            if slug and slug not in groups and slug not in self.groups:
+                groups[slug] = Group(slug=slug, title=slug, description='')
+        missing = set(groups) - set(self.groups)
+        if missing:
+            Group.objects.bulk_create(
+                (groups[slug] for slug in missing), ignore_conflicts=True
+            )
+            self.groups.update(Group.objects.filter(
+                slug__in=missing
+            ).values_list('slug', 'pk'))
+
+    def build_post(self, record):
+        return Post(
+            pk=record['id'] + self.post_offset,
+            author_id=self.users[record['author']],
+            group_id=self.groups.get(record.get('group') or None),
+            text=record['text'],
+            pub_date=parse_datetime(record['pub_date']),
+            updated=parse_datetime(
+                record.get('updated') or record['pub_date']
+            ),
+            image=record.get('image') or '',
+        )
+
+    def build_comment(self, record):
+        return Comment(
+            pk=record['id'] + self.comment_offset,
+            post_id=record['post'] + self.post_offset,
+            author_id=self.users[record['author']],
+            text=record['text'],
+            created=parse_datetime(record['created']),
+        )
+
+    def build_follow(self, record):
+        return Follow(
+            user_id=self.users[record['user']],
+            author_id=self.users[record['author']],
+        )
+
+
+def finalize(search_index=True):
+    """Привести в порядок всё, что обычно делают save() и сигналы.
+
+    ``search_index=False`` оставляет индекс поиска как есть: на миллионах
+    постов его перестройка — самая долгая часть.
+    """
+    models = [User, Group, Post, Comment, Follow]
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+    rebuild_counters()
+    timeline.rebuild()
+    if search_index:
+        with transaction.atomic():
+            search.get_index().rebuild()
+    bump_version('feed')
+    bump_version('groups')
+    mark_modified(
+        FEED, GROUPS, USERS,
+        *map(group_scope, Group.objects.values_list('slug', flat=True)),
+        *map(author_scope, User.objects.values_list('username', flat=True)),
+    )
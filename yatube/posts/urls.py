@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 app_name = 'posts'
 
@@ -11,8 +11,16 @@ urlpatterns = [
     path('profile/<str:username>/', views.profile, name='profile'),
     # Просмотр записи
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    # Следующая страница комментариев (фрагмент HTML)
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     # Редактирование записи
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
+    # Поиск по постам и комментариям
+    path('search/', views.search, name='search'),
     # Создание записи
     path('create/', views.post_create, name='post_create'),
     path(
@@ -21,6 +29,11 @@ urlpatterns = [
         name='add_comment'
     ),
     path('follow/', views.follow_index, name='follow_index'),
+    # JSON API для мобильных клиентов (только чтение)
+    path('api/posts/', api.index, name='api_index'),
+    path('api/posts/<int:post_id>/', api.post_detail, name='api_post_detail'),
+    path('api/group/<slug:slug>/', api.group_list, name='api_group_list'),
+    path('api/profile/<str:username>/', api.profile, name='api_profile'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
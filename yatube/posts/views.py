@@ -1,17 +1,34 @@
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404, redirect, render
 from django.conf import settings
+from django.core.paginator import Paginator
+from django.http import Http404
+
+from core.aio import async_view, db, gather
+from core.caching import get_versions
+from core.db.transactions import atomic_write
+from core.conditional import anonymous_conditional
+from core.page_cache import anonymous_page_cache
+from core.replicas import pin_to_primary, read_from_replica
 
 from .forms import PostForm, CommentForm
-from .models import Group, Post, Comment, Follow
+from .models import Group, Post, Comment, Follow, Profile
+from .paginator import CursorPaginator
+from .scopes import (FEED, GROUPS, USERS, author_scope, group_scope,
+                     post_scope)
+from .search import SearchResults
+from . import thumbnails, timeline
 
 
-def get_page_context(queryset, request):
-    paginator = Paginator(queryset, settings.PAGE)
+def get_page_context(queryset, request, thumbnail_sizes=(),
+                     **paginator_options):
+    """Страница ленты; ``thumbnail_sizes`` — размеры миниатюр карточек."""
+    paginator = CursorPaginator(queryset, settings.PAGE, **paginator_options)
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginator.get_page(page_number, request.GET.get('cursor'))
+    if thumbnail_sizes:
+        thumbnails.prefetch(page_obj, *thumbnail_sizes)
     return {
         'paginator': paginator,
         'page_number': page_number,
@@ -19,37 +36,114 @@ def get_page_context(queryset, request):
     }
 
 
+def get_posts_count(author):
+    try:
+        return author.profile.posts_count
+    except Profile.DoesNotExist:
+        return author.posts.count()
+
+
+def is_following(user, username):
+    """Подписан ли ``user`` (``None`` — гость) на автора ``username``."""
+    if user is None or user.username == username:
+        return False
+    return Follow.objects.filter(
+        user=user, author__username=username
+    ).exists()
+
+
+def get_comments_page(post_id, cursor=None):
+    """Страница комментариев поста от старых к новым по (created, id)."""
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        settings.COMMENTS_PAGE,
+        ordering=('created', 'id')
+    )
+    return paginator.get_page(None, cursor)
+
+
+def index_scopes():
+    return [FEED, USERS]
+
+
+def group_scopes(slug):
+    return [group_scope(slug), USERS]
+
+
+def profile_scopes(username):
+    # Карточки постов показывают названия групп автора.
+    return [author_scope(username), GROUPS]
+
+
+def comments_scopes(post_id):
+    return [post_scope(post_id), USERS]
+
+
+def post_detail_scopes(post_id):
+    author, group = Post.objects.filter(pk=post_id).values_list(
+        'author__username', 'group__slug'
+    ).first() or (None, None)
+    return [post_scope(post_id), author_scope(author), group_scope(group),
+            USERS]
+
+
+@read_from_replica
+@anonymous_conditional(index_scopes)
+@anonymous_page_cache(index_scopes)
 def index(request):
     template = 'posts/index.html'
-    context = get_page_context(Post.objects.all(), request)
+    # Один запрос страницы: пулу core.aio здесь нечего распараллелить.
+    context = get_page_context(Post.objects.for_feed(), request,
+                               thumbnail_sizes=thumbnails.CARD_SIZES)
+    # Версии входят в ключи кэша фрагментов, сигналы их увеличивают:
+    # карточка показывает ещё название группы и имя автора.
+    (context['feed_version'], context['cards_version'],
+     context['users_version']) = get_versions(FEED, GROUPS, USERS)
     return render(request, template, context)
 
 
-def group_posts(request, slug):
+@read_from_replica
+@anonymous_conditional(group_scopes)
+@anonymous_page_cache(group_scopes)
+@async_view
+async def group_posts(request, slug):
     template = 'posts/group_list.html'
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    # Группа и страница её постов не зависят друг от друга.
+    post_list = Post.objects.for_feed().filter(group__slug=slug)
+    group, page_context = await gather(
+        db(get_object_or_404, Group, slug=slug),
+        db(get_page_context, post_list, request,
+           thumbnail_sizes=thumbnails.CARD_SIZES),
+    )
     context = {
         'group': group,
         'post_list': post_list,
     }
-    context.update(get_page_context(post_list, request))
+    context.update(page_context)
     return render(request, template, context)
 
 
-def profile(request, username):
+@read_from_replica
+@anonymous_conditional(profile_scopes)
+@anonymous_page_cache(profile_scopes)
+@async_view
+async def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    posts = Post.objects.select_related('author').filter(author=author)
-    page_obj = paginate(posts, request)
-    posts_count = posts.count()
-    user = request.user
-    if user.is_authenticated and user != author:
-        following = Follow.objects.filter(
-            user=user, author=author
-        ).exists()
-    else:
-        following = False
+    # Пользователь сессии загружается в потоке запроса, а не в пуле.
+    viewer = request.user if request.user.is_authenticated else None
+    # Автору, странице его постов и подписке хватает имени из адреса:
+    # все три запроса идут одновременно, каждый своим соединением.
+    author, page_obj, following = await gather(
+        db(get_object_or_404, User.objects.select_related('profile'),
+           username=username),
+        db(paginate, Post.objects.for_feed().filter(author__username=username),
+           request),
+        db(is_following, viewer, username),
+    )
+    posts_count = get_posts_count(author)
+    # Номер последней страницы шаблон считает лениво, поэтому счётчик
+    # автора ещё успевает стать подсказкой пагинатора.
+    page_obj.paginator.count_hint = posts_count
     context = {
         'author': author,
         'page_obj': page_obj,
@@ -59,13 +153,24 @@ def profile(request, username):
     return render(request, template, context)
 
 
-def post_detail(request, post_id):
+@read_from_replica
+@anonymous_conditional(post_detail_scopes)
+@anonymous_page_cache(post_detail_scopes)
+@async_view
+async def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
+    # Сразу показывается только первая страница комментариев, остальные
+    # подгружает кнопка «Показать ещё» (post_comments). Её не нужно
+    # ждать после поста: хватает id из адреса.
+    post, comments = await gather(
+        db(get_object_or_404,
+           Post.objects.for_feed().select_related('author__profile'),
+           pk=post_id),
+        db(get_comments_page, post_id, request.GET.get('cursor')),
+    )
     author = post.author
     comment_form = CommentForm(request.POST or None)
-    comments = Comment.objects.filter(post=post)
-    post_count = author.posts.count()
+    post_count = get_posts_count(author)
     # Здесь код запроса к модели и создание словаря контекста
     context = {
         'author': author,
@@ -77,18 +182,49 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+@read_from_replica
+@anonymous_conditional(comments_scopes)
+@anonymous_page_cache(comments_scopes)
+def post_comments(request, post_id):
+    """Следующая страница комментариев — фрагмент HTML для post_detail."""
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404('Пост не найден')
+    context = {
+        'post_id': post_id,
+        'comments': get_comments_page(post_id, request.GET.get('cursor')),
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(SearchResults(query), settings.PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    thumbnails.prefetch(page_obj, *thumbnails.CARD_SIZES)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
+
+
 @login_required
+@pin_to_primary
 def post_create(request):
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        with atomic_write():
+            post.save()
+            thumbnails.enqueue(post)
         return redirect('posts:profile', post.author)
     return render(request, 'posts/create_post.html', {'form': form})
 
 
 @login_required
+@pin_to_primary
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     if post.author != request.user:
@@ -100,7 +236,9 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        with atomic_write():
+            form.save()
+            thumbnails.enqueue(post)
         return redirect('posts:post_detail', post_id=post_id)
     context = {
         'post': post,
@@ -111,6 +249,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@pin_to_primary
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -118,23 +257,24 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with atomic_write():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
-def paginate(posts, request):
-    paginator = Paginator(posts, settings.PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+def paginate(posts, request, **paginator_options):
+    return get_page_context(posts, request, **paginator_options)['page_obj']
 
 
 @login_required
+@read_from_replica
 def follow_index(request):
     template = 'posts/follow.html'
-    user = request.user
-    posts = Post.objects.filter(author__following__user=user)
-    page_obj = paginate(posts, request)
+    # Страница ленты зависит от её вида (get_feed): запросы идут по очереди.
+    posts, paginator_options = timeline.get_feed(request.user)
+    page_obj = paginate(posts, request,
+                        thumbnail_sizes=[thumbnails.FOLLOW_SIZE],
+                        **paginator_options)
     context = {
         'page_obj': page_obj,
     }
@@ -142,6 +282,7 @@ def follow_index(request):
 
 
 @login_required
+@pin_to_primary
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     user = request.user
@@ -152,6 +293,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@pin_to_primary
 def profile_unfollow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
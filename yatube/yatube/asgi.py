@@ -0,0 +1,17 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Django 2.2 не поддерживает ASGI сам: ``core.asgi.AsgiHandler`` выполняет
+обычный WSGI-обработчик в пуле потоков, например::
+
+    uvicorn yatube.asgi:application
+"""
+
+import os
+
+from core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+application = get_asgi_application()
@@ -10,7 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import hashlib
 import os
+import tempfile
+
+from core.db import database_config
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -45,10 +49,12 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
+    'benchmarks.apps.BenchmarksConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,7 +68,8 @@ ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени рендера для core.metrics.
+        'BACKEND': 'core.template_backend.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -82,11 +89,22 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Основная база задаётся DATABASE_URL (см. core.db), по умолчанию файл
+# db.sqlite3. Открытое соединение живёт DATABASE_CONN_MAX_AGE секунд
+# (по умолчанию: PostgreSQL — 60, SQLite закрывается после запроса);
+# для PostgreSQL при DATABASE_POOL_SIZE > 0 соединения процесса берутся
+# из общего пула. SQLITE_MODE: tuned (WAL, busy_timeout,
+# synchronous=NORMAL, mmap) или default — настройки SQLite по умолчанию.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    'default': database_config(
+        os.environ.get('DATABASE_URL', 'sqlite:///db.sqlite3'),
+        BASE_DIR,
+        conn_max_age=(int(os.environ['DATABASE_CONN_MAX_AGE'])
+                      if 'DATABASE_CONN_MAX_AGE' in os.environ else None),
+        pool_size=int(os.environ.get('DATABASE_POOL_SIZE', 0)),
+        pool_timeout=float(os.environ.get('DATABASE_POOL_TIMEOUT', 30)),
+        sqlite_mode=os.environ.get('SQLITE_MODE', 'tuned'),
+    )
 }
 
 
@@ -145,12 +163,176 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 PAGE = 10
+# Комментариев на странице поста и в каждой подгрузке «Показать ещё».
+COMMENTS_PAGE = 20
+# Сколько секунд пагинатор верит закэшированному числу объектов ленты
+# (номер последней страницы в ссылках, см. posts.paginator).
+PAGINATOR_COUNT_TIMEOUT = 300
+# max-age страниц для анонимов: 0 — прокси хранит страницу, но перед
+# отдачей проверяет её у приложения (дешёвый 304 по ETag).
+ANONYMOUS_CACHE_MAX_AGE = int(os.environ.get('ANONYMOUS_CACHE_MAX_AGE', 0))
+# Сколько секунд хранится готовая страница для гостей (core.page_cache).
+# Устаревшие страницы не отдаются и раньше: сигналы меняют версию ключа.
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', 600))
+# Наибольший ?limit= страницы JSON API (posts.api).
+API_MAX_PAGE = 100
+
+# Лента подписок: авторов с большим числом подписчиков не раскладываем
+# по лентам при публикации, а подмешиваем при чтении.
+TIMELINE_FANOUT_LIMIT = 10000
+# Сколько последних постов автора переносится в ленту при подписке.
+TIMELINE_BACKFILL_LIMIT = 1000
+
+# Адрес сайта для ссылок в письмах.
+SITE_URL = os.environ.get('SITE_URL', 'http://localhost:8000')
+
+# Дайджесты новых постов для подписчиков (posts.digests): не чаще раза
+# в DIGEST_INTERVAL секунд, до DIGEST_MAX_POSTS постов в письме, пачками
+# по DIGEST_CHUNK_SIZE подписчиков. Посты старше DIGEST_MAX_AGE секунд
+# в дайджест не попадают, даже если прошлые письма не ушли. Неотправленное
+# письмо повторяется отдельной задачей через DIGEST_RETRY_DELAY секунд.
+DIGEST_INTERVAL = 60 * 60
+DIGEST_MAX_POSTS = 10
+DIGEST_CHUNK_SIZE = 500
+DIGEST_MAX_AGE = 7 * 24 * 60 * 60
+DIGEST_RETRY_DELAY = 5 * 60
+
+# Индекс поиска: fts5 (SQLite FTS5), python (таблица вхождений) или auto.
+SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'auto')
+
+# Реплики для чтения (core.replicas): пути к базам через запятую в
+# DATABASE_REPLICAS. Для локальной проверки подойдут копии db.sqlite3,
+# их обновляет команда sync_sqlite_replicas. С реплик читают только
+# view с декоратором read_from_replica.
+DATABASE_REPLICAS = []
+for number, name in enumerate(
+    filter(None, os.environ.get('DATABASE_REPLICAS', '').split(',')), 1
+):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': os.path.join(BASE_DIR, name.strip()),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+# На сколько секунд реплика может отстать: столько после записи
+# пользователь читает с основной базы и столько не кэшируются страницы,
+# прочитанные с реплики сразу после изменения.
+REPLICA_MAX_LAG = 5
+# Как часто проверять, что реплика отвечает, секунды.
+REPLICA_HEALTH_INTERVAL = 10
+
+# Метрики запросов (core.metrics): заголовок Server-Timing и предельное
+# число SQL-запросов по имени URL. При METRICS_ENFORCE_BUDGETS превышение
+# бюджета — ошибка (так в тестах), иначе предупреждение в лог.
+METRICS_SERVER_TIMING = DEBUG
+METRICS_ENFORCE_BUDGETS = os.environ.get('METRICS_ENFORCE_BUDGETS') == '1'
+# Лентам с картинками нужен ещё один запрос: готовность миниатюр всей
+# страницы читается разом (posts.thumbnails.prefetch).
+METRICS_QUERY_BUDGETS = {
+    'posts:index': 6,
+    'posts:group_list': 6,
+    'posts:profile': 6,
+    'posts:follow_index': 7,
+    'posts:search': 7,
+    'posts:post_detail': 7,
+    'posts:post_comments': 4,
+    'posts:post_create': 14,
+    'posts:post_edit': 14,
+    'posts:add_comment': 11,
+    'posts:profile_follow': 13,
+    'posts:profile_unfollow': 11,
+    'posts:api_index': 4,
+    'posts:api_group_list': 5,
+    'posts:api_profile': 5,
+    'posts:api_post_detail': 4,
+}
+
+# Фоновые задачи (core.tasks) выполняет команда run_tasks. При TASKS_EAGER
+# (в тестах) очередь разбирается сразу после постановки задачи.
+TASKS_EAGER = os.environ.get('TASKS_EAGER') == '1'
+TASKS_MAX_ATTEMPTS = 5
+# Задержка первого повтора, секунды; дальше она удваивается.
+TASKS_RETRY_DELAY = 10
+# Через сколько секунд задача упавшего воркера снова доступна другим.
+TASKS_LEASE = 300
+# Сколько дней хранить выполненные задачи (и их ключи идемпотентности)
+# и упавшие — для разбора.
+TASKS_KEEP_DAYS = 7
+
+# ASGI (yatube/asgi.py): Django 2.2 обрабатывает запрос синхронно, поэтому
+# core.asgi выполняет запросы в пуле из ASGI_THREADS потоков.
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 16))
+# Асинхронные view (core.aio) запрашивают независимые части страницы
+# одновременно в пуле из ASYNC_DB_THREADS потоков со своими соединениями.
+# С пулом соединений PostgreSQL DATABASE_POOL_SIZE рассчитывается на
+# потоки запросов и эти потоки вместе, иначе они ждут друг друга.
+# ASYNC_DB_INLINE выполняет запросы по очереди в потоке запроса.
+ASYNC_DB_THREADS = int(os.environ.get('ASYNC_DB_THREADS', 16))
+ASYNC_DB_INLINE = os.environ.get('ASYNC_DB_INLINE') == '1'
+
+# Миниатюры создаёт фоновый пул (posts.thumbnails), а не рендер шаблона.
+THUMBNAIL_BACKEND = 'posts.thumbnails.PregeneratedBackend'
+THUMBNAIL_ASYNC = True
+THUMBNAIL_WORKERS = 2
+# Через сколько секунд рендер снова попробует файл, миниатюры которого
+# не удались (нет исходника, битая картинка).
+THUMBNAIL_RETRY_AFTER = 60 * 60
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузки пишутся на диск кусками и хешируются по дороге (core.uploads).
+# Файл больше FILE_UPLOAD_MAX_SIZE байт не сохраняется, форма его отклоняет.
+FILE_UPLOAD_HANDLERS = ['core.uploads.StreamingUploadHandler']
+FILE_UPLOAD_MAX_SIZE = int(
+    os.environ.get('FILE_UPLOAD_MAX_SIZE', 20 * 1024 * 1024)
+)
+# Картинки постов (posts.images): больше POST_IMAGE_MAX_PIXELS пикселей
+# не декодируются, большая сторона уменьшается до POST_IMAGE_MAX_DIMENSION.
+POST_IMAGE_MAX_PIXELS = 50 * 1000 * 1000
+POST_IMAGE_MAX_DIMENSION = 2048
+POST_IMAGE_QUALITY = 85
+
+# Кэш двухуровневый: LRU в памяти воркера (L1) перед общим для всех
+# воркеров бэкендом (L2). По умолчанию L2 — файловый кэш; для Redis и
+# подобных достаточно задать SHARED_CACHE_BACKEND и SHARED_CACHE_LOCATION.
+# Файловый кэш общий только в пределах хоста, поэтому по возможности
+# кладём его в tmpfs: запись на диск с fsync на каждый ключ слишком дорога.
+# Папка своя у каждой копии проекта (по BASE_DIR), иначе соседние
+# checkout'ы на одном хосте читали бы страницы и версии друг друга;
+# SHARED_CACHE_DIR задаёт папку явно.
+SHARED_CACHE_DIR = os.environ.get('SHARED_CACHE_DIR') or os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+    'yatube_' + hashlib.md5(BASE_DIR.encode()).hexdigest()[:12]
+)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache_backend.TieredCache',
+        'LOCATION': 'shared',
+        'TIMEOUT': int(os.environ.get('CACHE_TIMEOUT', 300)),
+        'OPTIONS': {
+            'L1_MAX_ENTRIES': int(os.environ.get('CACHE_L1_MAX_ENTRIES', 1000)),
+            'L1_TIMEOUT': float(os.environ.get('CACHE_L1_TIMEOUT', 5)),
+            'SYNC_INTERVAL': float(os.environ.get('CACHE_SYNC_INTERVAL', 1)),
+        },
+    },
+    'shared': {
+        'BACKEND': os.environ.get(
+            'SHARED_CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.environ.get(
+            'SHARED_CACHE_LOCATION',
+            os.path.join(SHARED_CACHE_DIR, 'cache')
+        ),
+        'TIMEOUT': int(os.environ.get('CACHE_TIMEOUT', 300)),
+    },
 }
+if 'SHARED_CACHE_BACKEND' not in os.environ:
+    # Файловый кэш по умолчанию держит 300 записей и при переполнении
+    # удаляет случайную треть — мало для страниц и версий областей.
+    CACHES['shared']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.environ.get('SHARED_CACHE_MAX_ENTRIES', 10000)),
+    }
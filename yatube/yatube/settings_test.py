@@ -0,0 +1,29 @@
+"""Настройки тестов.
+
+``python manage.py test --settings=yatube.settings_test``; pytest берёт
+их из pytest.ini. Здесь только то, без чего тесты не проверить: всё
+остальное (пул потоков ``core.aio``, фоновые миниатюры, двухуровневый
+кэш) работает так же, как в бою, а классы тестов, которым нужно иначе,
+меняют настройки через ``override_settings``.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES, DATABASES
+
+# Задачи выполняются при постановке: тесты проверяют их результат
+# сразу после запроса.
+TASKS_EAGER = True
+# Лишний запрос на странице — ошибка теста, а не строка в логе.
+METRICS_ENFORCE_BUDGETS = True
+
+# Зеркало тестовой базы; тесты реплик включают его через
+# override_settings(DATABASE_REPLICAS=['replica']).
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'TEST': {'MIRROR': 'default'},
+}
+DATABASE_REPLICAS = []
+
+# Тесты очищают кэш; общий кэш запущенного рядом dev-сервера они
+# трогать не должны.
+if CACHES['shared']['BACKEND'].endswith('FileBasedCache'):
+    CACHES['shared']['LOCATION'] += '_tests'
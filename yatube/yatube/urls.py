@@ -5,8 +5,12 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import cache_stats, metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('cache-stats/', cache_stats, name='cache_stats'),
+    path('metrics/', metrics, name='metrics'),
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),